@@ -27,3 +27,21 @@ from .global_search_v2 import GlobalSearchV2
 from .global_tagging_v1 import GlobalTaggingV1
 from .iam_access_groups_v2 import IamAccessGroupsV2
 from .resource_manager_v2 import ResourceManagerV2
+
+from .fanout import FanOut
+from .transport import ConnectionPool
+from .rate_limit import RateLimiter
+from .retry import RetryPolicy, RetryBudget
+from .hedging import HedgingPolicy
+from .audit_logs import AuditLogExporter
+from .pricing import PricingCache, PricingEngine
+from .locales import LocalePruner
+from .change_feed import CatalogChangeFeed
+from .catalog_updates import CatalogEntryUpdater
+from .visibility_audit import VisibilityAuditor, VisibilityPolicy
+from .metrics import MetricsRegistry
+from .tracing import Tracer
+from .cassette import Cassette
+from .compression import RequestCompression
+from .projection import ProjectionPlanner, project
+from .crn import CRN, CRNIndex
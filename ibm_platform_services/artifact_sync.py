@@ -0,0 +1,290 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a sync engine that mirrors the artifacts of a Global
+Catalog object to or from a local directory.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+import json
+import os
+
+from .artifacts import (DEFAULT_HASH_ALGORITHM, TransferStats, download_artifact,
+                        etag_digest, hash_stream, upload_artifact)
+from .global_catalog_v1 import Artifact, Artifacts, GlobalCatalogV1
+
+PARTIAL_SUFFIX = '.part'
+
+# The version of the remote artifact a partial download was started from.
+PARTIAL_STATE_SUFFIX = '.part.json'
+
+
+class SyncAction():
+    """
+    A transfer needed to bring the target side of a sync up to date.
+
+    :attr str kind: One of `upload`, `download`, `delete_remote` or
+          `delete_local`.
+    :attr str name: The artifact id, which is also the local file name.
+    :attr str reason: Why the transfer is needed: `missing`, `size`, `etag`,
+          `updated` or `extra`.
+    :attr Artifact artifact: The remote artifact, if it exists.
+    """
+
+    UPLOAD = 'upload'
+    DOWNLOAD = 'download'
+    DELETE_REMOTE = 'delete_remote'
+    DELETE_LOCAL = 'delete_local'
+
+    def __init__(self, kind: str, name: str, reason: str, *, artifact: Artifact = None) -> None:
+        self.kind = kind
+        self.name = name
+        self.reason = reason
+        self.artifact = artifact
+
+    def __eq__(self, other: 'SyncAction') -> bool:
+        if not isinstance(other, self.__class__):
+            return False
+        return self.__dict__ == other.__dict__
+
+    def __repr__(self) -> str:
+        return 'SyncAction({0!r}, {1!r}, {2!r})'.format(self.kind, self.name, self.reason)
+
+
+class SyncResult():
+    """
+    The outcome of one sync action.
+
+    :attr SyncAction action: The action performed.
+    :attr TransferStats stats: The transfer statistics, for uploads and
+          downloads.
+    :attr Exception error: The exception raised, or None if it succeeded.
+    """
+
+    def __init__(self, action: SyncAction, *, stats: TransferStats = None,
+                 error: Exception = None) -> None:
+        self.action = action
+        self.stats = stats
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Return `true` when the action completed without raising."""
+        return self.error is None
+
+
+class ArtifactSync():
+    """
+    Mirror the artifacts of a catalog object to or from a local directory.
+
+    Local files are the regular files directly inside `directory`, named by
+    artifact id. Each side is compared with the remote `Artifacts` listing:
+    first by size, then by the content hash in the ETag when it looks like a
+    digest, and otherwise by the `updated` timestamp against the file's
+    modification time. Only the transfers found to be needed are run,
+    concurrently on a bounded pool.
+
+    Downloads are written to a `.part` file and moved into place when
+    complete. The ETag and size of the artifact are kept next to it in a
+    `.part.json` file; an interrupted download is only resumed by a later
+    sync when the artifact still has the same ETag and size, and is started
+    over otherwise.
+    """
+
+    UPLOAD = 'upload'
+    DOWNLOAD = 'download'
+
+    def __init__(self, service: GlobalCatalogV1, object_id: str, directory: str, *,
+                 account: str = None, delete: bool = False, max_workers: int = 8,
+                 algorithm: str = DEFAULT_HASH_ALGORITHM) -> None:
+        """
+        Initialize an ArtifactSync object.
+
+        :param GlobalCatalogV1 service: The Global Catalog client.
+        :param str object_id: The catalog object whose artifacts are synced.
+        :param str directory: The local directory.
+        :param str account: (optional) This changes the scope of the requests
+               regardless of the authorization header.
+        :param bool delete: (optional) Whether to delete artifacts that exist
+               only on the target side.
+        :param int max_workers: (optional) The number of concurrent transfers.
+        :param str algorithm: (optional) The `hashlib` algorithm matching the
+               remote ETags.
+        """
+        if object_id is None:
+            raise ValueError('object_id must be provided')
+        if directory is None:
+            raise ValueError('directory must be provided')
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self.service = service
+        self.object_id = object_id
+        self.directory = str(directory)
+        self.account = account
+        self.delete = delete
+        self.max_workers = max_workers
+        self.algorithm = algorithm
+
+    def list_remote(self) -> Dict[str, Artifact]:
+        """Return the remote artifacts keyed by name."""
+        result = self.service.list_artifacts(self.object_id, account=self.account).get_result()
+        artifacts = Artifacts.from_dict(result or {}).resources or []
+        return {a.name: a for a in artifacts if a.name}
+
+    def list_local(self) -> Dict[str, os.stat_result]:
+        """Return the stat of each local file keyed by name."""
+        files = {}
+        if not os.path.isdir(self.directory):
+            return files
+        for name in os.listdir(self.directory):
+            if name.endswith(PARTIAL_SUFFIX) or name.endswith(PARTIAL_STATE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path):
+                files[name] = os.stat(path)
+        return files
+
+    def _local_path(self, name: str) -> str:
+        # Remote names become file names; none may lead out of the directory.
+        if not name or os.path.isabs(name) or '/' in name or os.sep in name or '..' in name \
+                or (os.altsep and os.altsep in name):
+            raise ValueError('Unsafe artifact name: {0!r}'.format(name))
+        return os.path.join(self.directory, name)
+
+    def _difference(self, name: str, local: os.stat_result, remote: Artifact,
+                    direction: str) -> str:
+        if remote.size is not None and remote.size != local.st_size:
+            return 'size'
+        digest = etag_digest(remote.etag, algorithm=self.algorithm)
+        if digest is not None:
+            with open(self._local_path(name), 'rb') as file:
+                local_digest = hash_stream(file, algorithm=self.algorithm)
+            return None if local_digest == digest else 'etag'
+        if remote.updated is None:
+            return None
+        remote_time = remote.updated.timestamp()
+        if direction == self.UPLOAD and local.st_mtime > remote_time:
+            return 'updated'
+        if direction == self.DOWNLOAD and remote_time > local.st_mtime:
+            return 'updated'
+        return None
+
+    def plan(self, direction: str = UPLOAD) -> List[SyncAction]:
+        """
+        Return the actions needed to sync in the given direction.
+
+        :param str direction: (optional) `upload` to make the catalog object
+               match the directory, or `download` for the reverse.
+        """
+        if direction not in (self.UPLOAD, self.DOWNLOAD):
+            raise ValueError('direction must be \'upload\' or \'download\'')
+        remote = self.list_remote()
+        local = self.list_local()
+        actions = []
+        if direction == self.UPLOAD:
+            for name in sorted(local):
+                if name not in remote:
+                    actions.append(SyncAction(SyncAction.UPLOAD, name, 'missing'))
+                    continue
+                reason = self._difference(name, local[name], remote[name], direction)
+                if reason:
+                    actions.append(SyncAction(SyncAction.UPLOAD, name, reason,
+                                              artifact=remote[name]))
+            if self.delete:
+                actions.extend(SyncAction(SyncAction.DELETE_REMOTE, name, 'extra',
+                                          artifact=remote[name])
+                               for name in sorted(set(remote) - set(local)))
+        else:
+            for name in sorted(remote):
+                reason = 'missing'
+                if name in local:
+                    reason = self._difference(name, local[name], remote[name], direction)
+                if reason:
+                    actions.append(SyncAction(SyncAction.DOWNLOAD, name, reason,
+                                              artifact=remote[name]))
+            if self.delete:
+                actions.extend(SyncAction(SyncAction.DELETE_LOCAL, name, 'extra')
+                               for name in sorted(set(local) - set(remote)))
+        return actions
+
+    def _perform(self, action: SyncAction) -> SyncResult:
+        try:
+            stats = None
+            if action.kind != SyncAction.DELETE_REMOTE:
+                path = self._local_path(action.name)
+            if action.kind == SyncAction.UPLOAD:
+                stats = upload_artifact(self.service, self.object_id, action.name, path,
+                                        check_existing=False, account=self.account,
+                                        algorithm=self.algorithm).stats
+            elif action.kind == SyncAction.DOWNLOAD:
+                stats = self._download(action.name, path, action.artifact)
+            elif action.kind == SyncAction.DELETE_REMOTE:
+                self.service.delete_artifact(self.object_id, action.name, account=self.account)
+            elif action.kind == SyncAction.DELETE_LOCAL:
+                os.remove(path)
+            return SyncResult(action, stats=stats)
+        except Exception as err: # pylint: disable=broad-except
+            return SyncResult(action, error=err)
+
+    def _download(self, name: str, path: str, artifact: Optional[Artifact]) -> TransferStats:
+        partial = path + PARTIAL_SUFFIX
+        state_path = path + PARTIAL_STATE_SUFFIX
+        state = {
+            'etag': artifact.etag if artifact is not None else None,
+            'size': artifact.size if artifact is not None else None
+        }
+        resume = state['etag'] is not None and os.path.exists(partial) \
+            and _read_state(state_path) == state \
+            and (state['size'] is None or os.path.getsize(partial) <= state['size'])
+        if not resume and os.path.exists(partial):
+            os.remove(partial)
+        with open(state_path, 'w') as file:
+            json.dump(state, file)
+        stats = download_artifact(self.service, self.object_id, name, partial, resume=resume,
+                                  if_range=state['etag'] if resume else None,
+                                  account=self.account)
+        os.replace(partial, path)
+        os.remove(state_path)
+        if artifact is not None and artifact.updated is not None:
+            updated = artifact.updated.timestamp()
+            os.utime(path, (updated, updated))
+        return stats
+
+    def run(self, direction: str = UPLOAD) -> Iterator[SyncResult]:
+        """
+        Plan and run a sync, yielding results as transfers complete.
+
+        :param str direction: (optional) `upload` to make the catalog object
+               match the directory, or `download` for the reverse.
+        :return: A generator of `SyncResult` objects in completion order.
+        """
+        actions = self.plan(direction)
+        if direction == self.DOWNLOAD:
+            os.makedirs(self.directory, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._perform, action) for action in actions]
+            for future in as_completed(futures):
+                yield future.result()
+
+
+def _read_state(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,433 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides streaming transfers of Global Catalog artifacts.
+
+`GlobalCatalogV1.get_artifact` returns the whole artifact body in a
+`DetailedResponse`. The functions here move the body in fixed-size chunks, so
+memory use does not depend on the size of the artifact.
+"""
+
+from typing import BinaryIO, Dict, Optional, Union
+import hashlib
+import os
+import time
+
+from ibm_cloud_sdk_core import ApiException
+
+from .common import get_sdk_headers
+from .global_catalog_v1 import Artifact, Artifacts, GlobalCatalogV1
+from .transport import install
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_HASH_ALGORITHM = 'md5'
+
+
+class TransferStats():
+    """
+    The outcome of an artifact transfer.
+
+    :attr int bytes_transferred: The number of bytes moved by this transfer.
+    :attr int offset: The position the transfer started from; non-zero when a
+          partial download was resumed.
+    :attr int total_size: The full size of the artifact, if known.
+    :attr float elapsed: The duration of the transfer in seconds.
+    """
+
+    def __init__(self, *, bytes_transferred: int = 0, offset: int = 0,
+                 total_size: int = None, elapsed: float = 0.0) -> None:
+        self.bytes_transferred = bytes_transferred
+        self.offset = offset
+        self.total_size = total_size
+        self.elapsed = elapsed
+
+    @property
+    def resumed(self) -> bool:
+        """Return `true` when the transfer continued a partial download."""
+        return self.offset > 0
+
+    @property
+    def throughput(self) -> float:
+        """Return the transfer rate in bytes per second."""
+        if self.elapsed <= 0:
+            return 0.0
+        return self.bytes_transferred / self.elapsed
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing the transfer."""
+        return {
+            'bytes_transferred': self.bytes_transferred,
+            'offset': self.offset,
+            'total_size': self.total_size,
+            'elapsed': self.elapsed,
+            'throughput': self.throughput
+        }
+
+
+def _parse_content_range(value: str):
+    # 'bytes 100-199/1000' or 'bytes */1000' -> (start, total)
+    if not value or not value.startswith('bytes '):
+        return None, None
+    span, _, total = value[len('bytes '):].partition('/')
+    start = None if span == '*' else int(span.split('-')[0])
+    return start, (None if total in ('', '*') else int(total))
+
+
+def download_artifact(service: GlobalCatalogV1, object_id: str, artifact_id: str,
+                      destination: Union[str, object], *, offset: int = None,
+                      resume: bool = True, if_range: str = None, account: str = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs) -> TransferStats:
+    """
+    Download an artifact chunk by chunk.
+
+    The destination is a file path, a writable binary file object (including an
+    `mmap`), or a writable buffer such as a `bytearray` or `memoryview`.
+
+    A file object is written from its current position. When it holds the
+    first `offset` bytes of the artifact, it is moved to `offset` and
+    truncated after the download if it can be repositioned; otherwise it
+    must already be positioned there.
+
+    When the destination is a path that already exists and `resume` is true, or
+    when `offset` is given, only the remainder is requested with an HTTP
+    `Range` header. The range is sent with an `If-Range` validator, so that
+    the bytes held are only continued if they come from the same version of
+    the artifact: `if_range`, or else the ETag found with `list_artifacts`.
+    When there is no validator, or the artifact is smaller than the bytes
+    held, the download starts over. If the server sends the whole artifact,
+    the destination is rewritten from the start.
+
+    :param GlobalCatalogV1 service: The Global Catalog client.
+    :param str object_id: The object's unique ID.
+    :param str artifact_id: The artifact's ID.
+    :param destination: Where to write the artifact.
+    :param int offset: (optional) The number of bytes already held by the
+           destination. Defaults to the size of an existing file, or 0.
+    :param bool resume: (optional) Whether to continue an existing file.
+    :param str if_range: (optional) The ETag of the artifact version whose
+           first `offset` bytes the destination holds.
+    :param str account: (optional) This changes the scope of the request
+           regardless of the authorization header.
+    :param int chunk_size: (optional) The number of bytes read at a time.
+    :param dict headers: A `dict` containing the request headers
+    :return: The statistics of the transfer.
+    :rtype: TransferStats
+    """
+    if object_id is None:
+        raise ValueError('object_id must be provided')
+    if artifact_id is None:
+        raise ValueError('artifact_id must be provided')
+    if destination is None:
+        raise ValueError('destination must be provided')
+
+    path = None
+    if isinstance(destination, str) or hasattr(destination, '__fspath__'):
+        path = str(destination)
+    if offset is None:
+        offset = os.path.getsize(path) if path and resume and os.path.exists(path) else 0
+    elif path is not None and offset > (os.path.getsize(path) if os.path.exists(path) else 0):
+        raise ValueError('offset is beyond the end of {0}'.format(path))
+    held = offset
+    if offset and if_range is None:
+        artifact = find_artifact(service, object_id, artifact_id, account=account)
+        if artifact is not None and artifact.etag and \
+                (artifact.size is None or artifact.size >= offset):
+            if_range = artifact.etag
+        else:
+            offset = 0
+
+    headers = {}
+    sdk_headers = get_sdk_headers(service_name=service.DEFAULT_SERVICE_NAME,
+                                  service_version='V1',
+                                  operation_id='get_artifact')
+    headers.update(sdk_headers)
+    if offset:
+        headers['Range'] = 'bytes={0}-'.format(offset)
+        headers['If-Range'] = if_range
+    if 'headers' in kwargs:
+        headers.update(kwargs.get('headers'))
+
+    params = {
+        'account': account
+    }
+
+    url = '/{0}/artifacts/{1}'.format(
+        *service.encode_path_vars(object_id, artifact_id))
+    request = service.prepare_request(method='GET',
+                                      url=url,
+                                      headers=headers,
+                                      params=params)
+
+    # Through the transport, so that the send layers apply, with the body left
+    # unread for the chunks below.
+    install(service)
+    start = time.perf_counter()
+    try:
+        response = service.send(request, stream=True, decode=lambda r: r).get_result()
+    except ApiException as err:
+        # The requested range starts at the end: the download is already complete.
+        if err.code == 416 and offset and err.http_response is not None:
+            _, total = _parse_content_range(err.http_response.headers.get('Content-Range'))
+            if total == offset:
+                return TransferStats(offset=offset, total_size=total,
+                                     elapsed=time.perf_counter() - start)
+        raise
+
+    with response:
+        if response.status_code == 206:
+            range_start, total_size = _parse_content_range(response.headers.get('Content-Range'))
+            if range_start is not None and range_start != offset:
+                raise ValueError('Server returned range starting at {0}, expected {1}'.format(
+                    range_start, offset))
+        else:
+            offset = 0
+            length = response.headers.get('Content-Length')
+            total_size = int(length) if length is not None else None
+
+        chunks = response.iter_content(chunk_size=chunk_size)
+        if path is not None:
+            with open(path, 'r+b' if offset else 'wb') as file:
+                file.seek(offset)
+                written = _write_stream(chunks, file)
+                file.truncate()
+        elif hasattr(destination, 'write'):
+            # A file object is written from its current position, unless it
+            # holds the first bytes of the artifact and can be repositioned.
+            seekable = destination.seekable() if hasattr(destination, 'seekable') \
+                else hasattr(destination, 'seek')
+            if held and not seekable and offset != held:
+                raise ValueError('The download started over, but the destination cannot be rewound')
+            if held and seekable:
+                destination.seek(offset)
+            written = _write_stream(chunks, destination)
+            if held and seekable and hasattr(destination, 'truncate'):
+                destination.truncate()
+        else:
+            written = _write_buffer(chunks, memoryview(destination).cast('B'), offset)
+
+    return TransferStats(bytes_transferred=written, offset=offset, total_size=total_size,
+                         elapsed=time.perf_counter() - start)
+
+
+def _write_stream(chunks, file) -> int:
+    written = 0
+    for chunk in chunks:
+        file.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def _write_buffer(chunks, view: memoryview, offset: int) -> int:
+    position = offset
+    for chunk in chunks:
+        end = position + len(chunk)
+        if end > len(view):
+            raise ValueError('Artifact does not fit in the destination buffer of {0} bytes'.format(
+                len(view)))
+        view[position:end] = chunk
+        position = end
+    return position - offset
+
+
+class HashingReader():
+    """
+    A read-only binary stream that hashes the bytes read through it.
+
+    Seeking back to the start (as a retry does before resending the body)
+    restarts the hash, so the digest always covers the last complete pass.
+    """
+
+    def __init__(self, source: BinaryIO, *, algorithm: str = DEFAULT_HASH_ALGORITHM) -> None:
+        self._source = source
+        self._algorithm = algorithm
+        self._start = source.tell()
+        self._hash = hashlib.new(algorithm)
+
+    def read(self, size: int = -1) -> bytes:
+        """Read and hash up to `size` bytes."""
+        data = self._source.read(size)
+        self._hash.update(data)
+        return data
+
+    def seekable(self) -> bool:
+        """Return `true`; the stream can be rewound."""
+        return True
+
+    def tell(self) -> int:
+        """Return the current position."""
+        return self._source.tell()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Move to a new position; moving to the start restarts the hash."""
+        position = self._source.seek(offset, whence)
+        if self._source.tell() == self._start:
+            self._hash = hashlib.new(self._algorithm)
+        return position
+
+    def hexdigest(self) -> str:
+        """Return the hex digest of the bytes read since the start."""
+        return self._hash.hexdigest()
+
+
+class UploadResult():
+    """
+    The outcome of upload_artifact.
+
+    :attr bool uploaded: `false` when the upload was skipped because the remote
+          artifact already has the same content.
+    :attr str digest: The hex digest of the local content.
+    :attr TransferStats stats: The statistics of the transfer.
+    """
+
+    def __init__(self, *, uploaded: bool, digest: str, stats: TransferStats) -> None:
+        self.uploaded = uploaded
+        self.digest = digest
+        self.stats = stats
+
+
+def normalize_etag(etag: str) -> Optional[str]:
+    """Return an ETag without the weak prefix and quotes, in lower case."""
+    if not etag:
+        return None
+    etag = etag.strip()
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return etag.strip('"').lower()
+
+
+def hash_stream(source: BinaryIO, *, algorithm: str = DEFAULT_HASH_ALGORITHM,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """Return the hex digest of a binary stream from its current position to the end."""
+    digest = hashlib.new(algorithm)
+    for chunk in iter(lambda: source.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_artifact(service: GlobalCatalogV1, object_id: str, artifact_id: str, *,
+                  account: str = None) -> Optional[Artifact]:
+    """Return the metadata of an artifact from `list_artifacts`, or None if it does not exist."""
+    result = service.list_artifacts(object_id, account=account).get_result() or {}
+    for artifact in Artifacts.from_dict(result).resources or []:
+        if artifact.name == artifact_id:
+            return artifact
+    return None
+
+
+def etag_digest(etag: str, *, algorithm: str = DEFAULT_HASH_ALGORITHM) -> Optional[str]:
+    """Return the hex digest held in an ETag, or None if it does not look like one."""
+    etag = normalize_etag(etag)
+    if etag is None or len(etag) != hashlib.new(algorithm).digest_size * 2:
+        return None
+    try:
+        int(etag, 16)
+    except ValueError:
+        return None
+    return etag
+
+
+def is_unchanged(artifact: Artifact, size: int, digest_fn, *,
+                 algorithm: str = DEFAULT_HASH_ALGORITHM) -> bool:
+    """
+    Return `true` when a remote artifact has the given size and content hash.
+
+    The size is compared first; `digest_fn` is only called to compute the local
+    hash when the sizes match and the remote ETag looks like a digest of the
+    same algorithm.
+    """
+    if artifact is None or artifact.size is None or artifact.size != size:
+        return False
+    etag = etag_digest(artifact.etag, algorithm=algorithm)
+    if etag is None:
+        return False
+    return digest_fn() == etag
+
+
+def upload_artifact(service: GlobalCatalogV1, object_id: str, artifact_id: str,
+                    source: Union[str, BinaryIO], *, existing: Artifact = None,
+                    check_existing: bool = True, content_type: str = None,
+                    account: str = None, algorithm: str = DEFAULT_HASH_ALGORITHM,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs) -> UploadResult:
+    """
+    Upload an artifact from disk in a stream, skipping it if unchanged.
+
+    Before uploading, the remote artifact (`existing`, or the entry found with
+    `list_artifacts` when `check_existing` is true) is compared by size and by
+    the content hash in its ETag. When both match, no upload is made.
+
+    Otherwise the source is streamed to `GlobalCatalogV1.upload_artifact`
+    through a `HashingReader`, so the content hash is computed as it is sent.
+    The body is rewindable, so a `RetryPolicy` attached to the client resends
+    it from the start on transient failures.
+
+    :param GlobalCatalogV1 service: The Global Catalog client.
+    :param str object_id: The object's unique ID.
+    :param str artifact_id: The artifact's ID.
+    :param source: The path of the file to upload, or a seekable binary stream.
+    :param Artifact existing: (optional) The remote artifact, if already known.
+    :param bool check_existing: (optional) Whether to look up the remote
+           artifact when `existing` is not given.
+    :param str content_type: (optional) The type of the input.
+    :param str account: (optional) This changes the scope of the request
+           regardless of the authorization header.
+    :param str algorithm: (optional) The `hashlib` algorithm matching the
+           remote ETags.
+    :param int chunk_size: (optional) The number of bytes read at a time when
+           hashing before the comparison.
+    :param dict headers: A `dict` containing the request headers
+    :return: The outcome of the upload.
+    :rtype: UploadResult
+    """
+    if object_id is None:
+        raise ValueError('object_id must be provided')
+    if artifact_id is None:
+        raise ValueError('artifact_id must be provided')
+    if source is None:
+        raise ValueError('source must be provided')
+
+    if isinstance(source, str) or hasattr(source, '__fspath__'):
+        with open(str(source), 'rb') as file:
+            return upload_artifact(service, object_id, artifact_id, file, existing=existing,
+                                   check_existing=check_existing, content_type=content_type,
+                                   account=account, algorithm=algorithm,
+                                   chunk_size=chunk_size, **kwargs)
+
+    start = time.perf_counter()
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END) - position
+    source.seek(position)
+
+    if existing is None and check_existing:
+        existing = find_artifact(service, object_id, artifact_id, account=account)
+    digests = []
+
+    def local_digest():
+        digests.append(hash_stream(source, algorithm=algorithm, chunk_size=chunk_size))
+        source.seek(position)
+        return digests[0]
+
+    if is_unchanged(existing, size, local_digest, algorithm=algorithm):
+        return UploadResult(uploaded=False, digest=digests[0],
+                            stats=TransferStats(total_size=size,
+                                                elapsed=time.perf_counter() - start))
+
+    reader = HashingReader(source, algorithm=algorithm)
+    service.upload_artifact(object_id, artifact_id, artifact=reader,
+                            content_type=content_type, account=account, **kwargs)
+    return UploadResult(uploaded=True, digest=reader.hexdigest(),
+                        stats=TransferStats(bytes_transferred=size, total_size=size,
+                                            elapsed=time.perf_counter() - start))
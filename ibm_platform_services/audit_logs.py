@@ -0,0 +1,247 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a parallel exporter for Global Catalog audit logs.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, TextIO, Tuple
+import datetime
+import json
+import os
+
+from ibm_cloud_sdk_core.utils import string_to_datetime
+
+from .global_catalog_v1 import AuditSearchResult, GlobalCatalogV1, Message
+
+MAX_PAGE_SIZE = 200
+
+
+def format_startat(value: datetime.datetime) -> str:
+    """Return a time in the `startat` format of get_audit_logs, YYYY-MM-DDTHH:MM:SSZ."""
+    return _as_utc(value).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _as_utc(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def message_key(message: Message) -> str:
+    """Return a key identifying a message for de-duplication."""
+    return json.dumps(message.to_dict(), sort_keys=True)
+
+
+class _Deduplicator():
+    # Messages arrive in time order, so duplicates share a timestamp: only the
+    # keys seen at the latest timestamp need to be remembered.
+
+    def __init__(self, time: datetime.datetime = None, keys: Iterable[str] = ()) -> None:
+        self.time = time
+        self.keys = set(keys)
+
+    def is_new(self, message: Message) -> bool:
+        key = message_key(message)
+        if message.time is not None and message.time != self.time:
+            if self.time is not None and message.time < self.time:
+                return False
+            self.time = message.time
+            self.keys = set()
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+
+class AuditLogExporter():
+    """
+    Export the audit logs of catalog objects in parallel.
+
+    `get_audit_logs` pages by offset from a `startat` time, so a long export is
+    a long chain of serial calls. The exporter splits the time range into
+    windows of `window` length. Each window is paged in ascending order from
+    its own start and stops at the first message at or past the next window's
+    start; up to `max_workers` windows are fetched concurrently. Windows are
+    emitted in order, so the output is in time order, and messages repeated
+    across page or window boundaries are dropped.
+
+    In incremental mode the time of the last message exported for each object
+    is kept in a JSON state file and the next export resumes from it.
+    """
+
+    def __init__(self, service: GlobalCatalogV1, *, account: str = None,
+                 window: datetime.timedelta = datetime.timedelta(days=7),
+                 page_size: int = MAX_PAGE_SIZE, max_workers: int = 8,
+                 state_path: str = None) -> None:
+        """
+        Initialize an AuditLogExporter object.
+
+        :param GlobalCatalogV1 service: The Global Catalog client.
+        :param str account: (optional) This changes the scope of the requests
+               regardless of the authorization header.
+        :param timedelta window: (optional) The length of the time windows
+               paged concurrently.
+        :param int page_size: (optional) The number of messages per call, at
+               most 200.
+        :param int max_workers: (optional) The number of windows fetched
+               concurrently.
+        :param str state_path: (optional) The JSON file holding the last time
+               exported per object, for `export_incremental`.
+        """
+        if window.total_seconds() < 1:
+            raise ValueError('window must be at least one second')
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError('page_size must be between 1 and {0}'.format(MAX_PAGE_SIZE))
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self.service = service
+        self.account = account
+        self.window = window
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.state_path = state_path
+
+    def windows(self, start: datetime.datetime,
+                end: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """Split [start, end) into windows aligned to whole seconds."""
+        start = _as_utc(start).replace(microsecond=0)
+        end = _as_utc(end)
+        windows = []
+        while start < end:
+            window_end = min(end, start + self.window)
+            windows.append((start, window_end))
+            start = window_end
+        return windows
+
+    def fetch_window(self, object_id: str, start: datetime.datetime,
+                     end: datetime.datetime) -> List[Message]:
+        """Return the messages of an object in [start, end), in time order."""
+        messages = []
+        offset = 0
+        while True:
+            result = self.service.get_audit_logs(object_id, account=self.account,
+                                                 ascending='true',
+                                                 startat=format_startat(start),
+                                                 offset=offset,
+                                                 limit=self.page_size).get_result()
+            page = AuditSearchResult.from_dict(result or {}).resources or []
+            for message in page:
+                if message.time is not None and message.time >= end:
+                    return sorted(messages, key=lambda m: m.time or start)
+                messages.append(message)
+            if len(page) < self.page_size:
+                return sorted(messages, key=lambda m: m.time or start)
+            offset += len(page)
+
+    def iter_messages(self, object_id: str, start: datetime.datetime,
+                      end: datetime.datetime = None, *,
+                      _dedup: _Deduplicator = None) -> Iterator[Message]:
+        """
+        Yield the messages of an object between `start` and `end` in time order.
+
+        :param str object_id: The object's unique ID.
+        :param datetime start: The earliest time, inclusive.
+        :param datetime end: (optional) The latest time, exclusive. Defaults to
+               now.
+        """
+        if object_id is None:
+            raise ValueError('object_id must be provided')
+        end = end or datetime.datetime.now(datetime.timezone.utc)
+        dedup = _dedup or _Deduplicator()
+        windows = iter(self.windows(start, end))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+
+            def submit_next():
+                window = next(windows, None)
+                if window is not None:
+                    pending.append(executor.submit(self.fetch_window, object_id, *window))
+
+            for _ in range(self.max_workers):
+                submit_next()
+            while pending:
+                messages = pending.popleft().result()
+                submit_next()
+                for message in messages:
+                    if dedup.is_new(message):
+                        yield message
+
+    def export(self, object_ids: Iterable[str], out: TextIO, start: datetime.datetime,
+               end: datetime.datetime = None) -> int:
+        """
+        Write the messages of each object as NDJSON, one object after another.
+
+        :param Iterable[str] object_ids: The objects to export.
+        :param TextIO out: The text stream to write to.
+        :param datetime start: The earliest time, inclusive.
+        :param datetime end: (optional) The latest time, exclusive.
+        :return: The number of messages written.
+        """
+        count = 0
+        for object_id in object_ids:
+            for message in self.iter_messages(object_id, start, end):
+                out.write(json.dumps(message.to_dict()) + '\n')
+                count += 1
+        return count
+
+    def load_state(self) -> Dict:
+        """Return the incremental export state, keyed by object id."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as file:
+            return json.load(file)
+
+    def save_state(self, state: Dict) -> None:
+        """Atomically write the incremental export state."""
+        partial = self.state_path + '.tmp'
+        with open(partial, 'w') as file:
+            json.dump(state, file)
+        os.replace(partial, self.state_path)
+
+    def export_incremental(self, object_ids: Iterable[str], out: TextIO,
+                           default_start: datetime.datetime,
+                           end: datetime.datetime = None) -> int:
+        """
+        Write the messages added since the last export of each object as NDJSON.
+
+        Each object resumes from the time of its last exported message, or
+        from `default_start` on its first export. The state is saved after
+        each object.
+
+        :return: The number of messages written.
+        """
+        if not self.state_path:
+            raise ValueError('state_path is required for incremental exports')
+        state = self.load_state()
+        count = 0
+        for object_id in object_ids:
+            previous = state.get(object_id)
+            if previous:
+                dedup = _Deduplicator(string_to_datetime(previous['time']), previous.get('keys', []))
+                start = dedup.time
+            else:
+                dedup = _Deduplicator()
+                start = default_start
+            for message in self.iter_messages(object_id, start, end, _dedup=dedup):
+                out.write(json.dumps(message.to_dict()) + '\n')
+                count += 1
+            if dedup.time is not None:
+                state[object_id] = {'time': dedup.time.isoformat(), 'keys': sorted(dedup.keys)}
+                self.save_state(state)
+        return count
@@ -0,0 +1,319 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a record-and-replay transport for the service clients.
+
+A Cassette takes the place of the connection pool of the clients it is
+attached to. In record mode it passes every request on to the network and
+writes the request and its response to a gzip-compressed JSON Lines file;
+in replay mode it answers each request from that file, optionally with the
+recorded pacing and latency, so that a workload can be reproduced and
+profiled offline. Bodies are stored decoded, with Content-Encoding dropped and
+Content-Length matching the stored body.
+All send layers and response decoding run as they did when recording.
+"""
+
+from collections import deque
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Tuple
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from ibm_cloud_sdk_core import BaseService
+
+from .transport import install
+
+CASSETTE_VERSION = 1
+
+# Request headers that change the response and therefore take part in matching.
+MATCH_HEADERS = ('Accept', 'Range')
+
+# Response headers that are not recorded.
+SKIP_RESPONSE_HEADERS = frozenset(['set-cookie'])
+
+# Recorded transport errors, raised again on replay.
+_ERRORS = {
+    'ConnectionError': requests.exceptions.ConnectionError,
+    'ConnectTimeout': requests.exceptions.ConnectTimeout,
+    'ReadTimeout': requests.exceptions.ReadTimeout,
+    'Timeout': requests.exceptions.Timeout,
+}
+
+
+class CassetteMiss(LookupError):
+    """Raised on replay when no recorded interaction matches a request."""
+
+
+def _body_digest(data) -> str:
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if isinstance(data, (bytes, bytearray)):
+        return hashlib.sha256(data).hexdigest()
+    # Streamed bodies are not read; they match any recorded body.
+    return None
+
+
+def request_key(method: str, url: str, *, params: Dict = None, headers: Dict = None,
+                data=None, **_) -> Tuple:
+    """
+    Return the key that matches a request to its recorded interactions.
+
+    The key is made of the method, the URL without its query, the sorted query
+    parameters, the headers in MATCH_HEADERS and a digest of the body.
+    """
+    prepared = requests.Request(method=method, url=url, params=params).prepare()
+    parts = urlsplit(prepared.url)
+    query = tuple(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    headers = CaseInsensitiveDict(headers or {})
+    significant = tuple((name, headers[name]) for name in MATCH_HEADERS if headers.get(name))
+    return (method.upper(), urlunsplit((parts.scheme, parts.netloc, parts.path, '', '')),
+            query, significant, _body_digest(data))
+
+
+def _encode_key(key: Tuple) -> Dict:
+    method, url, query, headers, body = key
+    return {'method': method, 'url': url, 'query': [list(q) for q in query],
+            'headers': [list(h) for h in headers], 'body_sha256': body}
+
+
+def _decode_key(record: Dict) -> Tuple:
+    return (record['method'], record['url'], tuple(tuple(q) for q in record['query']),
+            tuple(tuple(h) for h in record['headers']), record['body_sha256'])
+
+
+def _recorded_headers(headers: Dict, content: bytes) -> List[List[str]]:
+    # The decoded content is stored, so the headers must describe it rather
+    # than the body as it came over the wire.
+    recorded = []
+    for name, value in headers.items():
+        if name.lower() in SKIP_RESPONSE_HEADERS or name.lower() == 'content-encoding':
+            continue
+        if name.lower() == 'content-length':
+            value = str(len(content))
+        recorded.append([name, value])
+    return recorded
+
+
+def _encode_body(content: bytes) -> Dict:
+    try:
+        return {'body': content.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_base64': base64.b64encode(content).decode('ascii')}
+
+
+def _decode_body(record: Dict) -> bytes:
+    if 'body_base64' in record:
+        return base64.b64decode(record['body_base64'])
+    return (record.get('body') or '').encode('utf-8')
+
+
+class Cassette():
+    """
+    Record the requests of the service clients to a file, or replay them.
+
+    In replay mode requests are matched by `request_key`. Repeated requests
+    with the same key, such as a retried call or a poll, get the recorded
+    responses in the order they were recorded; once those run out the last
+    one is served again. Requests that were never recorded raise CassetteMiss.
+
+    Authenticators still run on replay, so clients replaying a cassette should
+    use a NoAuthAuthenticator. Request headers are not recorded, which keeps
+    tokens out of the cassette.
+
+    :attr str mode: `record` or `replay`.
+    :attr int interactions: The number of interactions recorded or loaded.
+    """
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    ORIGINAL = 'original'
+    FAST = 'fast'
+
+    def __init__(self, path: str, *, mode: str = 'replay', timing: str = 'original',
+                 pool: object = None, sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Initialize a Cassette object.
+
+        :param str path: The cassette file.
+        :param str mode: (optional) `record` to write the file, or `replay`
+               to serve responses from it.
+        :param str timing: (optional) On replay, `original` to hold each
+               request until its recorded time since the first request and
+               then for its recorded latency, or `fast` to answer at once.
+        :param ConnectionPool pool: (optional) When recording, the connection
+               pool that sends the requests. Defaults to the pool already
+               attached to the first client, if any.
+        """
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError('mode must be one of: record, replay')
+        if timing not in (self.ORIGINAL, self.FAST):
+            raise ValueError('timing must be one of: original, fast')
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.pool = pool
+        self.interactions = 0
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._file = None
+        self._start = None
+        self._recorded = {}
+        if mode == self.RECORD:
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+            self._write({'version': CASSETTE_VERSION})
+        else:
+            self._load()
+
+    def _write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def _load(self) -> None:
+        with gzip.open(self.path, 'rt', encoding='utf-8') as file:
+            header = json.loads(file.readline() or '{}')
+            if header.get('version') != CASSETTE_VERSION:
+                raise ValueError('Unsupported cassette version: {0}'.format(header.get('version')))
+            for line in file:
+                record = json.loads(line)
+                self._recorded.setdefault(_decode_key(record), deque()).append(record)
+                self.interactions += 1
+
+    def attach(self, *services: BaseService) -> None:
+        """Route all requests made by the given service clients through this cassette."""
+        for service in services:
+            current = getattr(service, 'http_pool', None)
+            if current is not None and current is not self and self.mode == self.RECORD:
+                if self.pool is None:
+                    self.pool = current
+                elif current is not self.pool:
+                    raise ValueError('The clients are attached to different connection pools')
+            service.http_pool = self
+            install(service)
+
+    def request(self, **kwargs) -> requests.Response:
+        """Send or replay a request; called by the transport in place of a pool."""
+        if self.mode == self.RECORD:
+            return self._record(**kwargs)
+        return self._replay(**kwargs)
+
+    def _record(self, **kwargs) -> requests.Response:
+        key = request_key(**kwargs)
+        start = self._clock()
+        with self._lock:
+            if self._start is None:
+                self._start = start
+        record = _encode_key(key)
+        try:
+            if self.pool is not None:
+                response = self.pool.request(**kwargs)
+            else:
+                response = requests.request(**kwargs)
+            # A streamed body is read here so it can be stored; the caller
+            # then iterates over the stored content.
+            content = response.content or b''
+        except requests.exceptions.RequestException as err:
+            record.update(error=type(err).__name__, message=str(err))
+            self._append(record, start)
+            raise
+        record.update(status=response.status_code, reason=response.reason,
+                      response_headers=_recorded_headers(response.headers, content),
+                      **_encode_body(content))
+        self._append(record, start)
+        return response
+
+    def _append(self, record: Dict, start: float) -> None:
+        record['offset'] = round(start - self._start, 6)
+        record['elapsed'] = round(self._clock() - start, 6)
+        with self._lock:
+            self._write(record)
+            self.interactions += 1
+
+    def _replay(self, **kwargs) -> requests.Response:
+        key = request_key(**kwargs)
+        with self._lock:
+            queue = self._recorded.get(key)
+            if not queue:
+                queue = self._match_any_body(key)
+            if not queue:
+                raise CassetteMiss('No recorded interaction for {0} {1}'.format(key[0], key[1]))
+            record = queue.popleft() if len(queue) > 1 else queue[0]
+            now = self._clock()
+            if self._start is None:
+                self._start = now
+        if self.timing == self.ORIGINAL:
+            # Requests sent sooner than when recorded wait for the difference.
+            early = self._start + record.get('offset', 0) - now
+            delay = max(early, 0) + (record.get('elapsed') or 0)
+            if delay > 0:
+                self._sleep(delay)
+        if 'error' in record:
+            raise _ERRORS.get(record['error'], requests.exceptions.ConnectionError)(record['message'])
+        response = requests.Response()
+        response.status_code = record['status']
+        response.reason = record.get('reason')
+        response.headers = CaseInsensitiveDict(record['response_headers'])
+        response._content = _decode_body(record) # pylint: disable=protected-access
+        response._content_consumed = True # pylint: disable=protected-access
+        response.url = requests.Request(method=kwargs['method'], url=kwargs['url'],
+                                        params=kwargs.get('params')).prepare().url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.elapsed = timedelta(seconds=record.get('elapsed') or 0)
+        return response
+
+    def _match_any_body(self, key: Tuple) -> deque:
+        # A streamed request body has no digest and matches any recorded body.
+        if key[4] is not None:
+            return None
+        for recorded_key, queue in self._recorded.items():
+            if recorded_key[:4] == key[:4]:
+                return queue
+        return None
+
+    def close(self) -> None:
+        """Finish writing the cassette file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> 'Cassette':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def summarize(path: str) -> Iterable[Dict]:
+    """Yield the recorded interactions of a cassette file without their bodies."""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        file.readline()
+        for line in file:
+            record = json.loads(line)
+            record.pop('body', None)
+            record.pop('body_base64', None)
+            yield record
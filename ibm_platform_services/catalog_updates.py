@@ -0,0 +1,182 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides catalog entry updates that skip writes which would not
+change anything.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, Tuple, Union
+import hashlib
+import json
+import threading
+
+from ibm_cloud_sdk_core import ApiException, DetailedResponse
+
+from .global_catalog_v1 import CatalogEntry, GlobalCatalogV1
+
+# The fields sent by update_catalog_entry, in its argument order.
+UPDATABLE_FIELDS = ('name', 'kind', 'overview_ui', 'images', 'disabled', 'tags',
+                    'provider', 'parent_id', 'group', 'active', 'metadata')
+
+
+def _as_dict(entry: Union[CatalogEntry, Dict]) -> Dict:
+    if isinstance(entry, dict):
+        return entry
+    return entry.to_dict()
+
+
+def entry_hash(entry: Union[CatalogEntry, Dict]) -> str:
+    """
+    Return a structural hash of the updatable fields of a catalog entry.
+
+    Fields that are not set are ignored and tags compare as a set, so an entry
+    and the same entry read back from the catalog hash equal.
+    """
+    _dict = _as_dict(entry)
+    fields = {key: _dict[key] for key in UPDATABLE_FIELDS if _dict.get(key) is not None}
+    if 'tags' in fields:
+        fields['tags'] = sorted(fields['tags'])
+    canonical = json.dumps(fields, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class UpdateResult():
+    """
+    The outcome of one desired catalog entry update.
+
+    :attr str id: The catalog entry's unique ID.
+    :attr bool updated: Whether update_catalog_entry was called.
+    :attr DetailedResponse response: The update response, if one was sent.
+    :attr Exception error: The exception raised, or None if it succeeded.
+    """
+
+    def __init__(self, id: str, *, updated: bool = False,
+                 response: DetailedResponse = None, error: Exception = None) -> None:
+        self.id = id
+        self.updated = updated
+        self.response = response
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Return `true` when the update was skipped or succeeded."""
+        return self.error is None
+
+
+class CatalogEntryUpdater():
+    """
+    Update catalog entries only when they differ from their last known state.
+
+    The structural hash of each entry's last known state is cached by id. A
+    desired entry whose hash matches is skipped without a call. When nothing is
+    cached for an entry, it is fetched with `complete='true'` first, unless
+    `fetch_missing` is false, in which case it is always sent.
+
+    :attr dict hashes: The cached hashes keyed by entry id. Pass a dict of
+          your own to keep them between runs.
+    """
+
+    def __init__(self, service: GlobalCatalogV1, *, account: str = None,
+                 fetch_missing: bool = True, max_workers: int = 16,
+                 hashes: Dict[str, str] = None) -> None:
+        """
+        Initialize a CatalogEntryUpdater object.
+
+        :param GlobalCatalogV1 service: The Global Catalog client.
+        :param str account: (optional) This changes the scope of the requests
+               regardless of the authorization header.
+        :param bool fetch_missing: (optional) Whether to fetch entries that
+               have no cached state before deciding to update them.
+        :param int max_workers: (optional) The number of concurrent calls in
+               `update_many`.
+        :param dict hashes: (optional) The initial cached hashes.
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self.service = service
+        self.account = account
+        self.fetch_missing = fetch_missing
+        self.max_workers = max_workers
+        self.hashes = hashes if hashes is not None else {}
+        self._lock = threading.Lock()
+
+    def remember(self, entry: Union[CatalogEntry, Dict], id: str = None) -> None:
+        """Cache the state of an entry, for example from a listing."""
+        entry_id = id or _as_dict(entry).get('id')
+        if entry_id is None:
+            raise ValueError('id must be provided')
+        digest = entry_hash(entry)
+        with self._lock:
+            self.hashes[entry_id] = digest
+
+    def _known_hash(self, id: str) -> str:
+        with self._lock:
+            digest = self.hashes.get(id)
+        if digest is not None or not self.fetch_missing:
+            return digest
+        try:
+            result = self.service.get_catalog_entry(id, account=self.account,
+                                                    complete='true').get_result()
+        except ApiException as err:
+            if err.code == 404:
+                return None
+            raise
+        self.remember(result or {}, id)
+        return self.hashes[id]
+
+    def update(self, id: str, entry: Union[CatalogEntry, Dict], *,
+               move: str = None) -> UpdateResult:
+        """
+        Update a catalog entry unless it already matches `entry`.
+
+        :param str id: The catalog entry's unique ID.
+        :param CatalogEntry entry: The desired entry, as a model or a dict.
+        :param str move: (optional) Reparenting object. See update_catalog_entry.
+               The entry is always updated when given.
+        :return: An UpdateResult; errors are returned, not raised.
+        """
+        if id is None:
+            raise ValueError('id must be provided')
+        try:
+            desired = entry_hash(entry)
+            if move is None and self._known_hash(id) == desired:
+                return UpdateResult(id)
+            _dict = _as_dict(entry)
+            response = self.service.update_catalog_entry(
+                id, *[_dict.get(key) for key in UPDATABLE_FIELDS[:7]],
+                parent_id=_dict.get('parent_id'), group=_dict.get('group'),
+                active=_dict.get('active'), metadata=_dict.get('metadata'),
+                account=self.account, move=move)
+            with self._lock:
+                self.hashes[id] = desired
+            return UpdateResult(id, updated=True, response=response)
+        except Exception as err: # pylint: disable=broad-except
+            return UpdateResult(id, error=err)
+
+    def update_many(self, entries: Iterable[Tuple[str, Union[CatalogEntry, Dict]]]
+                    ) -> Iterator[UpdateResult]:
+        """
+        Update many catalog entries concurrently, skipping unchanged ones.
+
+        :param Iterable entries: (id, desired entry) pairs.
+        :return: A generator of UpdateResult objects in completion order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.update, id, entry) for id, entry in entries]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,193 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides an incremental change feed over Global Catalog entries.
+"""
+
+from typing import Dict, Iterator, List
+from urllib.parse import parse_qsl, urlparse
+import json
+import os
+
+from ibm_cloud_sdk_core.utils import string_to_datetime
+
+from .common import get_sdk_headers
+from .global_catalog_v1 import GlobalCatalogV1
+
+
+class ChangeEvent():
+    """
+    A change to a catalog entry seen by a CatalogChangeFeed.
+
+    :attr str kind: One of `added`, `changed` or `deleted`.
+    :attr str id: The catalog entry's unique ID.
+    :attr str updated: The entry's `updated` timestamp, as returned.
+    :attr dict entry: The entry as returned by `list_catalog_entries`, or None
+          for entries found missing by `reconcile`.
+    """
+
+    ADDED = 'added'
+    CHANGED = 'changed'
+    DELETED = 'deleted'
+
+    def __init__(self, kind: str, id: str, updated: str, *, entry: Dict = None) -> None:
+        self.kind = kind
+        self.id = id
+        self.updated = updated
+        self.entry = entry
+
+    def __eq__(self, other: 'ChangeEvent') -> bool:
+        if not isinstance(other, self.__class__):
+            return False
+        return self.__dict__ == other.__dict__
+
+    def __repr__(self) -> str:
+        return 'ChangeEvent({0!r}, {1!r}, {2!r})'.format(self.kind, self.id, self.updated)
+
+
+class CatalogChangeFeed():
+    """
+    Poll the catalog for entries changed since a stored watermark.
+
+    Each poll lists entries with `sort_by='updated'` and `descending='true'`
+    and stops at the first entry older than the watermark, so it costs one or
+    two pages instead of a full listing. Entries reported inactive are yielded
+    as `deleted`; entries removed outright are only found by `reconcile`,
+    which lists everything.
+
+    The watermark and the `updated` time of every known entry are persisted as
+    JSON in `state_path` once a poll has been fully consumed, so an
+    interrupted poll is repeated rather than lost.
+    """
+
+    def __init__(self, service: GlobalCatalogV1, *, state_path: str = None,
+                 account: str = None, q: str = None, include: str = None) -> None:
+        """
+        Initialize a CatalogChangeFeed object.
+
+        :param GlobalCatalogV1 service: The Global Catalog client.
+        :param str state_path: (optional) The JSON file holding the watermark.
+               Without it the state is only kept in memory.
+        :param str account: (optional) This changes the scope of the requests
+               regardless of the authorization header.
+        :param str q: (optional) A query filter limiting the entries watched.
+        :param str include: (optional) The properties to include in each entry.
+        """
+        self.service = service
+        self.state_path = state_path
+        self.account = account
+        self.q = q
+        self.include = include
+        self.watermark = None
+        self.known = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as file:
+            state = json.load(file)
+        self.watermark = state.get('watermark')
+        self.known = state.get('known', {})
+
+    def save(self) -> None:
+        """Atomically write the watermark and known entries."""
+        if not self.state_path:
+            return
+        partial = self.state_path + '.tmp'
+        with open(partial, 'w') as file:
+            json.dump({'watermark': self.watermark, 'known': self.known}, file)
+        os.replace(partial, self.state_path)
+
+    def _pages(self, **params) -> Iterator[List[Dict]]:
+        result = self.service.list_catalog_entries(account=self.account, q=self.q,
+                                                   include=self.include,
+                                                   **params).get_result() or {}
+        while True:
+            yield result.get('resources') or []
+            next_url = result.get('next')
+            if not next_url or not result.get('resources'):
+                return
+            headers = get_sdk_headers(service_name=self.service.DEFAULT_SERVICE_NAME,
+                                      service_version='V1',
+                                      operation_id='list_catalog_entries')
+            request = self.service.prepare_request(method='GET', url='/', headers=headers,
+                                                   params=dict(parse_qsl(urlparse(next_url).query)))
+            result = self.service.send(request).get_result() or {}
+
+    def _event(self, entry: Dict) -> ChangeEvent:
+        entry_id, updated = entry.get('id'), entry.get('updated')
+        if entry.get('active') is False:
+            kind = ChangeEvent.DELETED
+        elif entry_id in self.known:
+            kind = ChangeEvent.CHANGED
+        else:
+            kind = ChangeEvent.ADDED
+        return ChangeEvent(kind, entry_id, updated, entry=entry)
+
+    def _apply(self, event: ChangeEvent) -> None:
+        if event.kind == ChangeEvent.DELETED:
+            self.known.pop(event.id, None)
+        else:
+            self.known[event.id] = event.updated
+
+    def poll(self) -> Iterator[ChangeEvent]:
+        """
+        Yield the changes since the last poll, oldest first.
+
+        The first poll lists every entry and yields each one as `added`.
+        """
+        watermark = string_to_datetime(self.watermark) if self.watermark else None
+        changed = []
+        for page in self._pages(sort_by='updated', descending='true'):
+            older = False
+            for entry in page:
+                if entry.get('id') is None or entry.get('updated') is None:
+                    continue
+                # An inactive entry that is not known was reported already
+                # or never seen.
+                if entry.get('active') is False and entry['id'] not in self.known:
+                    continue
+                if watermark is not None:
+                    updated = string_to_datetime(entry['updated'])
+                    if updated < watermark:
+                        older = True
+                        break
+                    if self.known.get(entry['id']) == entry['updated']:
+                        continue
+                changed.append(entry)
+            if older:
+                break
+        changed.sort(key=lambda entry: string_to_datetime(entry['updated']))
+        for entry in changed:
+            event = self._event(entry)
+            yield event
+            self._apply(event)
+        if changed:
+            self.watermark = changed[-1]['updated']
+        self.save()
+
+    def reconcile(self) -> Iterator[ChangeEvent]:
+        """Yield `deleted` events for known entries missing from a full listing."""
+        present = set()
+        for page in self._pages():
+            present.update(entry.get('id') for entry in page)
+        for entry_id in sorted(set(self.known) - present):
+            event = ChangeEvent(ChangeEvent.DELETED, entry_id, self.known[entry_id])
+            yield event
+            self._apply(event)
+        self.save()
@@ -19,9 +19,12 @@ This module provides common methods for use across all service modules.
 """
 
 import platform
+import threading
+from typing import Dict, Optional, Tuple
 from .version import __version__
 
 HEADER_NAME_USER_AGENT = 'User-Agent'
+HEADER_NAME_SDK_ANALYTICS = 'X-IBMCloud-SDK-Analytics'
 SDK_NAME = 'platform-services-python-sdk'
 
 def get_system_info():
@@ -46,11 +49,52 @@ USER_AGENT = '{0}/{1} {2}'.format(SDK_NAME, __version__, get_system_info())
 
 
 def get_sdk_headers(service_name, service_version, operation_id):
-    # pylint: disable=unused-argument
-    
     """
     Get the request headers to be sent in requests by the SDK
     """
     headers = {}
     headers[HEADER_NAME_USER_AGENT] = get_user_agent()
+    _operation.pending = (service_name, service_version, operation_id)
     return headers
+
+
+# The operation whose request is being prepared on each thread, recorded by
+# get_sdk_headers until the transport takes it.
+_operation = threading.local()
+
+
+def take_sdk_operation(service_name: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Take the service name, service version and operation id last recorded by
+    get_sdk_headers on this thread, if it was for the given service.
+    """
+    pending = getattr(_operation, 'pending', None)
+    _operation.pending = None
+    if pending is None or pending[0] != service_name:
+        return None
+    return pending
+
+
+def set_sdk_operation(headers: Dict, operation: Tuple[str, str, str]) -> None:
+    """
+    Record an operation in the headers of a prepared request, for the send
+    layers to read with get_sdk_operation. The transport removes it before the
+    request is sent.
+    """
+    headers[HEADER_NAME_SDK_ANALYTICS] = 'service_name={0};service_version={1};operation_id={2}'.format(
+        *operation)
+
+
+def get_sdk_operation(headers: Dict) -> Tuple[str, str, str]:
+    """
+    Get the service name, service version and operation id recorded by
+    set_sdk_operation in the headers of a prepared request.
+
+    Each value is None when the request was not built by a service method.
+    """
+    values = {}
+    analytics = headers.get(HEADER_NAME_SDK_ANALYTICS) if headers else None
+    for part in (analytics or '').split(';'):
+        key, _, value = part.partition('=')
+        values[key.strip()] = value.strip() or None
+    return values.get('service_name'), values.get('service_version'), values.get('operation_id')
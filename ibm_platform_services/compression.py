@@ -0,0 +1,173 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides opt-in compression of large request bodies for the
+service clients.
+"""
+
+from typing import Callable, Dict, Iterable
+import threading
+import zlib
+
+from requests.structures import CaseInsensitiveDict
+from ibm_cloud_sdk_core import BaseService, DetailedResponse
+
+from .common import get_sdk_operation
+from .transport import wrap_send
+
+GZIP = 'gzip'
+DEFLATE = 'deflate'
+
+# The zlib window bits that produce each HTTP content coding.
+_WBITS = {
+    GZIP: 16 + zlib.MAX_WBITS,
+    DEFLATE: zlib.MAX_WBITS,
+}
+
+COMPRESSIBLE_METHODS = frozenset(['POST', 'PUT', 'PATCH'])
+
+# The response codings requests and urllib3 decode as the body is read.
+DEFAULT_ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def compress(data: bytes, encoding: str = GZIP, level: int = 6) -> bytes:
+    """Compress a body with the `gzip` or `deflate` HTTP content coding."""
+    if encoding not in _WBITS:
+        raise ValueError('encoding must be one of: gzip, deflate')
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data: bytes, encoding: str = GZIP) -> bytes:
+    """Decompress a body sent with the `gzip` or `deflate` HTTP content coding."""
+    if encoding not in _WBITS:
+        raise ValueError('encoding must be one of: gzip, deflate')
+    return zlib.decompress(data, _WBITS[encoding])
+
+
+class CompressionStats():
+    """
+    Counters kept by a RequestCompression layer.
+
+    :attr int requests: The number of requests with a body.
+    :attr int compressed: The number of requests sent compressed.
+    :attr int bytes_before: The body bytes of the compressed requests.
+    :attr int bytes_after: The bytes sent for the compressed requests.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.compressed = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self._lock = threading.Lock()
+
+    def record(self, before: int = None, after: int = None) -> None:
+        """Count a request, and its sizes if it was compressed."""
+        with self._lock:
+            self.requests += 1
+            if before is not None:
+                self.compressed += 1
+                self.bytes_before += before
+                self.bytes_after += after
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary of the counters."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'compressed': self.compressed,
+                'bytes_before': self.bytes_before,
+                'bytes_after': self.bytes_after
+            }
+
+
+class RequestCompression():
+    """
+    Compress the bodies of large POST, PUT and PATCH requests.
+
+    Bodies of at least `threshold` bytes are sent with a `Content-Encoding`
+    header, unless they are streamed or already encoded. Compression is
+    opt-in because a service must accept encoded request bodies; check that
+    it does before attaching this layer to its client.
+
+    Every request also asks for compressed responses with `Accept-Encoding`;
+    they are decompressed chunk by chunk as the body is read.
+
+    :attr CompressionStats stats: The counters for all requests.
+    """
+
+    def __init__(self, *, threshold: int = 1024, encoding: str = GZIP, level: int = 6,
+                 operations: Iterable[str] = None,
+                 accept_encoding: str = DEFAULT_ACCEPT_ENCODING) -> None:
+        """
+        Initialize a RequestCompression object.
+
+        :param int threshold: (optional) The smallest body, in bytes, that is
+               compressed.
+        :param str encoding: (optional) `gzip` or `deflate`.
+        :param int level: (optional) The zlib compression level, from 1
+               (fastest) to 9 (smallest).
+        :param Iterable[str] operations: (optional) The operation ids whose
+               bodies may be compressed. All operations if not set.
+        :param str accept_encoding: (optional) The `Accept-Encoding` header
+               sent when the request has none. Set to None to leave it alone.
+        """
+        if threshold < 0:
+            raise ValueError('threshold must not be negative')
+        if encoding not in _WBITS:
+            raise ValueError('encoding must be one of: gzip, deflate')
+        if not 1 <= level <= 9:
+            raise ValueError('level must be between 1 and 9')
+        self.threshold = threshold
+        self.encoding = encoding
+        self.level = level
+        self.operations = frozenset(operations) if operations is not None else None
+        self.accept_encoding = accept_encoding
+        self.stats = CompressionStats()
+
+    def attach(self, *services: BaseService) -> None:
+        """Compress the requests made by the given service clients."""
+        for service in services:
+            wrap_send(service, self._send)
+
+    def _send(self, send: Callable, request: Dict, **kwargs) -> DetailedResponse:
+        headers = CaseInsensitiveDict(request.get('headers') or {})
+        if self.accept_encoding and 'accept-encoding' not in headers:
+            headers['Accept-Encoding'] = self.accept_encoding
+        data = request.get('data')
+        if data is None:
+            return send(dict(request, headers=headers), **kwargs)
+        before = after = None
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if isinstance(data, (bytes, bytearray)) and len(data) >= self.threshold \
+                and request.get('method') in COMPRESSIBLE_METHODS \
+                and 'content-encoding' not in headers and self._allowed(headers):
+            before = len(data)
+            data = compress(bytes(data), self.encoding, self.level)
+            after = len(data)
+            headers['Content-Encoding'] = self.encoding
+            request = dict(request, data=data)
+        self.stats.record(before, after)
+        return send(dict(request, headers=headers), **kwargs)
+
+    def _allowed(self, headers: Dict) -> bool:
+        if self.operations is None:
+            return True
+        _, _, operation_id = get_sdk_operation(headers)
+        return operation_id in self.operations
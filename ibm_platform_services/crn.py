@@ -0,0 +1,281 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a parsed Cloud Resource Name (CRN) type and an index
+over collections of CRNs.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+from collections import Counter, namedtuple
+import sys
+
+SEGMENTS = ('version', 'cname', 'ctype', 'service_name', 'location', 'scope',
+            'service_instance', 'resource_type', 'resource')
+
+# The segments that are nearly unique to each CRN. They are neither interned
+# nor indexed by default, since sharing them saves nothing.
+UNIQUE_SEGMENTS = frozenset(['service_instance', 'resource'])
+
+# The segments a CRNIndex indexes unless told otherwise: those that tell
+# CRNs apart but are shared by many of them.
+INDEXED_SEGMENTS = ('service_name', 'location', 'scope', 'resource_type')
+
+_SHARED = tuple(name not in UNIQUE_SEGMENTS for name in SEGMENTS)
+
+
+class CRN(namedtuple('CRN', SEGMENTS)):
+    """
+    A Cloud Resource Name, parsed once into its segments:
+
+        crn:version:cname:ctype:service-name:location:scope:service-instance:resource-type:resource
+
+    A CRN is a tuple of its segments, so it is hashable, compact and ordered
+    segment by segment. The segments that many CRNs have in common, such as
+    the service name, location or account, are interned so that they share
+    the same strings. Empty segments are empty strings; the resource may
+    itself contain colons.
+
+    :attr str version: The CRN version, such as `v1`.
+    :attr str cname: The cloud instance, such as `bluemix`.
+    :attr str ctype: The cloud type, such as `public`.
+    :attr str service_name: The service, such as `cloudantnosqldb`.
+    :attr str location: The region or zone, such as `us-south`.
+    :attr str scope: The scope, such as `a/<account id>`.
+    :attr str service_instance: The service instance ID.
+    :attr str resource_type: The type of resource within the instance.
+    :attr str resource: The resource ID within the instance.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, text: Union[str, 'CRN']) -> 'CRN':
+        """
+        Return the CRN for a string.
+
+        :raises ValueError: The string is not a CRN.
+        """
+        if isinstance(text, CRN):
+            return text
+        if not isinstance(text, str):
+            raise ValueError('A CRN must be a string')
+        segments = text.split(':', len(SEGMENTS))
+        if len(segments) != len(SEGMENTS) + 1 or segments[0] != 'crn':
+            raise ValueError('Not a CRN: {0!r}'.format(text))
+        return cls._make([sys.intern(segment) if shared else segment
+                          for segment, shared in zip(segments[1:], _SHARED)])
+
+    def __str__(self) -> str:
+        return 'crn:' + ':'.join(self)
+
+    @property
+    def scope_type(self) -> str:
+        """The kind of scope: `a` (account), `o` (org), `s` (space) or `p` (project)."""
+        return self.scope.partition('/')[0] if '/' in self.scope else ''
+
+    @property
+    def scope_id(self) -> str:
+        """The ID in the scope, such as the account ID."""
+        return self.scope.partition('/')[2]
+
+    @property
+    def account_id(self) -> str:
+        """The account ID of an account-scoped CRN, or None."""
+        return self.scope_id if self.scope_type == 'a' else None
+
+
+def crn_of(item: object, key: str = 'crn') -> CRN:
+    """
+    Return the CRN of a CRN string, a dict, or a model such as `ResultItem`
+    (`key='crn'`) or the tagging `Resource` (`key='resource_id'`).
+    """
+    if isinstance(item, (str, CRN)):
+        return CRN.parse(item)
+    if isinstance(item, dict):
+        return CRN.parse(item.get(key))
+    return CRN.parse(getattr(item, key, None))
+
+
+class CRNIndex():
+    """
+    An index over a collection of CRNs, with an optional value for each.
+
+    Queries by segment, such as all the instances of a service in a region:
+
+        index = CRNIndex()
+        index.update(search_results)
+        for crn in index.find(service_name='cloudantnosqldb', location='us-south'):
+            ...
+
+    start from the shortest list of CRNs that share one of the given indexed
+    segments, and check the other segments on each CRN. Queries on segments
+    that are not indexed scan every CRN. Queries by text prefix, such as
+    `crn:v1:bluemix:public:cloudantnosqldb:`, search the CRNs in sorted order.
+
+    The lists hold references to the CRNs, so an indexed segment costs one
+    pointer per CRN. Removed CRNs are dropped from the lists once they make
+    up half of them.
+    """
+
+    def __init__(self, items: Iterable[object] = (), *, key: str = 'crn',
+                 segments: Iterable[str] = INDEXED_SEGMENTS) -> None:
+        """
+        Initialize a CRNIndex object.
+
+        :param Iterable items: (optional) CRN strings, CRNs, or dicts or models
+               that carry one under `key`; dicts and models are kept as values.
+        :param str key: (optional) The property that holds the CRN.
+        :param Iterable[str] segments: (optional) The segments to index.
+        """
+        segments = tuple(segments)
+        for name in segments:
+            _check_segment(name)
+        self._values = {}
+        self._postings = {name: {} for name in segments}
+        self._removed = set()
+        self._sorted = None
+        self.update(items, key=key)
+
+    def add(self, crn: Union[str, CRN], value: object = None) -> CRN:
+        """Add a CRN, or replace its value. Returns the parsed CRN."""
+        crn = CRN.parse(crn)
+        if crn not in self._values:
+            if crn in self._removed:
+                # Still in the lists.
+                self._removed.discard(crn)
+            else:
+                self._post(crn)
+            self._sorted = None
+        self._values[crn] = value
+        return crn
+
+    def _post(self, crn: CRN) -> None:
+        for name, postings in self._postings.items():
+            segment = getattr(crn, name)
+            crns = postings.get(segment)
+            if crns is None:
+                postings[segment] = [crn]
+            else:
+                crns.append(crn)
+
+    def update(self, items: Iterable[object], *, key: str = 'crn') -> None:
+        """Add CRN strings, CRNs, or dicts or models that carry one under `key`."""
+        for item in items:
+            if isinstance(item, (str, CRN)):
+                self.add(item)
+            else:
+                self.add(crn_of(item, key), item)
+
+    def remove(self, crn: Union[str, CRN]) -> None:
+        """
+        Remove a CRN.
+
+        :raises KeyError: The CRN is not in the index.
+        """
+        crn = CRN.parse(crn)
+        del self._values[crn]
+        self._removed.add(crn)
+        self._sorted = None
+        if len(self._removed) > max(1024, len(self._values)):
+            self._compact()
+
+    def _compact(self) -> None:
+        self._postings = {name: {} for name in self._postings}
+        self._removed = set()
+        for crn in self._values:
+            self._post(crn)
+
+    def get(self, crn: Union[str, CRN], default: object = None) -> object:
+        """Return the value of a CRN, or `default` if it is not in the index."""
+        return self._values.get(CRN.parse(crn), default)
+
+    def __contains__(self, crn: Union[str, CRN]) -> bool:
+        try:
+            return CRN.parse(crn) in self._values
+        except ValueError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[CRN]:
+        return iter(list(self._values))
+
+    def _matching(self, segments: Dict[str, str]) -> Iterator[CRN]:
+        checks = [(_check_segment(name), value) for name, value in segments.items()]
+        candidates = self._values
+        indexed = [self._postings[name].get(value, ()) for name, value in segments.items()
+                   if name in self._postings]
+        if indexed:
+            candidates = min(indexed, key=len)
+        removed = self._removed
+        for crn in candidates:
+            if all(crn[position] == value for position, value in checks) and \
+                    not (removed and crn in removed):
+                yield crn
+
+    def find(self, **segments: str) -> List[CRN]:
+        """
+        Return the CRNs with all the given segments, such as
+        `service_name='kms', location='us-south'`, in sorted order.
+        """
+        return sorted(self._matching(segments))
+
+    def items(self, **segments: str) -> List[Tuple[CRN, object]]:
+        """Return the (CRN, value) pairs of the CRNs with all the given segments."""
+        return [(crn, self._values[crn]) for crn in self.find(**segments)]
+
+    def count(self, **segments: str) -> int:
+        """Return the number of CRNs with all the given segments."""
+        return sum(1 for _ in self._matching(segments))
+
+    def count_by(self, segment: str, **segments: str) -> Dict[str, int]:
+        """
+        Return the number of CRNs for each value of a segment, such as
+        `count_by('location', service_name='kms')`, among those with all the
+        other given segments.
+        """
+        position = _check_segment(segment)
+        return dict(Counter(crn[position] for crn in self._matching(segments)))
+
+    def prefix(self, text: str) -> List[CRN]:
+        """
+        Return the CRNs whose text starts with `text`, such as
+        `crn:v1:bluemix:public:cloudantnosqldb:us-south:`, in sorted order.
+        """
+        if self._sorted is None:
+            self._sorted = sorted(self._values, key=str)
+        crns = self._sorted
+        low, high = 0, len(crns)
+        while low < high:
+            middle = (low + high) // 2
+            if str(crns[middle]) < text:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        for crn in crns[low:]:
+            if not str(crn).startswith(text):
+                break
+            found.append(crn)
+        return found
+
+
+def _check_segment(name: str) -> int:
+    if name not in SEGMENTS:
+        raise ValueError('Unknown CRN segment: {0}'.format(name))
+    return SEGMENTS.index(name)
@@ -0,0 +1,224 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a runner that fans a single client method call out across
+many accounts in parallel.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator
+from urllib.parse import urlparse
+import threading
+import time
+
+from ibm_cloud_sdk_core import BaseService, DetailedResponse
+
+from .transport import ConnectionPool
+
+
+class FanOutResult():
+    """
+    The outcome of one call made by a FanOut runner.
+
+    :attr str account_id: The account the call was made for.
+    :attr DetailedResponse response: The response, or None if the call failed.
+    :attr Exception error: The exception raised by the call, or None if it
+          succeeded.
+    :attr float latency: The wall-clock duration of the call in seconds.
+    """
+
+    def __init__(self, account_id: str, *, response: DetailedResponse = None,
+                 error: Exception = None, latency: float = 0.0) -> None:
+        self.account_id = account_id
+        self.response = response
+        self.error = error
+        self.latency = latency
+
+    @property
+    def ok(self) -> bool:
+        """Return `true` when the call completed without raising."""
+        return self.error is None
+
+    def get_result(self):
+        """Return the result of the response, or None if the call failed."""
+        if self.response is None:
+            return None
+        return self.response.get_result()
+
+
+class FanOutReport():
+    """
+    Per-account latency and failures collected over a FanOut run.
+
+    :attr Dict[str, float] latencies: The call latency in seconds, by account.
+    :attr Dict[str, Exception] failures: The error raised, by failed account.
+    """
+
+    def __init__(self) -> None:
+        self.latencies = {}
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    def record(self, result: FanOutResult) -> None:
+        """Add a result to the report."""
+        with self._lock:
+            self.latencies[result.account_id] = result.latency
+            if not result.ok:
+                self.failures[result.account_id] = result.error
+
+    @property
+    def total(self) -> int:
+        """Return the number of calls recorded."""
+        return len(self.latencies)
+
+    @property
+    def succeeded(self) -> int:
+        """Return the number of calls that completed without raising."""
+        return self.total - len(self.failures)
+
+    def percentile(self, pct: float) -> float:
+        """Return the given latency percentile (0-100) in seconds."""
+        values = sorted(self.latencies.values())
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+        return values[index]
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary summarizing the run."""
+        return {
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': len(self.failures),
+            'latency_p50': self.percentile(50),
+            'latency_p95': self.percentile(95),
+            'latency_max': self.percentile(100),
+            'failures': {k: str(v) for (k, v) in self.failures.items()}
+        }
+
+
+class FanOut():
+    """
+    Run one client method call for each account in a list, in parallel.
+
+    The call template is a client method, such as
+    `ResourceManagerV2.list_resource_groups`, plus keyword arguments shared by
+    every call; the account id is passed in the `account_param` argument.
+    Results are yielded as they complete, tagged with the account id.
+
+    Concurrency is bounded both overall (`max_workers`) and per service host
+    (`max_per_host`), so that several runs against different services can share
+    one runner without overwhelming a single endpoint. When a `ConnectionPool`
+    is given, the client behind each call template is attached to it so that
+    all calls reuse the same warm connections.
+
+    :attr FanOutReport report: The report for the most recent run.
+    """
+
+    def __init__(self, *, max_workers: int = 32, max_per_host: int = 8,
+                 pool: ConnectionPool = None) -> None:
+        """
+        Initialize a FanOut runner.
+
+        :param int max_workers: (optional) The maximum number of calls in
+               flight across all hosts.
+        :param int max_per_host: (optional) The maximum number of calls in
+               flight against a single service host. Keep this at or below the
+               pool's `pool_maxsize` so every call finds a pooled connection.
+        :param ConnectionPool pool: (optional) The connection pool shared by
+               all calls.
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        if max_per_host < 1:
+            raise ValueError('max_per_host must be at least 1')
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.pool = pool
+        self.report = FanOutReport()
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def _host_limit(self, host: str) -> threading.BoundedSemaphore:
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    @staticmethod
+    def _host_of(method: Callable) -> str:
+        service = getattr(method, '__self__', None)
+        service_url = getattr(service, 'service_url', None)
+        if not service_url:
+            return ''
+        return urlparse(service_url).netloc
+
+    def _call(self, method: Callable, account_id: str, account_param: str,
+              kwargs: Dict) -> FanOutResult:
+        limit = self._host_limit(self._host_of(method))
+        with limit:
+            start = time.perf_counter()
+            try:
+                if account_param is None:
+                    response = method(account_id, **kwargs)
+                else:
+                    response = method(**{account_param: account_id}, **kwargs)
+                error = None
+            except Exception as err: # pylint: disable=broad-except
+                response = None
+                error = err
+            latency = time.perf_counter() - start
+        return FanOutResult(account_id, response=response, error=error, latency=latency)
+
+    def run(self, method: Callable, account_ids: Iterable[str], *,
+            account_param: str = 'account_id', **kwargs) -> Iterator[FanOutResult]:
+        """
+        Call `method` once per account and yield results as they complete.
+
+        :param Callable method: The client method to call, for example
+               `service.list_access_groups`. When `account_param` is None, any
+               callable taking the account id as its only positional argument.
+        :param Iterable[str] account_ids: The accounts to call the method for.
+        :param str account_param: (optional) The name of the keyword argument
+               that receives the account id. Use `account` for the Global Catalog
+               and None to pass the account id positionally.
+        :param **kwargs: (optional) Arguments passed unchanged to every call.
+        :return: A generator of `FanOutResult` objects in completion order.
+        """
+        if method is None:
+            raise ValueError('method must be provided')
+        service = getattr(method, '__self__', None)
+        if self.pool is not None and isinstance(service, BaseService):
+            self.pool.attach(service)
+        self.report = FanOutReport()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._call, method, account_id, account_param, kwargs)
+                       for account_id in account_ids]
+            for future in as_completed(futures):
+                result = future.result()
+                self.report.record(result)
+                yield result
+
+    def run_all(self, method: Callable, account_ids: Iterable[str], *,
+                account_param: str = 'account_id', **kwargs) -> Dict[str, FanOutResult]:
+        """
+        Call `method` once per account and return all results keyed by account.
+
+        Takes the same arguments as `run`.
+        """
+        return {r.account_id: r for r in self.run(method, account_ids,
+                                                  account_param=account_param, **kwargs)}
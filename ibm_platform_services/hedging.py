@@ -0,0 +1,243 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides hedged requests for latency-sensitive idempotent reads.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable
+import threading
+import time
+
+from ibm_cloud_sdk_core import BaseService, DetailedResponse
+
+from .common import get_sdk_operation
+from .retry import is_idempotent
+from .transport import wrap_send
+
+# Reads whose tail latency is worth paying an extra request for.
+DEFAULT_HEDGED_OPERATIONS = frozenset([
+    'get_catalog_entry',
+    'get_child_objects',
+    'get_pricing',
+    'get_visibility',
+    'list_catalog_entries',
+    'search',
+])
+
+
+class HedgingStats():
+    """
+    Counters kept by a HedgingPolicy.
+
+    :attr int calls: The number of hedgeable calls.
+    :attr int hedged: The number of calls for which a second request was sent.
+    :attr int hedge_wins: The number of calls answered by the second request.
+    :attr int denied: The number of hedges refused by the load cap.
+    :attr int saturated: The number of requests sent without a hedge because
+          every sending thread was busy.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+        self.saturated = 0
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary of the counters."""
+        return {
+            'calls': self.calls,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'denied': self.denied,
+            'saturated': self.saturated
+        }
+
+
+class HedgingPolicy():
+    """
+    Send a second, identical request when a read is slower than usual.
+
+    For each hedged operation the first request is sent immediately. If it has
+    not completed after the hedge delay, a second request is sent and the first
+    successful response wins. A hedge that has not started yet is cancelled;
+    one already on the wire runs to completion and its response is discarded.
+
+    The hedge delay is the observed `percentile` latency of the operation over
+    the last `window` calls, or `delay` until `min_samples` calls have been
+    seen; latencies are timed from when a request starts on a sending thread.
+    The number of hedges is capped at `max_extra_load` times the number of
+    hedgeable calls, across all attached clients. When every sending thread
+    is busy, requests are sent from the calling thread and not hedged, rather
+    than queued.
+
+    Only idempotent operations are ever hedged, and streamed requests
+    (`stream=True`) never are, since the losing response would hold its
+    connection.
+
+    :attr HedgingStats stats: The counters for all calls made through the policy.
+    """
+
+    def __init__(self, *, delay: float = 0.05, percentile: float = 95,
+                 window: int = 200, min_samples: int = 20,
+                 max_extra_load: float = 0.05,
+                 operations: Iterable[str] = DEFAULT_HEDGED_OPERATIONS,
+                 max_workers: int = 32) -> None:
+        """
+        Initialize a HedgingPolicy object.
+
+        :param float delay: (optional) The hedge delay in seconds used until
+               enough latencies have been observed.
+        :param float percentile: (optional) The observed latency percentile
+               (0-100) used as the hedge delay.
+        :param int window: (optional) The number of recent latencies kept per
+               operation.
+        :param int min_samples: (optional) The number of latencies needed
+               before the observed percentile replaces `delay`.
+        :param float max_extra_load: (optional) The maximum ratio of hedges to
+               calls.
+        :param Iterable[str] operations: (optional) The operation ids to hedge.
+        :param int max_workers: (optional) The number of threads sending hedged
+               requests. Size this to twice the expected concurrency.
+        """
+        if delay < 0:
+            raise ValueError('delay must not be negative')
+        if not 0 <= max_extra_load <= 1:
+            raise ValueError('max_extra_load must be between 0 and 1')
+        self.delay = delay
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.max_extra_load = max_extra_load
+        self.operations = frozenset(operations)
+        self.stats = HedgingStats()
+        self.max_workers = max_workers
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def attach(self, *services: BaseService) -> None:
+        """Hedge the configured operations of the given service clients."""
+        for service in services:
+            wrap_send(service, self._send)
+
+    def close(self) -> None:
+        """Wait for discarded requests to finish and stop the sending threads."""
+        self._executor.shutdown(wait=True)
+
+    def hedge_delay(self, operation_id: str) -> float:
+        """Return the current hedge delay for an operation."""
+        with self._lock:
+            samples = self._latencies.get(operation_id)
+            if samples is None or len(samples) < self.min_samples:
+                return self.delay
+            values = sorted(samples)
+        index = min(len(values) - 1, int(round(self.percentile / 100.0 * (len(values) - 1))))
+        return values[index]
+
+    def _record(self, operation_id: str, latency: float) -> None:
+        with self._lock:
+            samples = self._latencies.get(operation_id)
+            if samples is None:
+                samples = self._latencies[operation_id] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def _reserve_worker(self) -> bool:
+        # Called with the lock held.
+        if self._busy >= self.max_workers:
+            self.stats.saturated += 1
+            return False
+        self._busy += 1
+        return True
+
+    def _release_worker(self) -> None:
+        with self._lock:
+            self._busy -= 1
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self.stats.hedged + 1 > self.max_extra_load * self.stats.calls:
+                self.stats.denied += 1
+                return False
+            if not self._reserve_worker():
+                return False
+            self.stats.hedged += 1
+            return True
+
+    def _start(self, send: Callable, request: Dict, kwargs: Dict):
+        # Run a request on a reserved sending thread. Returns its future and
+        # an event set, with started['at'], when it begins.
+        started = {}
+        running = threading.Event()
+
+        def run() -> DetailedResponse:
+            started['at'] = time.perf_counter()
+            running.set()
+            try:
+                return send(request, **kwargs)
+            finally:
+                self._release_worker()
+
+        future = self._executor.submit(run)
+        future.add_done_callback(lambda f: f.cancelled() and self._release_worker())
+        return future, running, started
+
+    def _send(self, send: Callable, request: Dict, **kwargs) -> DetailedResponse:
+        _, _, operation_id = get_sdk_operation(request.get('headers'))
+        if kwargs.get('stream') or operation_id not in self.operations or \
+                not is_idempotent(request.get('method'), operation_id):
+            return send(request, **kwargs)
+        with self._lock:
+            self.stats.calls += 1
+            reserved = self._reserve_worker()
+        if not reserved:
+            start = time.perf_counter()
+            response = send(request, **kwargs)
+            self._record(operation_id, time.perf_counter() - start)
+            return response
+
+        primary, running, started = self._start(send, request, kwargs)
+        running.wait()
+        start = started['at']
+        remaining = start + self.hedge_delay(operation_id) - time.perf_counter()
+        done, _ = wait([primary], timeout=max(0.0, remaining))
+        if done or not self._take_hedge():
+            response = primary.result()
+            self._record(operation_id, time.perf_counter() - start)
+            return response
+
+        hedge, _, _ = self._start(send, request, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                self._record(operation_id, time.perf_counter() - start)
+                if future is hedge:
+                    with self._lock:
+                        self.stats.hedge_wins += 1
+                return future.result()
+        raise error
@@ -0,0 +1,325 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module compares two inventories of Global Search results and reports the
+resources added, removed and modified between them. Both inventories are
+sorted by CRN on disk, so memory use does not grow with their size.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+from operator import itemgetter
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+
+from .global_search_v2 import GlobalSearchV2
+from .streaming import stream_items
+
+# The number of records sorted in memory before they are written to a run.
+DEFAULT_MAX_RECORDS = 100000
+
+# The most runs merged at once; more are merged in several passes.
+MAX_FANIN = 128
+
+# A sorted record: the key, the digest of the compared fields, and the
+# document as JSON (empty when documents are not kept).
+Record = Tuple[str, str, str]
+
+_KEY = itemgetter(0)
+
+
+class ResourceChange():
+    """
+    A difference between two inventories found by `diff_snapshots`.
+
+    :attr str kind: One of `added`, `removed` or `modified`.
+    :attr str crn: The resource's CRN (or other key).
+    :attr dict old: The resource in the old inventory, if kept.
+    :attr dict new: The resource in the new inventory, if kept.
+    """
+
+    ADDED = 'added'
+    REMOVED = 'removed'
+    MODIFIED = 'modified'
+
+    def __init__(self, kind: str, crn: str, *, old: Dict = None, new: Dict = None) -> None:
+        self.kind = kind
+        self.crn = crn
+        self.old = old
+        self.new = new
+
+    def __eq__(self, other: 'ResourceChange') -> bool:
+        if not isinstance(other, self.__class__):
+            return False
+        return self.__dict__ == other.__dict__
+
+    def __repr__(self) -> str:
+        return 'ResourceChange({0!r}, {1!r})'.format(self.kind, self.crn)
+
+
+################################################################################
+# Snapshot files
+################################################################################
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def write_snapshot(items: Iterable[Dict], path: str) -> int:
+    """
+    Write an inventory as JSON lines, gzip compressed if `path` ends in `.gz`.
+
+    :param Iterable items: The resources, as dicts or models.
+    :param str path: The file to write.
+    :return: The number of resources written.
+    :rtype: int
+    """
+    count = 0
+    with _open(path, 'w') as out:
+        for item in items:
+            out.write(json.dumps(item if isinstance(item, dict) else item.to_dict()))
+            out.write('\n')
+            count += 1
+    return count
+
+
+def read_snapshot(path: str) -> Iterator[Dict]:
+    """Yield the resources of an inventory written by `write_snapshot`."""
+    with _open(path, 'r') as lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def search_inventory(service: GlobalSearchV2, *, query: str = '*', limit: int = 1000,
+                     **kwargs) -> Iterator[Dict]:
+    """
+    Yield every resource matched by a search, page by page.
+
+    Each page is decoded as it arrives, so only one item is held at a time.
+    Other arguments, such as `fields` or `account_id`, are passed to
+    `search`.
+    """
+    cursor = None
+    while True:
+        count = 0
+        with stream_items(service.search, query=query, limit=limit, search_cursor=cursor,
+                          model=None, **kwargs) as items:
+            for item in items:
+                count += 1
+                yield item
+        cursor = items.envelope.get('search_cursor')
+        if count < limit or not cursor:
+            return
+
+
+################################################################################
+# External sort
+################################################################################
+
+def _without(item: Dict, path: List[str]) -> Dict:
+    # A copy of item without the dotted path, sharing what is not on it.
+    head = path[0]
+    if head not in item:
+        return item
+    if len(path) == 1:
+        return {k: v for k, v in item.items() if k != head}
+    if not isinstance(item[head], dict):
+        return item
+    return dict(item, **{head: _without(item[head], path[1:])})
+
+
+def _record(item: object, key: str, ignore: List[List[str]], documents: bool) -> Record:
+    if not isinstance(item, dict):
+        item = item.to_dict()
+    crn = item.get(key)
+    if not isinstance(crn, str) or not crn:
+        raise ValueError('Every resource must have a {0}'.format(key))
+    compared = item
+    for path in ignore:
+        compared = _without(compared, path)
+    canonical = json.dumps(compared, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+    return (crn, digest, json.dumps(item, separators=(',', ':')) if documents else '')
+
+
+def _write_run(records: Iterable[Record], directory: str) -> str:
+    # Runs are tab-separated lines; keys and JSON never contain tabs or
+    # newlines. They are compressed lightly, as they are read back once.
+    fd, path = tempfile.mkstemp(prefix='inventory-', suffix='.run.gz', dir=directory)
+    os.close(fd)
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=1) as out:
+        for record in records:
+            out.write('\t'.join(record))
+            out.write('\n')
+    return path
+
+
+def _read_run(path: str) -> Iterator[Record]:
+    with gzip.open(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            yield tuple(line.rstrip('\n').split('\t', 2))
+
+
+def _unique(records: Iterable[Record]) -> Iterator[Record]:
+    # The first record of each key, in order.
+    last = None
+    for record in records:
+        if record[0] != last:
+            last = record[0]
+            yield record
+
+
+def sorted_records(items: Iterable[object], *, key: str = 'crn', ignore: Iterable[str] = (),
+                   documents: bool = True, max_records: int = DEFAULT_MAX_RECORDS,
+                   tmpdir: str = None) -> Iterator[Record]:
+    """
+    Yield the records of an inventory in key order, with one record per key.
+
+    At most `max_records` records are held in memory: larger inventories are
+    sorted in runs written to temporary files in `tmpdir`, which are merged
+    as they are read and removed afterwards. For resources that share a key,
+    the first one is kept.
+
+    :param Iterable items: The resources, as dicts or models.
+    :param str key: (optional) The property that identifies a resource.
+    :param Iterable[str] ignore: (optional) Dotted paths of properties left out
+           of the comparison, such as `doc.updated_at`.
+    :param bool documents: (optional) Whether to keep each resource's JSON,
+           or only its digest.
+    :param int max_records: (optional) The number of records sorted in memory.
+    :param str tmpdir: (optional) The directory for the runs.
+    :return: (key, digest, JSON) tuples.
+    """
+    if max_records < 1:
+        raise ValueError('max_records must be positive')
+    ignore = [path.split('.') for path in ignore]
+    runs = []
+    passes = []
+    readers = []
+    try:
+        buffer = []
+        for item in items:
+            buffer.append(_record(item, key, ignore, documents))
+            if len(buffer) >= max_records:
+                buffer.sort(key=_KEY)
+                runs.append(_write_run(buffer, tmpdir))
+                buffer = []
+        buffer.sort(key=_KEY)
+        if not runs:
+            yield from _unique(buffer)
+            return
+        if buffer:
+            runs.append(_write_run(buffer, tmpdir))
+        del buffer
+        while len(runs) > MAX_FANIN:
+            # Merge consecutive runs, so that the first of equal keys stays
+            # first.
+            passes, runs = runs, []
+            for start in range(0, len(passes), MAX_FANIN):
+                group = passes[start:start + MAX_FANIN]
+                runs.append(_write_run(heapq.merge(*[_read_run(run) for run in group],
+                                                   key=_KEY), tmpdir))
+                for run in group:
+                    os.remove(run)
+        readers = [_read_run(run) for run in runs]
+        yield from _unique(heapq.merge(*readers, key=_KEY))
+    finally:
+        for reader in readers:
+            reader.close()
+        for run in runs + passes:
+            try:
+                os.remove(run)
+            except OSError:
+                pass
+
+
+################################################################################
+# Diff
+################################################################################
+
+Snapshot = Union[str, Iterable[object]]
+
+
+def _source(snapshot: Snapshot) -> Iterable[object]:
+    if isinstance(snapshot, str):
+        return read_snapshot(snapshot)
+    return snapshot
+
+
+def _document(record: Record) -> Dict:
+    return json.loads(record[2]) if record[2] else None
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot, *, key: str = 'crn', ignore: Iterable[str] = (),
+                   documents: bool = True, max_records: int = DEFAULT_MAX_RECORDS,
+                   tmpdir: str = None) -> Iterator[ResourceChange]:
+    """
+    Yield the resources added, removed and modified between two inventories,
+    in key order.
+
+    For example, to compare today's resources with yesterday's:
+
+        today = search_inventory(search, fields=['*'])
+        for change in diff_snapshots('inventory-yesterday.jsonl.gz', today):
+            ...
+
+    Both inventories are sorted as described for `sorted_records`, and then
+    compared in a single pass.
+
+    :param old: The old inventory: a file written by `write_snapshot`, or an
+           iterable of dicts or models.
+    :param new: The new inventory, in the same forms.
+    :param str key: (optional) The property that identifies a resource.
+    :param Iterable[str] ignore: (optional) Dotted paths of properties whose
+           changes are not reported, such as `doc.updated_at`.
+    :param bool documents: (optional) Whether changes carry the resources;
+           leaving them out makes the temporary files much smaller.
+    :param int max_records: (optional) The number of records per inventory
+           sorted in memory.
+    :param str tmpdir: (optional) The directory for temporary files.
+    :return: The changes.
+    :rtype: Iterator[ResourceChange]
+    """
+    options = dict(key=key, ignore=ignore, documents=documents, max_records=max_records,
+                   tmpdir=tmpdir)
+    old_records = sorted_records(_source(old), **options)
+    new_records = sorted_records(_source(new), **options)
+    try:
+        before = next(old_records, None)
+        after = next(new_records, None)
+        while before is not None or after is not None:
+            if after is None or (before is not None and before[0] < after[0]):
+                yield ResourceChange(ResourceChange.REMOVED, before[0], old=_document(before))
+                before = next(old_records, None)
+            elif before is None or after[0] < before[0]:
+                yield ResourceChange(ResourceChange.ADDED, after[0], new=_document(after))
+                after = next(new_records, None)
+            else:
+                if before[1] != after[1]:
+                    yield ResourceChange(ResourceChange.MODIFIED, after[0],
+                                         old=_document(before), new=_document(after))
+                before = next(old_records, None)
+                after = next(new_records, None)
+    finally:
+        old_records.close()
+        new_records.close()
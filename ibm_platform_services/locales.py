@@ -0,0 +1,122 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides locale-pruned decoding of Global Catalog entries.
+"""
+
+from typing import Callable, Dict, Iterable, Union
+import json
+
+import requests
+from ibm_cloud_sdk_core import BaseService, DetailedResponse
+
+from .common import get_sdk_operation
+from .transport import wrap_send
+
+# The catalog operations whose entries carry per-language strings.
+DEFAULT_OPERATIONS = frozenset([
+    'get_catalog_entry',
+    'get_child_objects',
+    'list_catalog_entries',
+])
+
+# The object keys whose values are maps of language to translated strings:
+# `overview_ui` on each entry and `strings` in `metadata.ui`.
+LANGUAGE_MAP_KEYS = frozenset(['overview_ui', 'strings'])
+
+
+def _normalize(locale: str) -> str:
+    return locale.strip().lower().replace('_', '-')
+
+
+class LocalePruner():
+    """
+    A JSON decoder that keeps only the requested locales of catalog entries.
+
+    Pruning happens inside `json.loads`: when the parser assembles an object
+    holding a language map, the languages that were not requested are dropped
+    before the next sibling is parsed, so they are never held for the whole
+    response nor turned into model objects.
+
+    A requested locale keeps its exact match and its base language, so `fr-ca`
+    keeps `fr-ca` and `fr`; a requested base language `fr` also keeps every
+    `fr-*` region.
+    """
+
+    def __init__(self, locales: Iterable[str]) -> None:
+        """
+        Initialize a LocalePruner object.
+
+        :param Iterable[str] locales: The locales to keep, such as `en` or
+               `pt-br`.
+        """
+        requested = [_normalize(locale) for locale in locales]
+        if not requested:
+            raise ValueError('At least one locale must be provided')
+        self.locales = requested
+        self._exact = set(requested) | {locale.split('-')[0] for locale in requested}
+        self._bases = {locale for locale in requested if '-' not in locale}
+
+    def keeps(self, locale: str) -> bool:
+        """Return whether a language key is kept."""
+        locale = _normalize(locale)
+        return locale in self._exact or locale.split('-')[0] in self._bases
+
+    def _prune(self, languages: Dict) -> Dict:
+        return {key: value for key, value in languages.items() if self.keeps(key)}
+
+    def object_hook(self, result: Dict) -> Dict:
+        """Prune any language map held by a decoded JSON object."""
+        if 'overview_ui' not in result and 'strings' not in result:
+            return result
+        for key in LANGUAGE_MAP_KEYS.intersection(result):
+            languages = result[key]
+            if isinstance(languages, dict) and \
+                    all(isinstance(value, dict) for value in languages.values()):
+                result[key] = self._prune(languages)
+        return result
+
+    def loads(self, text: Union[str, bytes]) -> object:
+        """Decode a JSON document, keeping only the requested locales."""
+        if isinstance(text, bytes):
+            text = text.decode('utf-8')
+        return json.loads(text, object_hook=self.object_hook)
+
+    def decode(self, response: requests.Response) -> object:
+        """Decode the body of a response, keeping only the requested locales."""
+        if response.encoding is None:
+            return self.loads(response.content)
+        return self.loads(response.text)
+
+    def attach(self, *services: BaseService,
+               operations: Iterable[str] = DEFAULT_OPERATIONS) -> None:
+        """
+        Decode the responses of the given operations with locale pruning.
+
+        :param BaseService services: The Global Catalog clients.
+        :param Iterable[str] operations: (optional) The operation ids to prune.
+        """
+        operations = frozenset(operations)
+
+        def _send(send: Callable, request: Dict, **kwargs) -> DetailedResponse:
+            _, _, operation_id = get_sdk_operation(request.get('headers'))
+            if operation_id in operations:
+                kwargs.setdefault('decode', self.decode)
+            return send(request, **kwargs)
+
+        for service in services:
+            wrap_send(service, _send)
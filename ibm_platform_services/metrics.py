@@ -0,0 +1,308 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides in-process request metrics for the service clients:
+latency histograms, bytes sent and received, retries and requests in flight,
+labelled by service, operation id and status.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+import threading
+import time
+
+import requests
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
+
+from .common import get_sdk_operation
+from .transport import wrap_send
+
+# Upper bounds in seconds of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The status label of requests that failed without an HTTP response.
+ERROR_STATUS = 'error'
+
+
+class RequestMetrics():
+    """
+    The measurements of one request, as passed to the registry's listeners.
+
+    :attr str service: The service name, such as `global_catalog`.
+    :attr str operation_id: The operation id, such as `get_catalog_entry`.
+    :attr str status: The HTTP status code, or `error` without a response.
+    :attr float seconds: The time from sending the request to its response.
+    :attr int bytes_out: The size of the request body.
+    :attr int bytes_in: The size of the response body.
+    """
+
+    __slots__ = ('service', 'operation_id', 'status', 'seconds', 'bytes_out', 'bytes_in')
+
+    def __init__(self, service: str, operation_id: str, status: str, seconds: float,
+                 bytes_out: int, bytes_in: int) -> None:
+        self.service = service
+        self.operation_id = operation_id
+        self.status = status
+        self.seconds = seconds
+        self.bytes_out = bytes_out
+        self.bytes_in = bytes_in
+
+
+class _Series():
+    # The histogram and byte counters of one (service, operation, status).
+
+    __slots__ = ('counts', 'sum', 'count', 'bytes_out', 'bytes_in')
+
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+
+def _body_size(body) -> int:
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    # Streamed bodies are not read here; their length is known only if the
+    # object reports it.
+    try:
+        return len(body)
+    except TypeError:
+        return 0
+
+
+def _response_size(response: requests.Response) -> int:
+    # Prefer the size on the wire; the body may have been decompressed.
+    length = response.headers.get('Content-Length')
+    if length is not None:
+        try:
+            return int(length)
+        except ValueError:
+            pass
+    if not getattr(response, '_content_consumed', True):
+        # A streamed body has not been read; do not read it here.
+        return 0
+    return len(response.content or b'')
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    return '{' + ','.join('{0}="{1}"'.format(k, _escape(v)) for k, v in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry():
+    """
+    Record request metrics for the service clients it is attached to.
+
+    Each request is recorded once, with its latency in a histogram and its
+    body sizes in counters keyed by (service, operation id, status). When the
+    registry is attached before a RetryPolicy every attempt is recorded with
+    its own status; pass the registry as the policy's `metrics` to count
+    retries as well.
+
+    Recording takes one lock acquisition per request. Setting `enabled` to
+    false reduces the layer to a single attribute check.
+
+    :attr bool enabled: Whether requests are recorded.
+    :attr tuple buckets: The upper bounds of the latency histogram buckets.
+    """
+
+    def __init__(self, *, buckets: Iterable[float] = DEFAULT_BUCKETS, enabled: bool = True,
+                 namespace: str = 'ibm_platform_services',
+                 listeners: Iterable[Callable[[RequestMetrics], None]] = (),
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Initialize a MetricsRegistry object.
+
+        :param Iterable[float] buckets: (optional) The upper bounds in seconds
+               of the latency histogram buckets.
+        :param bool enabled: (optional) Whether to record requests.
+        :param str namespace: (optional) The prefix of the Prometheus metric
+               names.
+        :param Iterable[Callable] listeners: (optional) Functions called with
+               the RequestMetrics of every recorded request, for example to
+               forward them to a metrics backend.
+        """
+        self.buckets = tuple(sorted(buckets))
+        if not self.buckets:
+            raise ValueError('buckets must not be empty')
+        self.enabled = enabled
+        self.namespace = namespace
+        self.listeners = list(listeners)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._series = {}
+        self._retries = {}
+        self._in_flight = {}
+
+    def attach(self, *services: BaseService) -> None:
+        """Record the requests made by the given service clients."""
+        for service in services:
+            wrap_send(service, self._send)
+
+    def _send(self, send: Callable, request: Dict, **kwargs) -> DetailedResponse:
+        if not self.enabled:
+            return send(request, **kwargs)
+        service_name, _, operation_id = get_sdk_operation(request.get('headers'))
+        key = (service_name or '', operation_id or '')
+        with self._lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        received = []
+        inner_observe = kwargs.get('observe')
+
+        def observe(response: requests.Response) -> None:
+            received.append(response)
+            if inner_observe is not None:
+                inner_observe(response)
+
+        kwargs['observe'] = observe
+        start = self._clock()
+        status = ERROR_STATUS
+        try:
+            response = send(request, **kwargs)
+            status = str(response.get_status_code())
+            return response
+        except ApiException as err:
+            if err.code:
+                status = str(err.code)
+            if err.http_response is not None:
+                received.append(err.http_response)
+            raise
+        finally:
+            self.observe(key[0], key[1], status, self._clock() - start,
+                         bytes_out=_body_size(request.get('data')),
+                         bytes_in=_response_size(received[-1]) if received else 0,
+                         _finished=True)
+
+    def observe(self, service: str, operation_id: str, status: str, seconds: float, *,
+                bytes_out: int = 0, bytes_in: int = 0, _finished: bool = False) -> None:
+        """Record one request."""
+        index = bisect_left(self.buckets, seconds)
+        key = (service, operation_id, str(status))
+        with self._lock:
+            if _finished:
+                self._in_flight[key[:2]] -= 1
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+            series.counts[index] += 1
+            series.sum += seconds
+            series.count += 1
+            series.bytes_out += bytes_out
+            series.bytes_in += bytes_in
+        if self.listeners:
+            metrics = RequestMetrics(service, operation_id, key[2], seconds, bytes_out, bytes_in)
+            for listener in self.listeners:
+                listener(metrics)
+
+    def retry(self, service: str, operation_id: str) -> None:
+        """Count a retry of an operation."""
+        key = (service or '', operation_id or '')
+        with self._lock:
+            self._retries[key] = self._retries.get(key, 0) + 1
+
+    def reset(self) -> None:
+        """Discard everything recorded, except requests still in flight."""
+        with self._lock:
+            self._series = {}
+            self._retries = {}
+
+    def snapshot(self) -> Dict:
+        """
+        Return a json dictionary of everything recorded.
+
+        Histogram bucket counts are cumulative, as in Prometheus.
+        """
+        with self._lock:
+            series = [(key, list(s.counts), s.sum, s.count, s.bytes_out, s.bytes_in)
+                      for key, s in self._series.items()]
+            retries = dict(self._retries)
+            in_flight = dict(self._in_flight)
+        requests = []
+        for (service, operation_id, status), counts, total, count, bytes_out, bytes_in in sorted(series):
+            cumulative, buckets = 0, []
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                buckets.append([bound, cumulative])
+            requests.append({
+                'service': service,
+                'operation_id': operation_id,
+                'status': status,
+                'count': count,
+                'sum_seconds': total,
+                'buckets': buckets,
+                'bytes_out': bytes_out,
+                'bytes_in': bytes_in,
+            })
+        return {
+            'requests': requests,
+            'retries': [{'service': s, 'operation_id': o, 'count': c}
+                        for (s, o), c in sorted(retries.items())],
+            'in_flight': [{'service': s, 'operation_id': o, 'count': c}
+                          for (s, o), c in sorted(in_flight.items())],
+        }
+
+    def to_prometheus(self) -> str:
+        """Return everything recorded in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        prefix = self.namespace + '_' if self.namespace else ''
+        lines = []
+
+        def family(name: str, kind: str, help_text: str) -> str:
+            lines.append('# HELP {0}{1} {2}'.format(prefix, name, help_text))
+            lines.append('# TYPE {0}{1} {2}'.format(prefix, name, kind))
+            return prefix + name
+
+        def request_labels(item: Dict) -> List[Tuple[str, str]]:
+            return [('service', item['service']), ('operation', item['operation_id']),
+                    ('status', item['status'])]
+
+        name = family('request_duration_seconds', 'histogram', 'Request latency in seconds.')
+        for item in snapshot['requests']:
+            labels = request_labels(item)
+            for bound, count in item['buckets']:
+                lines.append('{0}_bucket{1} {2}'.format(
+                    name, _labels(labels + [('le', _number(bound))]), count))
+            lines.append('{0}_sum{1} {2}'.format(name, _labels(labels), _number(item['sum_seconds'])))
+            lines.append('{0}_count{1} {2}'.format(name, _labels(labels), item['count']))
+        for field, metric, help_text in (('bytes_out', 'request_bytes_total', 'Request body bytes sent.'),
+                                         ('bytes_in', 'response_bytes_total', 'Response body bytes received.')):
+            name = family(metric, 'counter', help_text)
+            for item in snapshot['requests']:
+                lines.append('{0}{1} {2}'.format(name, _labels(request_labels(item)), item[field]))
+        for field, metric, kind, help_text in (('retries', 'retries_total', 'counter', 'Retries sent.'),
+                                               ('in_flight', 'requests_in_flight', 'gauge',
+                                                'Requests waiting for a response.')):
+            name = family(metric, kind, help_text)
+            for item in snapshot[field]:
+                labels = [('service', item['service']), ('operation', item['operation_id'])]
+                lines.append('{0}{1} {2}'.format(name, _labels(labels), item['count']))
+        return '\n'.join(lines) + '\n'
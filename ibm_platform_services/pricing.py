@@ -0,0 +1,394 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a cached bulk fetch of Global Catalog pricing and a
+vectorised cost estimator over it.
+
+The estimator requires numpy, which is installed with the `pricing` extra:
+`pip install ibm-platform-services[pricing]`.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import threading
+import time
+
+from .common import get_sdk_headers
+from .global_catalog_v1 import Amount, GlobalCatalogV1, Metrics, PricingGet
+
+try:
+    import numpy as np
+except ImportError: # pragma: no cover
+    np = None
+
+# Every unit is charged at the price of the tier it falls in.
+GRADUATED = 'graduated'
+# Every unit is charged at the price of the tier the total quantity reaches.
+VOLUME = 'volume'
+# A flat charge set by the tier the total quantity reaches.
+STEP = 'step'
+
+TIER_MODELS = {
+    'linear': VOLUME,
+    'granular tier': GRADUATED,
+    'simple tier': VOLUME,
+    'step tier': STEP,
+    'block tier': STEP,
+}
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError('The pricing engine requires numpy: '
+                          'pip install ibm-platform-services[pricing]')
+
+
+def normalize_tier_model(tier_model: str) -> str:
+    """Return the charging rule of a catalog tier model, `volume` if unknown."""
+    if not tier_model:
+        return VOLUME
+    name = tier_model.strip().lower().replace('_', ' ').replace('-', ' ')
+    if name in (GRADUATED, VOLUME, STEP):
+        return name
+    return TIER_MODELS.get(name, VOLUME)
+
+
+def _unit_quantity(metrics: Metrics) -> float:
+    try:
+        quantity = float(metrics.charge_unit_quantity)
+    except (TypeError, ValueError):
+        return 1.0
+    return quantity if quantity > 0 else 1.0
+
+
+def _tiers(amount: Amount) -> List[Tuple[float, float]]:
+    tiers = [(float(p.quantity_tier) if p.quantity_tier is not None else float('inf'),
+              float(p.price or 0)) for p in amount.prices or []]
+    tiers.sort(key=lambda tier: tier[0])
+    if tiers:
+        tiers[-1] = (float('inf'), tiers[-1][1])
+    return tiers
+
+
+def naive_cost(metrics: Metrics, quantity: float, *, country: str = 'USA',
+               currency: str = 'USD') -> float:
+    """
+    Return the cost of a quantity for one metric, walking the pricing objects.
+
+    This is the reference for `MetricTable.cost` and is kept for comparison.
+    """
+    amount = next((a for a in metrics.amounts or []
+                   if a.country == country and a.currency == currency), None)
+    if amount is None:
+        raise KeyError((metrics.metric_id, country, currency))
+    tiers = _tiers(amount)
+    if not tiers:
+        return 0.0
+    units = quantity / _unit_quantity(metrics)
+    model = normalize_tier_model(metrics.tier_model)
+    if model == GRADUATED:
+        cost = 0.0
+        lower = 0.0
+        for upper, price in tiers:
+            if units <= lower:
+                break
+            cost += (min(units, upper) - lower) * price
+            lower = upper
+        return cost
+    price = next(price for upper, price in tiers if units <= upper)
+    return price if model == STEP else units * price
+
+
+class MetricTable():
+    """
+    The prices of one metric flattened into arrays.
+
+    The tier boundaries of all the metric's amounts are merged into one sorted
+    `bounds` array (upper bounds in charge units, the last one infinite), and
+    `prices` holds one row per (country, currency) with the unit price of each
+    segment between consecutive bounds. Splitting a tier into segments that
+    share its price does not change any cost, so every amount can use the same
+    bounds.
+
+    :attr str metric_id: The metric ID.
+    :attr str model: The charging rule: `graduated`, `volume` or `step`.
+    :attr float unit_quantity: The quantity in one charge unit.
+    :attr ndarray bounds: The segment upper bounds, shape (segments,).
+    :attr ndarray prices: The segment prices, shape (amounts, segments).
+    :attr dict rows: The row of `prices` for each (country, currency).
+    """
+
+    def __init__(self, metrics: Metrics) -> None:
+        _require_numpy()
+        self.metric_id = metrics.metric_id
+        self.model = normalize_tier_model(metrics.tier_model)
+        self.unit_quantity = _unit_quantity(metrics)
+        self.rows = {}
+        tiers = []
+        for amount in metrics.amounts or []:
+            amount_tiers = _tiers(amount)
+            if amount_tiers:
+                self.rows[(amount.country, amount.currency)] = len(tiers)
+                tiers.append(amount_tiers)
+        self.bounds = np.unique([upper for amount_tiers in tiers for upper, _ in amount_tiers]
+                                or [np.inf])
+        self.prices = np.zeros((len(tiers), len(self.bounds)))
+        for row, amount_tiers in enumerate(tiers):
+            uppers = np.array([upper for upper, _ in amount_tiers])
+            values = np.array([price for _, price in amount_tiers])
+            self.prices[row] = values[np.searchsorted(uppers, self.bounds, side='left')]
+        self.lowers = np.concatenate(([0.0], self.bounds[:-1]))
+        self.widths = self.bounds - self.lowers
+
+    def row(self, country: str, currency: str) -> 'np.ndarray':
+        """Return the segment prices for a country and currency."""
+        try:
+            return self.prices[self.rows[(country, currency)]]
+        except KeyError:
+            raise KeyError((self.metric_id, country, currency))
+
+    def cost(self, quantities: Sequence[float], *, country: str = 'USA',
+             currency: str = 'USD') -> 'np.ndarray':
+        """
+        Return the cost of each quantity.
+
+        :param Sequence[float] quantities: The usage quantities, in the
+               metric's raw units.
+        :param str country: (optional) The country of the price.
+        :param str currency: (optional) The currency of the price.
+        :return: An array of costs with the shape of `quantities`.
+        """
+        prices = self.row(country, currency)
+        units = np.asarray(quantities, dtype=float) / self.unit_quantity
+        if self.model == GRADUATED:
+            filled = np.clip(units[..., np.newaxis] - self.lowers, 0, self.widths)
+            return filled.dot(prices)
+        index = np.minimum(np.searchsorted(self.bounds, units, side='left'), len(self.bounds) - 1)
+        if self.model == STEP:
+            return prices[index]
+        return units * prices[index]
+
+
+class PricingEngine():
+    """
+    Estimate costs for large batches of usage records against a plan's pricing.
+
+    The plan's `Metrics`, `Amount` and `Price` objects are flattened once into
+    one `MetricTable` per metric, and costs are then computed for whole usage
+    arrays with numpy instead of per record in Python.
+    """
+
+    def __init__(self, pricing: PricingGet) -> None:
+        """
+        Initialize a PricingEngine object.
+
+        :param PricingGet pricing: The plan's pricing, as returned by
+               `get_pricing`.
+        """
+        _require_numpy()
+        self.tables = {}
+        for metrics in pricing.metrics or []:
+            if metrics.metric_id is not None:
+                self.tables[metrics.metric_id] = MetricTable(metrics)
+
+    @classmethod
+    def from_dict(cls, _dict: Dict) -> 'PricingEngine':
+        """Initialize a PricingEngine from a `get_pricing` result."""
+        return cls(PricingGet.from_dict(_dict))
+
+    def cost(self, metric_id: str, quantities: Sequence[float], *,
+             country: str = 'USA', currency: str = 'USD') -> 'np.ndarray':
+        """Return the cost of each quantity of one metric."""
+        if metric_id not in self.tables:
+            raise KeyError(metric_id)
+        return self.tables[metric_id].cost(quantities, country=country, currency=currency)
+
+    def costs(self, metric_ids: Sequence[str], quantities: Sequence[float], *,
+              country: str = 'USA', currency: str = 'USD') -> 'np.ndarray':
+        """
+        Return the cost of each usage record, given as parallel arrays.
+
+        :param Sequence[str] metric_ids: The metric of each record.
+        :param Sequence[float] quantities: The quantity of each record.
+        :return: An array with the cost of each record.
+        """
+        metric_ids = np.asarray(metric_ids)
+        quantities = np.asarray(quantities, dtype=float)
+        if metric_ids.shape != quantities.shape:
+            raise ValueError('metric_ids and quantities must have the same shape')
+        result = np.zeros(quantities.shape)
+        names, inverse = np.unique(metric_ids, return_inverse=True)
+        inverse = inverse.reshape(quantities.shape)
+        for index, name in enumerate(names):
+            selected = inverse == index
+            result[selected] = self.cost(str(name), quantities[selected],
+                                         country=country, currency=currency)
+        return result
+
+    def total(self, metric_ids: Sequence[str], quantities: Sequence[float], *,
+              country: str = 'USA', currency: str = 'USD') -> float:
+        """Return the total cost of the usage records."""
+        return float(self.costs(metric_ids, quantities, country=country,
+                                currency=currency).sum())
+
+
+class PricingCache():
+    """
+    Fetch plan pricing in parallel and cache it per (plan id, account).
+
+    A cached `PricingGet` expires after `ttl` seconds, or earlier when one of
+    its metrics stops being effective (`effective_until`) or a metric becomes
+    effective (`effective_from`) before then, so a scheduled price change is
+    picked up when it happens. Concurrent requests for the same key share one
+    call.
+    """
+
+    def __init__(self, service: GlobalCatalogV1, *, ttl: float = 3600,
+                 max_workers: int = 16, page_size: int = 100,
+                 clock: Callable[[], float] = time.time) -> None:
+        """
+        Initialize a PricingCache object.
+
+        :param GlobalCatalogV1 service: The Global Catalog client.
+        :param float ttl: (optional) The longest time in seconds a pricing is
+               cached.
+        :param int max_workers: (optional) The number of concurrent calls.
+        :param int page_size: (optional) The number of plans listed per call.
+        :param Callable clock: (optional) Returns the current Unix time.
+        """
+        if ttl < 0:
+            raise ValueError('ttl must not be negative')
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        if page_size < 1:
+            raise ValueError('page_size must be at least 1')
+        self.service = service
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.clock = clock
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def expires_at(self, pricing: PricingGet, now: float) -> float:
+        """Return the Unix time at which a pricing fetched at `now` expires."""
+        expiry = now + self.ttl
+        for metrics in pricing.metrics or []:
+            for boundary in (metrics.effective_from, metrics.effective_until):
+                if boundary is not None and now < boundary.timestamp() < expiry:
+                    expiry = boundary.timestamp()
+        return expiry
+
+    def invalidate(self, id: str = None, *, account: str = None) -> None:
+        """Drop one cached pricing, or all of them when no id is given."""
+        with self._lock:
+            if id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((id, account), None)
+
+    def _fetch(self, key: Tuple[str, str], future: Future) -> None:
+        id, account = key
+        try:
+            result = self.service.get_pricing(id, account=account).get_result()
+            pricing = PricingGet.from_dict(result or {})
+            now = self.clock()
+            with self._lock:
+                self._entries[key] = (pricing, self.expires_at(pricing, now))
+            future.set_result(pricing)
+        except Exception as err: # pylint: disable=broad-except
+            future.set_exception(err)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _lookup(self, key: Tuple[str, str]) -> Tuple[Future, bool]:
+        # Return a future for the key and whether the caller must fetch it.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() < entry[1]:
+                future = Future()
+                future.set_result(entry[0])
+                return future, False
+            if key in self._inflight:
+                return self._inflight[key], False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def get_pricing(self, id: str, *, account: str = None) -> PricingGet:
+        """Return the pricing of a plan, from the cache when fresh."""
+        if id is None:
+            raise ValueError('id must be provided')
+        key = (id, account)
+        future, fetch = self._lookup(key)
+        if fetch:
+            self._fetch(key, future)
+        return future.result()
+
+    def get_pricing_many(self, ids: Iterable[str], *,
+                         account: str = None) -> Dict[str, PricingGet]:
+        """
+        Return the pricing of many plans, fetching the missing ones in parallel.
+
+        :param Iterable[str] ids: The plan ids.
+        :param str account: (optional) This changes the scope of the requests
+               regardless of the authorization header.
+        :return: A dict of `PricingGet` keyed by plan id.
+        :raises ApiException: The first error raised by a call, after all calls
+                have completed.
+        """
+        futures = {}
+        misses = []
+        for id in ids:
+            if id in futures:
+                continue
+            futures[id], fetch = self._lookup((id, account))
+            if fetch:
+                misses.append(id)
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(misses))) as executor:
+                for id in misses:
+                    executor.submit(self._fetch, (id, account), futures[id])
+        return {id: future.result() for id, future in futures.items()}
+
+    def get_service_pricing(self, service_id: str, *,
+                            account: str = None) -> Dict[str, PricingGet]:
+        """Return the pricing of every plan under a service, keyed by plan id."""
+        return self.get_pricing_many(self._plan_ids(service_id, account), account=account)
+
+    def _plan_ids(self, service_id: str, account: str) -> List[str]:
+        # get_child_objects has no paging parameters, so the pages are
+        # requested directly. Only the ids are needed, so the entries are not
+        # decoded.
+        plan_ids = []
+        offset = 0
+        url = '/{0}/{1}'.format(*self.service.encode_path_vars(service_id, 'plan'))
+        while True:
+            headers = get_sdk_headers(service_name=self.service.DEFAULT_SERVICE_NAME,
+                                      service_version='V1',
+                                      operation_id='get_child_objects')
+            request = self.service.prepare_request(method='GET', url=url, headers=headers,
+                                                   params={'account': account, '_offset': offset,
+                                                           '_limit': self.page_size})
+            result = self.service.send(request).get_result() or {}
+            page = result.get('resources') or []
+            plan_ids.extend(plan.get('id') for plan in page if plan.get('id'))
+            offset += len(page)
+            count = result.get('count')
+            if len(page) < self.page_size or (count is not None and offset >= count):
+                return plan_ids
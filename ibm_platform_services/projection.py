@@ -0,0 +1,376 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides field projections for the service clients: attribute
+paths checked against the model classes, turned into the `include` parameter
+of Global Catalog or the `fields` parameter of Global Search, and a planner
+that derives them from the attributes a warm-up run actually read.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import inspect
+import sys
+import threading
+
+Path = Tuple[str, ...]
+
+
+def _is_model(cls: object) -> bool:
+    return inspect.isclass(cls) and hasattr(cls, 'from_dict') and hasattr(cls, 'to_dict')
+
+
+# The projection of all properties, for both parameters.
+ALL = '*'
+
+# The type of attributes that hold free-form JSON objects.
+OPEN = dict
+
+
+def _resolve(cls: type, annotation: object) -> Optional[type]:
+    # Annotations are classes, forward references by name, or List[...] of
+    # either. Returns the model class, OPEN for free-form values, or None for
+    # plain values.
+    annotation = getattr(annotation, '__forward_arg__', annotation)
+    if isinstance(annotation, str):
+        annotation = getattr(sys.modules[cls.__module__], annotation, None)
+    args = getattr(annotation, '__args__', None)
+    origin = getattr(annotation, '__origin__', None)
+    if args and origin in (list, List):
+        return _resolve(cls, args[0])
+    if _is_model(annotation):
+        return annotation
+    if annotation in (dict, Dict, object) or origin in (dict, Dict):
+        return OPEN
+    return None
+
+
+_attributes_cache = {}
+_attributes_lock = threading.Lock()
+
+
+class _Marker():
+    # Stands in for an attribute value when a model is serialized, and passes
+    # through what a generated `to_dict` does with nested models, lists and
+    # dates.
+
+    __slots__ = ('name',)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def to_dict(self) -> '_Marker':
+        return self
+
+    def __iter__(self):
+        return iter([self])
+
+
+def _json_keys(cls: type, attributes: Iterable[str]) -> Dict[str, str]:
+    # The JSON property of each attribute, found by serializing an instance
+    # whose attributes are markers: most are the same, but some are not
+    # (`price` is `Price`).
+    instance = cls.__new__(cls)
+    for name in attributes:
+        setattr(instance, name, _Marker(name))
+    keys = {}
+    try:
+        serialized = instance.to_dict()
+    except Exception as err: # pylint: disable=broad-except
+        raise ValueError('Cannot find the JSON properties of {0}: {1}'.format(cls.__name__, err))
+    for key, value in serialized.items():
+        if isinstance(value, list) and len(value) == 1:
+            value = value[0]
+        if isinstance(value, _Marker):
+            keys[value.name] = key
+    missing = sorted(set(attributes) - set(keys))
+    if missing:
+        raise ValueError('Cannot find the JSON properties of {0}: {1}'.format(
+            cls.__name__, ', '.join(missing)))
+    return keys
+
+
+def _describe(cls: type) -> Tuple[Dict[str, Optional[type]], bool, Dict[str, str]]:
+    with _attributes_lock:
+        cached = _attributes_cache.get(cls)
+    if cached is not None:
+        return cached
+    attributes = {}
+    open_ended = False
+    for name, parameter in inspect.signature(cls.__init__).parameters.items():
+        if name == 'self':
+            continue
+        if parameter.kind == parameter.VAR_KEYWORD:
+            open_ended = True
+            continue
+        attributes[name] = _resolve(cls, parameter.annotation)
+    cached = (attributes, open_ended, _json_keys(cls, attributes))
+    with _attributes_lock:
+        _attributes_cache[cls] = cached
+    return cached
+
+
+def model_attributes(cls: type) -> Tuple[Dict[str, Optional[type]], bool]:
+    """
+    Return the attributes of a model class, mapped to their model class, OPEN
+    or None, and whether the model accepts other attributes.
+    """
+    attributes, open_ended, _ = _describe(cls)
+    return attributes, open_ended
+
+
+def json_key(cls: type, name: str) -> str:
+    """Return the JSON property that holds an attribute of a model class."""
+    return _describe(cls)[2].get(name, name)
+
+
+class FieldPath():
+    """
+    An attribute path of a model, built by attribute access and checked
+    against the model classes:
+
+        project(CatalogEntry).metadata.pricing
+
+    Attributes of models that accept arbitrary properties, such as the search
+    ResultItem, are not checked. The path holds the JSON property names that
+    the `include` and `fields` parameters expect, which differ from the
+    attribute names for a few properties (`metrics.amounts.prices.price` is
+    `metrics.amounts.prices.Price`).
+
+    :attr type model: The root model class.
+    :attr tuple path: The JSON property names, outermost first.
+    """
+
+    def __init__(self, model: type, path: Path = (), *, _current: type = None) -> None:
+        self.model = model
+        self.path = path
+        # The model class at the end of the path, OPEN, or None for a plain
+        # value.
+        self._current = _current if path else model
+
+    def __getattr__(self, name: str) -> 'FieldPath':
+        if name.startswith('_'):
+            raise AttributeError(name)
+        current = self._current
+        if current is None:
+            raise AttributeError('{0} is not an object'.format(self))
+        child = OPEN
+        key = name
+        if current is not OPEN:
+            attributes, open_ended = model_attributes(current)
+            if name in attributes:
+                child = attributes[name]
+                key = json_key(current, name)
+            elif not open_ended:
+                raise AttributeError('{0} has no attribute {1!r}'.format(current.__name__, name))
+        return FieldPath(self.model, self.path + (key,), _current=child)
+
+    def __str__(self) -> str:
+        return '.'.join(self.path)
+
+    def __repr__(self) -> str:
+        return 'FieldPath({0}, {1!r})'.format(self.model.__name__, str(self))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FieldPath) and (self.model, self.path) == (other.model, other.path)
+
+    def __hash__(self) -> int:
+        return hash((self.model, self.path))
+
+
+def project(model: type) -> FieldPath:
+    """Return the root path of a model, from which attribute paths are built."""
+    if not _is_model(model):
+        raise ValueError('model must be a model class')
+    return FieldPath(model)
+
+
+def _as_path(path: Union[FieldPath, str, Path]) -> Path:
+    if isinstance(path, FieldPath):
+        return path.path
+    if isinstance(path, str):
+        return tuple(part for part in path.split('.') if part)
+    return tuple(path)
+
+
+def normalize_paths(paths: Iterable[Union[FieldPath, str, Path]], *,
+                    max_depth: int = None) -> List[str]:
+    """
+    Return the dotted paths, truncated to `max_depth`, without duplicates or
+    paths already covered by a shorter one, in sorted order.
+    """
+    kept = set()
+    for path in sorted({_as_path(p)[:max_depth] if max_depth else _as_path(p) for p in paths},
+                       key=len):
+        if path and not any(path[:length] in kept for length in range(1, len(path))):
+            kept.add(path)
+    return sorted('.'.join(path) for path in kept)
+
+
+def include_param(*paths: Union[FieldPath, str], max_depth: int = None) -> Optional[str]:
+    """
+    Return the Global Catalog `include` value for the given paths, such as
+    `metadata.pricing:metadata.ui`, or None when there are no paths.
+    """
+    normalized = normalize_paths(paths, max_depth=max_depth)
+    return ':'.join(normalized) if normalized else None
+
+
+def fields_param(*paths: Union[FieldPath, str], max_depth: int = None) -> Optional[List[str]]:
+    """Return the Global Search `fields` value for the given paths, or None."""
+    normalized = normalize_paths(paths, max_depth=max_depth)
+    return normalized or None
+
+
+################################################################################
+# Warm-up recording
+################################################################################
+
+class _Recorder():
+    # A view of a result that records the paths read through it. Models are
+    # read by attribute and dicts by key; nested models, dicts and lists of
+    # them are wrapped in turn. Using a value as a whole (truth test,
+    # comparison, iteration of a dict, to_dict) records its own path.
+
+    __slots__ = ('_target', '_path', '_planner')
+
+    def __init__(self, target: object, path: Path, planner: 'ProjectionPlanner') -> None:
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_path', path)
+        object.__setattr__(self, '_planner', planner)
+
+    def _child(self, name: str, value: object) -> object:
+        path = self._path + (name,)
+        if _is_model(type(value)) or isinstance(value, dict):
+            return _Recorder(value, path, self._planner)
+        if isinstance(value, list) and any(_is_model(type(v)) or isinstance(v, dict) for v in value):
+            return [_Recorder(v, path, self._planner) if _is_model(type(v)) or isinstance(v, dict)
+                    else v for v in value]
+        self._planner.record(path)
+        return value
+
+    def _whole(self) -> object:
+        self._planner.record(self._path)
+        return self._target
+
+    def __getattr__(self, name: str) -> object:
+        value = getattr(self._target, name)
+        if callable(value) and not _is_model(type(value)):
+            # A method such as to_dict uses the whole object.
+            self._planner.record(self._path)
+            return value
+        target_type = type(self._target)
+        return self._child(json_key(target_type, name) if _is_model(target_type) else name, value)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        setattr(self._target, name, value)
+
+    def __getitem__(self, key: str) -> object:
+        return self._child(key, self._target[key])
+
+    def get(self, key: str, default: object = None) -> object:
+        if isinstance(self._target, dict):
+            if key not in self._target:
+                self._planner.record(self._path + (key,))
+                return default
+            return self._child(key, self._target[key])
+        return self.__getattr__('get')(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        self._planner.record(self._path + (key,))
+        return key in self._target
+
+    def __iter__(self):
+        return iter(self._whole())
+
+    def __len__(self) -> int:
+        return len(self._whole())
+
+    def __bool__(self) -> bool:
+        return bool(self._whole())
+
+    def __eq__(self, other: object) -> bool:
+        return self._whole() == other
+
+    def __hash__(self) -> int:
+        return hash(self._whole())
+
+    def __str__(self) -> str:
+        return str(self._whole())
+
+    def __repr__(self) -> str:
+        return repr(self._whole())
+
+
+class ProjectionPlanner():
+    """
+    Derive a projection from the attributes that code reads during a warm-up.
+
+    Wrap results fetched without a projection (for example with
+    `include='*'`), run the code that consumes them, then use `include` or
+    `fields` for the following calls:
+
+        planner = ProjectionPlanner()
+        for entry in warm_up_entries:
+            summarize(planner.wrap(entry))
+        include = planner.include()
+
+    Wrapped values behave like the originals for reading. Paths are recorded
+    relative to the wrapped value; using the wrapped value as a whole (for
+    example calling its `to_dict`) projects everything, as `*`.
+
+    :attr set paths: The recorded attribute paths.
+    """
+
+    def __init__(self) -> None:
+        self.paths = set()
+        self.everything = False
+        self._lock = threading.Lock()
+
+    def wrap(self, result: object) -> object:
+        """Return a recording view of a model instance or a result dict."""
+        return _Recorder(result, (), self)
+
+    def record(self, path: Path) -> None:
+        """Record that a path was read."""
+        with self._lock:
+            if path:
+                self.paths.add(tuple(path))
+            else:
+                self.everything = True
+
+    def include(self, *, max_depth: int = 2) -> Optional[str]:
+        """Return the Global Catalog `include` value covering the recorded paths."""
+        with self._lock:
+            if self.everything:
+                return ALL
+            paths = set(self.paths)
+        return include_param(*paths, max_depth=max_depth)
+
+    def fields(self, *, max_depth: int = None) -> Optional[List[str]]:
+        """Return the Global Search `fields` value covering the recorded paths."""
+        with self._lock:
+            if self.everything:
+                return [ALL]
+            paths = set(self.paths)
+        return fields_param(*paths, max_depth=max_depth)
+
+    def reset(self) -> Set[Path]:
+        """Forget the recorded paths and return them."""
+        with self._lock:
+            paths, self.paths = self.paths, set()
+            self.everything = False
+        return paths
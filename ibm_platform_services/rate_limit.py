@@ -0,0 +1,271 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a client-side token-bucket rate limiter for the service
+clients, which adapts to the rate-limit hints returned by the server.
+"""
+
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+import datetime
+import threading
+import time
+
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
+
+from .common import get_sdk_operation
+from .transport import wrap_send
+
+
+class TokenBucket():
+    """
+    A thread-safe token bucket.
+
+    Tokens are added at `rate` per second up to `burst`. The effective rate is
+    lowered when the server signals throttling and recovers gradually towards
+    the configured rate as requests succeed.
+
+    :attr float rate: The configured rate in requests per second.
+    :attr float burst: The bucket capacity.
+    :attr float current_rate: The effective rate after adaptation.
+    """
+
+    def __init__(self, rate: float, *, burst: float = None, min_rate: float = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        """
+        Initialize a TokenBucket object.
+
+        :param float rate: The number of requests allowed per second.
+        :param float burst: (optional) The number of requests that may be sent
+               back to back. Defaults to `rate`, with a minimum of 1.
+        :param float min_rate: (optional) The lowest rate adaptation may go to.
+               Defaults to 5% of `rate`.
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else max(1.0, self.rate)
+        self.min_rate = float(min_rate) if min_rate is not None else self.rate * 0.05
+        self.current_rate = self.rate
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.current_rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Take one token, waiting until one is available.
+
+        :return: The time spent waiting in seconds.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                else:
+                    delay = (1.0 - self._tokens) / self.current_rate
+            self._sleep(delay)
+            waited += delay
+
+    def block_for(self, seconds: float) -> None:
+        """Hold back all requests for the given number of seconds."""
+        with self._lock:
+            now = self._clock()
+            self._blocked_until = max(self._blocked_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = now
+
+    def throttled(self) -> None:
+        """Halve the effective rate after the server rejected a request."""
+        with self._lock:
+            self._refill(self._clock())
+            self.current_rate = max(self.min_rate, self.current_rate / 2.0)
+
+    def succeeded(self) -> None:
+        """Raise the effective rate back towards the configured rate."""
+        if self.current_rate >= self.rate:
+            return
+        with self._lock:
+            self._refill(self._clock())
+            self.current_rate = min(self.rate, self.current_rate + self.rate * 0.05)
+
+    def limit_to(self, rate: float) -> None:
+        """Cap the effective rate, as advertised by the server."""
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        with self._lock:
+            self._refill(self._clock())
+            self.current_rate = min(self.rate, rate)
+
+
+def parse_retry_after(value: str, *, now: datetime.datetime = None) -> Optional[float]:
+    """
+    Return the number of seconds in a Retry-After header value, which is either
+    a number of seconds or an HTTP date. Returns None if the value is invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class RateLimiter():
+    """
+    A client-side rate limiter for the service clients.
+
+    Limits are configured per service and, optionally, per operation id (the
+    `operation_id` each service method passes to `get_sdk_headers`). A limit
+    for an operation takes precedence over the limit for its service, which
+    takes precedence over the default limit. Requests without a matching limit
+    are not throttled.
+
+    The limiter adapts to the server: a 429 response blocks the bucket for the
+    `Retry-After` interval and halves its rate, `X-RateLimit-Remaining` and
+    `X-RateLimit-Reset` response headers cap the rate so the remaining quota
+    lasts until the reset, and successful calls restore the rate gradually.
+    The 429 is still raised to the caller; combine the limiter with a retry
+    layer added after it to resend the request.
+    """
+
+    def __init__(self, *, default_rate: float = None, default_burst: float = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        """
+        Initialize a RateLimiter object.
+
+        :param float default_rate: (optional) The rate in requests per second
+               applied to each service without its own limit.
+        :param float default_burst: (optional) The burst size for the default
+               limit.
+        """
+        self._limits = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._sleep = sleep
+        if default_rate is not None:
+            self._limits[(None, None)] = (default_rate, default_burst)
+
+    def set_limit(self, service_name: str, rate: float, *, operation_id: str = None,
+                  burst: float = None) -> None:
+        """
+        Set the rate limit for a service, or for one operation of a service.
+
+        :param str service_name: The service name, for example
+               `GlobalTaggingV1.DEFAULT_SERVICE_NAME`.
+        :param float rate: The number of requests allowed per second.
+        :param str operation_id: (optional) The operation id, for example
+               `attach_tag`.
+        :param float burst: (optional) The number of requests that may be sent
+               back to back.
+        """
+        if service_name is None:
+            raise ValueError('service_name must be provided')
+        with self._lock:
+            self._limits[(service_name, operation_id)] = (rate, burst)
+            self._buckets.pop((service_name, operation_id), None)
+
+    def bucket_for(self, service_name: str, operation_id: str) -> Optional[TokenBucket]:
+        """Return the bucket that throttles an operation, or None if it is not limited."""
+        for key in ((service_name, operation_id), (service_name, None), (None, None)):
+            if key in self._limits:
+                break
+        else:
+            return None
+        # The default limit applies to each service separately.
+        bucket_key = key if key != (None, None) else (service_name, None)
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                rate, burst = self._limits[key]
+                bucket = TokenBucket(rate, burst=burst, clock=self._clock, sleep=self._sleep)
+                self._buckets[bucket_key] = bucket
+            return bucket
+
+    def attach(self, *services: BaseService) -> None:
+        """Throttle all requests made by the given service clients."""
+        for service in services:
+            wrap_send(service, self._send)
+
+    def _send(self, send: Callable, request: Dict, **kwargs) -> DetailedResponse:
+        service_name, _, operation_id = get_sdk_operation(request.get('headers'))
+        bucket = self.bucket_for(service_name, operation_id)
+        if bucket is None:
+            return send(request, **kwargs)
+        bucket.acquire()
+        try:
+            response = send(request, **kwargs)
+        except ApiException as err:
+            if err.code == 429:
+                bucket.throttled()
+                headers = err.http_response.headers if err.http_response is not None else {}
+                delay = parse_retry_after(headers.get('Retry-After'))
+                if delay:
+                    bucket.block_for(delay)
+            raise
+        bucket.succeeded()
+        self._apply_hints(bucket, response.get_headers())
+        return response
+
+    @staticmethod
+    def _apply_hints(bucket: TokenBucket, headers: Dict) -> None:
+        if not headers:
+            return
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining = float(remaining)
+            reset = float(reset)
+        except ValueError:
+            return
+        # The reset is either a number of seconds or an epoch timestamp.
+        if reset > 10**9:
+            reset = reset - time.time()
+        if reset <= 0:
+            return
+        if remaining <= 0:
+            bucket.block_for(reset)
+        else:
+            bucket.limit_to(remaining / reset)
@@ -0,0 +1,298 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a retry layer for the service clients, with jittered
+exponential backoff, idempotency classification and a shared retry budget.
+"""
+
+from typing import Callable, Dict, Iterable
+import logging
+import random
+import threading
+import time
+
+import requests
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
+
+from .common import get_sdk_operation
+from .metrics import MetricsRegistry
+from .rate_limit import parse_retry_after
+from .transport import wrap_send
+
+# Operations that are safe to repeat even though their HTTP method is not.
+IDEMPOTENT_OPERATIONS = frozenset([
+    'search',
+    'update_visibility',
+    'upload_artifact',
+])
+
+# Operations that must not be repeated after the server may have processed them.
+NON_IDEMPOTENT_OPERATIONS = frozenset([
+    'create_catalog_entry',
+    'create_access_group',
+    'create_resource_group',
+    'add_access_group_rule',
+])
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+TRANSIENT_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+def is_idempotent(method: str, operation_id: str) -> bool:
+    """
+    Return `true` when a request may be sent again without changing the outcome.
+
+    Explicitly listed operations take precedence; otherwise `get_*`, `list_*`
+    and `delete_*` operations and GET, HEAD, OPTIONS, PUT and DELETE requests
+    are idempotent.
+    """
+    if operation_id in NON_IDEMPOTENT_OPERATIONS:
+        return False
+    if operation_id in IDEMPOTENT_OPERATIONS:
+        return True
+    if operation_id and operation_id.startswith(('get_', 'list_', 'delete_')):
+        return True
+    return (method or '').upper() in IDEMPOTENT_METHODS
+
+
+class RetryBudget():
+    """
+    A retry budget shared by all calls of a job.
+
+    Every call deposits `ratio` tokens and every retry withdraws one, on top of
+    a fixed allowance of `min_retries`. When the budget is spent, failures are
+    raised immediately, so that a failing dependency does not multiply the load
+    placed on it.
+    """
+
+    def __init__(self, *, ratio: float = 0.1, min_retries: int = 10) -> None:
+        """
+        Initialize a RetryBudget object.
+
+        :param float ratio: (optional) The number of retries earned per call.
+        :param int min_retries: (optional) The number of retries allowed
+               regardless of the number of calls.
+        """
+        if ratio < 0:
+            raise ValueError('ratio must not be negative')
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self._balance = float(min_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """Record a call."""
+        with self._lock:
+            self._balance += self.ratio
+
+    def withdraw(self) -> bool:
+        """Take one retry from the budget; return `false` if it is spent."""
+        with self._lock:
+            if self._balance < 1.0:
+                return False
+            self._balance -= 1.0
+            return True
+
+    @property
+    def remaining(self) -> int:
+        """Return the number of retries currently available."""
+        return int(self._balance)
+
+
+class RetryStats():
+    """
+    Counters kept by a RetryPolicy.
+
+    :attr int calls: The number of calls made through the policy.
+    :attr int attempts: The number of requests sent, including retries.
+    :attr int retries: The number of retries sent.
+    :attr int recovered: The number of calls that succeeded after a retry.
+    :attr int exhausted: The number of calls that failed after all attempts.
+    :attr int budget_exhausted: The number of retries refused by the budget.
+    :attr int not_retryable: The number of transient failures not retried
+          because the operation is not idempotent.
+    :attr Dict[str, int] retries_by_operation: The number of retries by
+          operation id.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.recovered = 0
+        self.exhausted = 0
+        self.budget_exhausted = 0
+        self.not_retryable = 0
+        self.retries_by_operation = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, operation_id: str = None) -> None:
+        """Increment a counter."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            if name == 'retries':
+                key = operation_id or ''
+                self.retries_by_operation[key] = self.retries_by_operation.get(key, 0) + 1
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary of the counters."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'recovered': self.recovered,
+                'exhausted': self.exhausted,
+                'budget_exhausted': self.budget_exhausted,
+                'not_retryable': self.not_retryable,
+                'retries_by_operation': dict(self.retries_by_operation)
+            }
+
+
+class RetryPolicy():
+    """
+    Retry transient failures of the service clients.
+
+    Transient failures are connection errors, timeouts and the status codes in
+    `retry_status_codes`. Idempotent operations (see `is_idempotent`) are
+    retried on any transient failure; other operations are only retried on a
+    429, which the server returns before processing the request.
+
+    Retry number `n` waits for a random delay between zero and
+    `min(max_delay, base_delay * 2 ** (n - 1))` ("full jitter"), or for the
+    server's `Retry-After` interval if it is longer.
+
+    :attr RetryStats stats: The counters for all calls made through the policy.
+    """
+
+    def __init__(self, *, max_attempts: int = 4, base_delay: float = 0.2,
+                 max_delay: float = 20.0, budget: RetryBudget = None,
+                 retry_status_codes: Iterable[int] = TRANSIENT_STATUS_CODES,
+                 idempotent_operations: Iterable[str] = None,
+                 non_idempotent_operations: Iterable[str] = None,
+                 metrics: MetricsRegistry = None,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rand: Callable[[float, float], float] = random.uniform) -> None:
+        """
+        Initialize a RetryPolicy object.
+
+        :param int max_attempts: (optional) The maximum number of requests sent
+               per call, including the first.
+        :param float base_delay: (optional) The backoff delay in seconds before
+               jitter for the first retry.
+        :param float max_delay: (optional) The upper bound of the backoff delay.
+        :param RetryBudget budget: (optional) The retry budget shared by the job.
+        :param Iterable[int] retry_status_codes: (optional) The HTTP status codes
+               that are treated as transient.
+        :param Iterable[str] idempotent_operations: (optional) Additional
+               operation ids that are safe to retry.
+        :param Iterable[str] non_idempotent_operations: (optional) Additional
+               operation ids that must not be retried.
+        :param MetricsRegistry metrics: (optional) A registry that counts the
+               retries by service and operation.
+        """
+        if max_attempts < 1:
+            raise ValueError('max_attempts must be at least 1')
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.retry_status_codes = frozenset(retry_status_codes)
+        self.idempotent_operations = frozenset(idempotent_operations or [])
+        self.non_idempotent_operations = frozenset(non_idempotent_operations or [])
+        self.stats = RetryStats()
+        self.metrics = metrics
+        self._sleep = sleep
+        self._rand = rand
+
+    def is_idempotent(self, method: str, operation_id: str) -> bool:
+        """Classify an operation, taking this policy's overrides into account."""
+        if operation_id in self.non_idempotent_operations:
+            return False
+        if operation_id in self.idempotent_operations:
+            return True
+        return is_idempotent(method, operation_id)
+
+    def backoff(self, attempt: int) -> float:
+        """Return the jittered delay before the given retry (1 for the first)."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return self._rand(0.0, ceiling)
+
+    def attach(self, *services: BaseService) -> None:
+        """Retry transient failures of all requests made by the given service clients."""
+        for service in services:
+            wrap_send(service, self._send)
+
+    def _is_transient(self, err: Exception) -> bool:
+        if isinstance(err, ApiException):
+            return err.code in self.retry_status_codes
+        return isinstance(err, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    def _send(self, send: Callable, request: Dict, **kwargs) -> DetailedResponse:
+        service_name, _, operation_id = get_sdk_operation(request.get('headers'))
+        idempotent = self.is_idempotent(request.get('method'), operation_id)
+        # A streamed body (upload_artifact) can only be resent if it can be
+        # rewound; a generator or other iterator is used up by the first attempt.
+        body = request.get('data')
+        body_start = None
+        rewindable = True
+        if hasattr(body, 'read'):
+            if hasattr(body, 'seekable') and body.seekable():
+                body_start = body.tell()
+            else:
+                rewindable = False
+        elif body is not None and not isinstance(body, (bytes, bytearray, str, dict, list, tuple)):
+            rewindable = False
+        self.stats.increment('calls')
+        if self.budget is not None:
+            self.budget.deposit()
+        attempt = 1
+        while True:
+            self.stats.increment('attempts')
+            try:
+                response = send(request, **kwargs)
+            except Exception as err: # pylint: disable=broad-except
+                if not self._is_transient(err):
+                    raise
+                if not rewindable or (not idempotent and getattr(err, 'code', None) != 429):
+                    self.stats.increment('not_retryable')
+                    raise
+                if attempt >= self.max_attempts:
+                    self.stats.increment('exhausted')
+                    raise
+                if self.budget is not None and not self.budget.withdraw():
+                    self.stats.increment('budget_exhausted')
+                    raise
+                delay = self.backoff(attempt)
+                if isinstance(err, ApiException) and err.http_response is not None:
+                    retry_after = parse_retry_after(err.http_response.headers.get('Retry-After'))
+                    if retry_after is not None:
+                        delay = max(delay, min(retry_after, self.max_delay))
+                logging.debug('Retrying %s after %s (attempt %d, delay %.3fs)',
+                              operation_id, err, attempt + 1, delay)
+                self.stats.increment('retries', operation_id)
+                if self.metrics is not None:
+                    self.metrics.retry(service_name, operation_id)
+                self._sleep(delay)
+                if body_start is not None:
+                    body.seek(body_start)
+                attempt += 1
+                continue
+            if attempt > 1:
+                self.stats.increment('recovered')
+            return response
@@ -0,0 +1,302 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides streaming decoding of large list responses: the items of
+a response's list are parsed one by one as the body arrives, instead of after
+the whole body has been read and parsed.
+"""
+
+from typing import Callable, Dict, Iterable, Iterator
+import codecs
+import json
+import re
+import threading
+
+import requests
+from ibm_cloud_sdk_core import BaseService, DetailedResponse
+
+from .global_catalog_v1 import Artifact, CatalogEntry, Message
+from .global_search_v2 import ResultItem
+from .global_tagging_v1 import Tag
+from .iam_access_groups_v2 import Group, ListGroupMembersResponseMember, Rule
+from .resource_manager_v2 import QuotaDefinition, ResourceGroup
+from .transport import wrap_send
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# The list property and item model of each streamable operation.
+STREAMABLE_OPERATIONS = {
+    'list_catalog_entries': ('resources', CatalogEntry),
+    'get_catalog_entry': ('children', CatalogEntry),
+    'get_child_objects': ('resources', CatalogEntry),
+    'list_artifacts': ('resources', Artifact),
+    'get_audit_logs': ('resources', Message),
+    'search': ('items', ResultItem),
+    'list_tags': ('items', Tag),
+    'list_access_groups': ('groups', Group),
+    'list_access_group_members': ('members', ListGroupMembersResponseMember),
+    'list_access_group_rules': ('rules', Rule),
+    'list_resource_groups': ('resources', ResourceGroup),
+    'list_quota_definitions': ('resources', QuotaDefinition),
+}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# The model of an operation's items, as opposed to None for plain dicts.
+DEFAULT_MODEL = object()
+
+
+class _Reader():
+    # A growing text buffer over a stream of bytes, from which JSON values are
+    # decoded with `raw_decode`. A value that ends at the end of the buffer
+    # may be incomplete (a number, or a truncated string), so it is only
+    # accepted once more text follows it or the stream has ended.
+
+    def __init__(self, chunks: Iterable[bytes], decoder: json.JSONDecoder) -> None:
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = decoder
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        # Read at least as much as is pending, so that a value spanning many
+        # chunks is retried a logarithmic number of times. Returns false once
+        # the stream has ended.
+        if self.eof:
+            return False
+        wanted = max(1, len(self.buffer) - self.pos)
+        parts = []
+        size = 0
+        for chunk in self._chunks:
+            parts.append(self._text.decode(chunk))
+            size += len(chunk)
+            if size >= wanted:
+                break
+        else:
+            parts.append(self._text.decode(b'', final=True))
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + ''.join(parts)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON input')
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if character not in characters:
+            raise ValueError('Expected {0!r} at position {1}, found {2!r}'.format(
+                characters, self.pos, character))
+        self.pos += 1
+        return character
+
+    def value(self) -> object:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_list(chunks: Iterable[bytes], key: str, *, envelope: Dict = None,
+                   object_hook: Callable[[Dict], object] = None) -> Iterator[object]:
+    """
+    Yield the items of the list `key` of a JSON object, parsing as bytes arrive.
+
+    :param Iterable[bytes] chunks: The JSON text, in pieces of any size.
+    :param str key: The name of the top-level list property.
+    :param dict envelope: (optional) Receives the other top-level properties
+           as they are parsed; those after the list are only set once the
+           items have all been yielded.
+    :param Callable object_hook: (optional) Applied to every decoded object,
+           as with `json.loads`.
+    :raises ValueError: The input is not a JSON object, or is malformed.
+    """
+    reader = _Reader(chunks, json.JSONDecoder(object_hook=object_hook))
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key and reader.peek() == '[':
+            reader.pos += 1
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            value = reader.value()
+            if envelope is not None:
+                envelope[name] = value
+        if reader.expect(',}') == '}':
+            return
+
+
+class ItemStream():
+    """
+    The items of a list response, decoded as the body is read.
+
+    An ItemStream can be iterated once. The other properties of the response
+    (such as `count` or `next`) are added to `envelope` as the body is parsed:
+    those before the list once the first item has been read, those after it
+    once iteration has finished. Use it as a
+    context manager, or call `close`, when not iterating to the end.
+
+    :attr dict envelope: The top-level properties other than the list.
+    :attr DetailedResponse response: The response, whose result is this stream.
+    """
+
+    def __init__(self, response: requests.Response, key: str, *, model: type = None,
+                 object_hook: Callable[[Dict], object] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.key = key
+        self.model = model
+        self.envelope = {}
+        self.response = None
+        self._http_response = response
+        self._items = iter_json_list(response.iter_content(chunk_size=chunk_size), key,
+                                     envelope=self.envelope, object_hook=object_hook)
+
+    def __iter__(self) -> 'ItemStream':
+        return self
+
+    def __next__(self) -> object:
+        try:
+            item = next(self._items)
+        except Exception:
+            # The end of the items, or a malformed body.
+            self.close()
+            raise
+        if self.model is not None:
+            return self.model.from_dict(item)
+        return item
+
+    def close(self) -> None:
+        """Release the connection."""
+        self._http_response.close()
+
+    def __enter__(self) -> 'ItemStream':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+_pending = threading.local()
+
+
+def _streaming_send(send: Callable, request: Dict, **kwargs) -> DetailedResponse:
+    open_stream = getattr(_pending, 'open_stream', None)
+    if open_stream is None:
+        return send(request, **kwargs)
+    _pending.open_stream = None
+    return send(request, **dict(kwargs, stream=True, decode=open_stream))
+
+
+def _install(service: BaseService) -> None:
+    if not getattr(service, '_streaming_installed', False):
+        wrap_send(service, _streaming_send)
+        service._streaming_installed = True # pylint: disable=protected-access
+
+
+def stream_items(operation: Callable, *args, key: str = None, model: type = DEFAULT_MODEL,
+                 object_hook: Callable[[Dict], object] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs) -> ItemStream:
+    """
+    Call a list operation and stream the items of its response.
+
+    For example:
+
+        with stream_items(catalog.list_catalog_entries, complete=True) as entries:
+            for entry in entries:
+                ...
+
+    The call goes through all the send layers of the client with
+    `stream=True`; retries apply to the request, not to errors while the
+    body is being read, and a HedgingPolicy sends it without a hedge.
+
+    :param Callable operation: A bound operation method of a service client,
+           such as `catalog.list_catalog_entries`.
+    :param str key: (optional) The list property to stream. Known for the
+           operations in STREAMABLE_OPERATIONS.
+    :param type model: (optional) The model class whose `from_dict` is
+           applied to each item, or None for plain dicts. Defaults to the
+           operation's item model.
+    :param Callable object_hook: (optional) Applied to every decoded object,
+           such as `LocalePruner.object_hook`.
+    :param int chunk_size: (optional) The number of bytes read at a time.
+    :return: The stream of items.
+    :rtype: ItemStream
+    """
+    service = getattr(operation, '__self__', None)
+    if not isinstance(service, BaseService):
+        raise ValueError('operation must be a method of a service client')
+    known_key, known_model = STREAMABLE_OPERATIONS.get(operation.__name__, (None, None))
+    key = key or known_key
+    if key is None:
+        raise ValueError('key must be provided for {0}'.format(operation.__name__))
+    if model is DEFAULT_MODEL:
+        model = known_model if key == known_key else None
+
+    def open_stream(response: requests.Response) -> ItemStream:
+        return ItemStream(response, key, model=model, object_hook=object_hook,
+                          chunk_size=chunk_size)
+
+    _install(service)
+    _pending.open_stream = open_stream
+    try:
+        detailed = operation(*args, **kwargs)
+    finally:
+        _pending.open_stream = None
+    stream = detailed.get_result()
+    if not isinstance(stream, ItemStream):
+        # An empty body, or a response that was not streamed.
+        stream = _ListStream(stream, key, model)
+    stream.response = detailed
+    return stream
+
+
+class _ListStream(ItemStream):
+    # The same interface over a result that is already decoded.
+
+    def __init__(self, result: Dict, key: str, model: type) -> None: # pylint: disable=super-init-not-called
+        result = result if isinstance(result, dict) else {}
+        self.key = key
+        self.model = model
+        self.envelope = {name: value for name, value in result.items() if name != key}
+        self.response = None
+        self._items = iter(result.get(key) or [])
+
+    def close(self) -> None:
+        pass
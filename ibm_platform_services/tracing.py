@@ -0,0 +1,427 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides request tracing for the service clients: a span per call
+tagged with the service, operation and transaction id, nested under workflow
+spans, with the wait, connect, TLS, server, download and decode phases timed
+separately.
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import threading
+import time
+import uuid
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .common import get_sdk_operation
+from .transport import ConnectionPool, wrap_send
+
+TRANSACTION_ID_HEADER = 'Transaction-Id'
+
+_context = threading.local()
+
+
+def _stack() -> List['Span']:
+    stack = getattr(_context, 'stack', None)
+    if stack is None:
+        stack = _context.stack = []
+    return stack
+
+
+def current_span() -> Optional['Span']:
+    """Return the innermost span active in this thread, or None."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def use_span(span: 'Span') -> Iterator['Span']:
+    """
+    Make a span the current span of this thread.
+
+    Use it in worker threads so that the calls they make are traced as
+    children of a span opened in another thread.
+    """
+    stack = _stack()
+    stack.append(span)
+    try:
+        yield span
+    finally:
+        stack.remove(span)
+
+
+class Span():
+    """
+    A timed unit of work: a workflow step or a single service call.
+
+    :attr str name: The span name; the operation id for service calls.
+    :attr Span parent: The enclosing span, or None.
+    :attr str transaction_id: The transaction id sent with the calls.
+    :attr dict attributes: Tags such as `service`, `operation_id`,
+          `http.method`, `http.url_template` and `http.status_code`.
+    :attr dict phases: Seconds spent in each phase of a service call.
+    :attr float start: The start time, from the tracer's clock.
+    :attr float end: The end time, or None while the span is open.
+    :attr Exception error: The exception that ended the span, or None.
+    """
+
+    def __init__(self, name: str, *, parent: 'Span' = None, transaction_id: str = None,
+                 attributes: Dict = None, start: float = None) -> None:
+        self.name = name
+        self.parent = parent
+        self.transaction_id = transaction_id
+        self.attributes = dict(attributes or {})
+        self.phases = {}
+        self.start = start
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Return the span's duration in seconds, or None while it is open."""
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        """Add time spent in a phase."""
+        self.phases[name] = self.phases.get(name, 0.0) + max(seconds, 0.0)
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing this span."""
+        return {
+            'name': self.name,
+            'parent': self.parent.name if self.parent is not None else None,
+            'transaction_id': self.transaction_id,
+            'attributes': dict(self.attributes),
+            'phases': dict(self.phases),
+            'duration': self.duration,
+            'error': repr(self.error) if self.error is not None else None,
+        }
+
+    def __repr__(self) -> str:
+        return 'Span({0!r}, transaction_id={1!r})'.format(self.name, self.transaction_id)
+
+
+################################################################################
+# URL templates
+################################################################################
+
+# The path template of each operation, by service name and operation id, as
+# built by the generated service methods.
+URL_TEMPLATES = {
+    # GlobalCatalogV1
+    ('global_catalog', 'list_catalog_entries'): '/',
+    ('global_catalog', 'create_catalog_entry'): '/',
+    ('global_catalog', 'get_catalog_entry'): '/{id}',
+    ('global_catalog', 'update_catalog_entry'): '/{id}',
+    ('global_catalog', 'delete_catalog_entry'): '/{id}',
+    ('global_catalog', 'get_child_objects'): '/{id}/{kind}',
+    ('global_catalog', 'restore_catalog_entry'): '/{id}/restore',
+    ('global_catalog', 'get_visibility'): '/{id}/visibility',
+    ('global_catalog', 'update_visibility'): '/{id}/visibility',
+    ('global_catalog', 'get_pricing'): '/{id}/pricing',
+    ('global_catalog', 'get_audit_logs'): '/{id}/logs',
+    ('global_catalog', 'list_artifacts'): '/{object_id}/artifacts',
+    ('global_catalog', 'get_artifact'): '/{object_id}/artifacts/{artifact_id}',
+    ('global_catalog', 'upload_artifact'): '/{object_id}/artifacts/{artifact_id}',
+    ('global_catalog', 'delete_artifact'): '/{object_id}/artifacts/{artifact_id}',
+    # GlobalSearchV2
+    ('global_search', 'search'): '/v3/resources/search',
+    ('global_search', 'get_supported_types'): '/v2/resources/supported_types',
+    # GlobalTaggingV1
+    ('global_tagging', 'list_tags'): '/v3/tags',
+    ('global_tagging', 'delete_tag_all'): '/v3/tags',
+    ('global_tagging', 'delete_tag'): '/v3/tags/{tag_name}',
+    ('global_tagging', 'attach_tag'): '/v3/tags/attach',
+    ('global_tagging', 'detach_tag'): '/v3/tags/detach',
+    # IamAccessGroupsV2
+    ('iam_access_groups', 'create_access_group'): '/groups',
+    ('iam_access_groups', 'list_access_groups'): '/groups',
+    ('iam_access_groups', 'get_access_group'): '/groups/{access_group_id}',
+    ('iam_access_groups', 'update_access_group'): '/groups/{access_group_id}',
+    ('iam_access_groups', 'delete_access_group'): '/groups/{access_group_id}',
+    ('iam_access_groups', 'get_account_settings'): '/groups/settings',
+    ('iam_access_groups', 'update_account_settings'): '/groups/settings',
+    ('iam_access_groups', 'is_member_of_access_group'):
+        '/groups/{access_group_id}/members/{iam_id}',
+    ('iam_access_groups', 'add_members_to_access_group'): '/groups/{access_group_id}/members',
+    ('iam_access_groups', 'list_access_group_members'): '/groups/{access_group_id}/members',
+    ('iam_access_groups', 'remove_member_from_access_group'):
+        '/groups/{access_group_id}/members/{iam_id}',
+    ('iam_access_groups', 'remove_members_from_access_group'):
+        '/groups/{access_group_id}/members/delete',
+    ('iam_access_groups', 'remove_member_from_all_access_groups'):
+        '/groups/_allgroups/members/{iam_id}',
+    ('iam_access_groups', 'add_member_to_multiple_access_groups'):
+        '/groups/_allgroups/members/{iam_id}',
+    ('iam_access_groups', 'add_access_group_rule'): '/groups/{access_group_id}/rules',
+    ('iam_access_groups', 'list_access_group_rules'): '/groups/{access_group_id}/rules',
+    ('iam_access_groups', 'get_access_group_rule'): '/groups/{access_group_id}/rules/{rule_id}',
+    ('iam_access_groups', 'replace_access_group_rule'): '/groups/{access_group_id}/rules/{rule_id}',
+    ('iam_access_groups', 'remove_access_group_rule'): '/groups/{access_group_id}/rules/{rule_id}',
+    # ResourceManagerV2
+    ('resource_manager', 'list_resource_groups'): '/resource_groups',
+    ('resource_manager', 'create_resource_group'): '/resource_groups',
+    ('resource_manager', 'get_resource_group'): '/resource_groups/{id}',
+    ('resource_manager', 'update_resource_group'): '/resource_groups/{id}',
+    ('resource_manager', 'delete_resource_group'): '/resource_groups/{id}',
+    ('resource_manager', 'list_quota_definitions'): '/quota_definitions',
+    ('resource_manager', 'get_quota_definition'): '/quota_definitions/{id}',
+}
+
+
+def url_template(service_class: type, operation_id: str) -> Optional[str]:
+    """
+    Return the path template of an operation, such as `/groups/{access_group_id}`,
+    or None for an unknown operation.
+    """
+    return URL_TEMPLATES.get((getattr(service_class, 'DEFAULT_SERVICE_NAME', None), operation_id))
+
+
+################################################################################
+# Connection phases
+################################################################################
+
+def _record_phase(name: str, seconds: float) -> None:
+    span = current_span()
+    if span is not None:
+        span.add_phase(name, seconds)
+
+
+class _TimedConnectMixin():
+    # Times the socket connection, which includes the name lookup, and for
+    # HTTPS the TLS handshake that follows it in `connect`.
+
+    _trace_connect_seconds = 0.0
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._trace_connect_seconds = time.perf_counter() - start
+            _record_phase('connect', self._trace_connect_seconds)
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+
+    def connect(self):
+        start = time.perf_counter()
+        self._trace_connect_seconds = 0.0
+        try:
+            return super().connect()
+        finally:
+            _record_phase('tls', time.perf_counter() - start - self._trace_connect_seconds)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+def instrument_pool(pool: ConnectionPool) -> None:
+    """
+    Time new connections made by a ConnectionPool.
+
+    Connections opened afterwards record `connect` and `tls` phases on the
+    current span. Without a pool each call opens its own session, which
+    cannot be instrumented, and those phases are counted in `server`.
+    """
+    for adapter in pool.session.adapters.values():
+        manager = getattr(adapter, 'poolmanager', None)
+        if manager is not None:
+            manager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                              'https': _TimedHTTPSConnectionPool}
+
+
+################################################################################
+# Tracer
+################################################################################
+
+class Tracer():
+    """
+    Open a span for every call made by the service clients it is attached to.
+
+    Each call's span is a child of the current span, opened with `span` or
+    made current with `use_span`. Its transaction id is the one given to the
+    call, or else the parent's, or else a new one. With `propagate` the id is
+    sent in the `Transaction-Id` header, which Global Search and IAM Access
+    Groups record, so that a workflow can be followed in their logs.
+
+    The phases of a call are `wait` (before the answered attempt was sent:
+    rate limiting, earlier attempts and retry backoff in the layers attached
+    before the tracer), `connect` and `tls` (new connections through an
+    attached ConnectionPool only), `server` (from sending the request to the
+    response headers), `download` (reading the body) and `decode`.
+    """
+
+    def __init__(self, *, on_start: Iterable[Callable[[Span, Optional[Dict]], None]] = (),
+                 on_end: Iterable[Callable[[Span], None]] = (), propagate: bool = True,
+                 id_factory: Callable[[], str] = lambda: uuid.uuid4().hex,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Initialize a Tracer object.
+
+        :param Iterable[Callable] on_start: (optional) Functions called with a
+               span and, for service calls, the prepared request just before
+               it is sent. They may add headers to the request.
+        :param Iterable[Callable] on_end: (optional) Functions called with
+               each span when it ends, for example to export it.
+        :param bool propagate: (optional) Whether to send the transaction id
+               in the `Transaction-Id` header of every call.
+        :param Callable id_factory: (optional) Creates new transaction ids.
+        """
+        self.on_start = list(on_start)
+        self.on_end = list(on_end)
+        self.propagate = propagate
+        self._id_factory = id_factory
+        self._clock = clock
+
+    def attach(self, *services: BaseService) -> None:
+        """Trace all calls made by the given service clients."""
+        for service in services:
+            pool = getattr(service, 'http_pool', None)
+            if isinstance(pool, ConnectionPool):
+                instrument_pool(pool)
+            wrap_send(service, self._wrapper(type(service)))
+
+    def _open(self, name: str, transaction_id: str, attributes: Dict,
+              request: Dict = None) -> Span:
+        parent = current_span()
+        if transaction_id is None:
+            transaction_id = parent.transaction_id if parent is not None else self._id_factory()
+        span = Span(name, parent=parent, transaction_id=transaction_id,
+                    attributes=attributes, start=self._clock())
+        for hook in self.on_start:
+            hook(span, request)
+        return span
+
+    def _close(self, span: Span, error: Exception = None) -> None:
+        if span.end is None:
+            span.end = self._clock()
+        span.error = error
+        for hook in self.on_end:
+            hook(span)
+
+    @contextmanager
+    def span(self, name: str, *, transaction_id: str = None, **attributes) -> Iterator[Span]:
+        """
+        Open a workflow span; the calls made inside it become its children.
+
+        :param str name: The span name, such as `crawl`.
+        :param str transaction_id: (optional) The transaction id of the
+               workflow. Inherited from the parent span or generated if not set.
+        """
+        span = self._open(name, transaction_id, attributes)
+        error = None
+        try:
+            with use_span(span):
+                yield span
+        except BaseException as err:
+            error = err
+            raise
+        finally:
+            self._close(span, error)
+
+    def _wrapper(self, service_class: type) -> Callable:
+        def wrapper(send: Callable, request: Dict, **kwargs) -> DetailedResponse:
+            return self._send(service_class, send, request, **kwargs)
+        return wrapper
+
+    def _send(self, service_class: type, send: Callable, request: Dict,
+              **kwargs) -> DetailedResponse:
+        headers = CaseInsensitiveDict(request.get('headers') or {})
+        request = dict(request, headers=headers)
+        service_name, _, operation_id = get_sdk_operation(headers)
+        transaction_id = headers.get(TRANSACTION_ID_HEADER)
+        span = self._open(operation_id or request.get('method'), transaction_id, {
+            'service': service_name,
+            'operation_id': operation_id,
+            'http.method': request.get('method'),
+            'http.url_template': url_template(service_class, operation_id),
+        }, request)
+        if self.propagate and transaction_id is None:
+            headers[TRANSACTION_ID_HEADER] = span.transaction_id
+
+        # Layers inside this one may retry, hedge or wait before sending, so
+        # each attempt's start is taken when the transport sends it, in the
+        # thread that sends it.
+        sent = {}
+        received = []
+        inner_on_send = kwargs.get('on_send')
+        inner_observe = kwargs.get('observe')
+
+        def on_send() -> None:
+            sent[threading.get_ident()] = self._clock()
+            if inner_on_send is not None:
+                inner_on_send()
+
+        def observe(response: requests.Response) -> None:
+            received.append((response, sent.get(threading.get_ident()), self._clock()))
+            if inner_observe is not None:
+                inner_observe(response)
+
+        kwargs['on_send'] = on_send
+        kwargs['observe'] = observe
+        error = None
+        try:
+            with use_span(span):
+                response = send(request, **kwargs)
+            span.attributes['http.status_code'] = response.get_status_code()
+            return response
+        except ApiException as err:
+            error = err
+            span.attributes['http.status_code'] = err.code
+            if err.http_response is not None:
+                received.append((err.http_response, sent.get(threading.get_ident()), None))
+            raise
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            span.end = self._clock()
+            self._split_phases(span, received)
+            self._close(span, error)
+
+    @staticmethod
+    def _split_phases(span: Span, received: List) -> None:
+        if not received:
+            return
+        response, started, arrived = received[-1]
+        if started is None:
+            started = span.start
+        elapsed = response.elapsed.total_seconds() if response.elapsed else 0.0
+        connected = span.phases.get('connect', 0.0) + span.phases.get('tls', 0.0)
+        span.add_phase('wait', started - span.start)
+        span.add_phase('server', elapsed - connected)
+        if arrived is not None:
+            span.add_phase('download', arrived - started - elapsed)
+            span.add_phase('decode', span.end - arrived)
@@ -0,0 +1,234 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides the HTTP transport used by the service clients when they
+are attached to a shared connection pool.
+
+`BaseService.send` issues every request through `requests.request`, which opens
+a new session (and therefore a new connection and TLS handshake) for each
+call. `ConnectionPool` holds a single `requests.Session` that any number of
+service clients can share, so that concurrent workers reuse warm connections.
+"""
+
+from http.cookiejar import DefaultCookiePolicy
+from typing import Callable, Dict
+import functools
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
+
+from .common import HEADER_NAME_SDK_ANALYTICS, set_sdk_operation, take_sdk_operation
+
+
+class ConnectionPool():
+    """
+    A tunable HTTP connection pool that can be shared by service clients.
+
+    :attr requests.Session session: The session holding the pooled connections.
+    """
+
+    def __init__(self, *, pool_connections: int = 10, pool_maxsize: int = 10,
+                 max_connections: int = None, pool_block: bool = False,
+                 keep_alive: bool = True) -> None:
+        """
+        Initialize a ConnectionPool object.
+
+        :param int pool_connections: (optional) The number of distinct hosts
+               for which connection pools are kept.
+        :param int pool_maxsize: (optional) The maximum number of connections
+               kept open to a single host.
+        :param int max_connections: (optional) The maximum number of requests
+               in flight through this pool across all hosts. Unlimited if not set.
+        :param bool pool_block: (optional) When true, wait for a free connection
+               once `pool_maxsize` connections to a host are in use instead of
+               opening a throwaway connection.
+        :param bool keep_alive: (optional) When false, ask the server to close
+               each connection after the response.
+        """
+        if pool_connections < 1:
+            raise ValueError('pool_connections must be at least 1')
+        if pool_maxsize < 1:
+            raise ValueError('pool_maxsize must be at least 1')
+        if max_connections is not None and max_connections < 1:
+            raise ValueError('max_connections must be at least 1')
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_connections = max_connections
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Cookies stay with each service's own jar; the shared session never
+        # stores cookies that could leak between clients.
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        self._in_flight = None
+        if max_connections is not None:
+            self._in_flight = threading.BoundedSemaphore(max_connections)
+
+    def request(self, **kwargs) -> requests.Response:
+        """Send a request over the pooled session."""
+        if self._in_flight is None:
+            return self.session.request(**kwargs)
+        with self._in_flight:
+            return self.session.request(**kwargs)
+
+    def attach(self, *services: BaseService) -> None:
+        """Route all requests made by the given service clients through this pool."""
+        for service in services:
+            service.http_pool = self
+            install(service)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+    def __enter__(self) -> 'ConnectionPool':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def install(service: BaseService) -> None:
+    """
+    Replace the `send` method of a service client with the transport `send`.
+
+    Installing is idempotent. Without an attached `ConnectionPool` the
+    transport behaves exactly like `BaseService.send`.
+    """
+    if 'send' not in vars(service):
+        # The innermost layer: `send` called with the service as the next layer.
+        service.send = functools.partial(_layer, service, send, service)
+
+
+def wrap_send(service: BaseService, wrapper: Callable) -> None:
+    """
+    Add a layer around the `send` method of a service client.
+
+    `wrapper` is called as `wrapper(send, request, **kwargs)`, where `send` is
+    the next layer down, and must return a DetailedResponse. Layers added later
+    run outside layers added earlier. The request carries the operation of the
+    service method that prepared it, which layers read with
+    `get_sdk_operation`.
+    """
+    install(service)
+    service.send = functools.partial(_layer, service, wrapper, service.send)
+
+
+def _layer(service: BaseService, wrapper: Callable, inner: Callable, request: Dict,
+           **kwargs) -> DetailedResponse:
+    # The outermost layer takes the operation that get_sdk_headers recorded
+    # while the service method prepared the request.
+    operation = take_sdk_operation(getattr(service, 'DEFAULT_SERVICE_NAME', None))
+    if operation is not None:
+        headers = CaseInsensitiveDict(request.get('headers') or {})
+        if HEADER_NAME_SDK_ANALYTICS not in headers:
+            set_sdk_operation(headers, operation)
+            request = dict(request, headers=headers)
+    return wrapper(inner, request, **kwargs)
+
+
+def _request_kwargs(service: BaseService, kwargs: Dict) -> Dict:
+    # Same defaults as BaseService.send: a one minute timeout unless the caller
+    # gives one, overridden by the service's http_config.
+    kwargs = dict({'timeout': 60}, **kwargs)
+    kwargs = dict(kwargs, **service.http_config)
+    if service.disable_ssl_verification:
+        kwargs['verify'] = False
+    return kwargs
+
+
+def send_raw(service: BaseService, request: Dict, **kwargs) -> requests.Response:
+    """
+    Send a prepared request and return the raw `requests.Response`.
+
+    Unlike `send`, the response body is not decoded, so callers may pass
+    `stream=True` and consume it incrementally.
+
+    :raises ApiException: The response status is not 2xx.
+    """
+    kwargs = _request_kwargs(service, kwargs)
+    take_sdk_operation(None)
+    headers = request.get('headers')
+    if headers and HEADER_NAME_SDK_ANALYTICS in CaseInsensitiveDict(headers):
+        # The operation is only for the send layers.
+        headers = CaseInsensitiveDict(headers)
+        del headers[HEADER_NAME_SDK_ANALYTICS]
+        request = dict(request, headers=headers)
+    pool = getattr(service, 'http_pool', None)
+    if pool is not None:
+        response = pool.request(**request, cookies=service.jar, **kwargs)
+    else:
+        response = requests.request(**request, cookies=service.jar, **kwargs)
+    if not 200 <= response.status_code <= 299:
+        raise ApiException(response.status_code, http_response=response)
+    return response
+
+
+def send(service: BaseService, request: Dict, *,
+         decode: Callable[[requests.Response], object] = None,
+         observe: Callable[[requests.Response], None] = None,
+         on_send: Callable[[], None] = None, **kwargs) -> DetailedResponse:
+    """
+    Send a request and wrap the response in a DetailedResponse or ApiException.
+
+    This mirrors `BaseService.send`, but uses the service's connection pool
+    when one is attached. Layers may pass `decode` to replace `response.json()`
+    for JSON bodies, `observe` to see the raw response of a successful
+    request before it is decoded, and `on_send` to be told when each attempt
+    is sent, after the layers in between have waited. With `stream=True`,
+    `decode` is given the response before its body has been read.
+    """
+    stream = kwargs.get('stream', False)
+    try:
+        if on_send is not None:
+            on_send()
+        response = send_raw(service, request, **kwargs)
+        if observe is not None:
+            observe(response)
+        if response.status_code == 204 or request['method'] == 'HEAD':
+            # There is no body content for a HEAD request or a 204 response
+            result = None
+        elif stream and decode:
+            result = decode(response)
+        elif not response.text:
+            result = None
+        else:
+            try:
+                result = decode(response) if decode else response.json()
+            except ValueError:
+                result = response
+        return DetailedResponse(response=result, headers=response.headers,
+                                status_code=response.status_code)
+    except requests.exceptions.SSLError:
+        logging.exception(BaseService.ERROR_MSG_DISABLE_SSL)
+        raise
+    except ApiException as err:
+        logging.exception(err.message)
+        raise
+    except:
+        logging.exception('Error in service call')
+        raise
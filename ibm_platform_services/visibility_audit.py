@@ -0,0 +1,255 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a concurrent audit of catalog entry visibility against a
+policy, and applies the updates needed to comply with it.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List
+
+from ibm_cloud_sdk_core import DetailedResponse
+
+from .common import get_sdk_headers
+from .global_catalog_v1 import GlobalCatalogV1
+
+
+def _accounts(visibility: Dict, side: str) -> Dict[str, str]:
+    # The account map is keyed by account GUID, which the VisibilityDetail
+    # models do not keep, so the raw result is read.
+    return dict(((visibility or {}).get(side) or {}).get('accounts') or {})
+
+
+class VisibilityPolicy():
+    """
+    Accounts that must be included in or excluded from an entry's visibility.
+
+    :attr frozenset include_accounts: Accounts that must be in
+          `include.accounts` and not in `exclude.accounts`.
+    :attr frozenset exclude_accounts: Accounts that must be in
+          `exclude.accounts` and not in `include.accounts`.
+    """
+
+    def __init__(self, *, include_accounts: Iterable[str] = (),
+                 exclude_accounts: Iterable[str] = ()) -> None:
+        """
+        Initialize a VisibilityPolicy object.
+
+        :param Iterable[str] include_accounts: (optional) Account GUIDs that
+               must be able to see the entries.
+        :param Iterable[str] exclude_accounts: (optional) Account GUIDs that
+               must not be able to see the entries.
+        """
+        self.include_accounts = frozenset(include_accounts)
+        self.exclude_accounts = frozenset(exclude_accounts)
+        overlap = self.include_accounts & self.exclude_accounts
+        if overlap:
+            raise ValueError('Accounts both included and excluded: {0}'.format(
+                ', '.join(sorted(overlap))))
+
+    def evaluate(self, visibility: Dict) -> Dict:
+        """
+        Return the include and exclude account maps that comply with the policy.
+
+        Accounts already listed keep their scope; added accounts get the empty
+        scope, which the catalog replaces with the owner scope.
+        """
+        include = _accounts(visibility, 'include')
+        exclude = _accounts(visibility, 'exclude')
+        for account in self.include_accounts:
+            include.setdefault(account, '')
+            exclude.pop(account, None)
+        for account in self.exclude_accounts:
+            exclude.setdefault(account, '')
+            include.pop(account, None)
+        return {'include': include, 'exclude': exclude}
+
+
+class VisibilityFinding():
+    """
+    The audit of one catalog entry's visibility.
+
+    :attr str id: The catalog entry's unique ID.
+    :attr dict visibility: The visibility returned by get_visibility.
+    :attr List[str] missing: Accounts the policy requires that are not in the
+          right list.
+    :attr List[str] misplaced: Accounts that are in the wrong list.
+    :attr dict include: The compliant include account map.
+    :attr dict exclude: The compliant exclude account map.
+    :attr Exception error: The exception raised, or None.
+    """
+
+    def __init__(self, id: str, *, visibility: Dict = None, missing: List[str] = None,
+                 misplaced: List[str] = None, include: Dict = None, exclude: Dict = None,
+                 error: Exception = None) -> None:
+        self.id = id
+        self.visibility = visibility
+        self.missing = missing or []
+        self.misplaced = misplaced or []
+        self.include = include
+        self.exclude = exclude
+        self.error = error
+
+    @property
+    def compliant(self) -> bool:
+        """Return `true` when the visibility already satisfies the policy."""
+        return self.error is None and not self.missing and not self.misplaced
+
+
+class VisibilityUpdate():
+    """
+    The outcome of one update_visibility call made by an auditor.
+
+    :attr VisibilityFinding finding: The finding that was fixed.
+    :attr DetailedResponse response: The response, or None if the call failed.
+    :attr Exception error: The exception raised, or None if it succeeded.
+    """
+
+    def __init__(self, finding: VisibilityFinding, *, response: DetailedResponse = None,
+                 error: Exception = None) -> None:
+        self.finding = finding
+        self.response = response
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Return `true` when the update succeeded."""
+        return self.error is None
+
+
+class VisibilityAuditor():
+    """
+    Audit the visibility of many catalog entries concurrently.
+
+    `audit` fetches the visibility of each entry on a bounded pool and
+    evaluates the policy; `apply` calls update_visibility only for the
+    entries that do not comply, with the same bound on concurrency.
+    """
+
+    def __init__(self, service: GlobalCatalogV1, policy: VisibilityPolicy, *,
+                 account: str = None, max_workers: int = 16, page_size: int = 100) -> None:
+        """
+        Initialize a VisibilityAuditor object.
+
+        :param GlobalCatalogV1 service: The Global Catalog client.
+        :param VisibilityPolicy policy: The policy to enforce.
+        :param str account: (optional) This changes the scope of the requests
+               regardless of the authorization header.
+        :param int max_workers: (optional) The number of concurrent calls.
+        :param int page_size: (optional) The number of children listed per call.
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        if page_size < 1:
+            raise ValueError('page_size must be at least 1')
+        self.service = service
+        self.policy = policy
+        self.account = account
+        self.max_workers = max_workers
+        self.page_size = page_size
+
+    def subtree_ids(self, root_id: str) -> List[str]:
+        """Return the ids of an entry and all its descendants, parents first."""
+        ids = [root_id]
+        seen = {root_id}
+        level = [root_id]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while level:
+                futures = [executor.submit(self._child_ids, id) for id in level]
+                level = []
+                for future in futures:
+                    for child_id in future.result():
+                        if child_id not in seen:
+                            seen.add(child_id)
+                            ids.append(child_id)
+                            level.append(child_id)
+        return ids
+
+    def _child_ids(self, id: str) -> List[str]:
+        # get_child_objects has no paging parameters, so the pages are
+        # requested directly.
+        child_ids = []
+        offset = 0
+        url = '/{0}/{1}'.format(*self.service.encode_path_vars(id, '*'))
+        while True:
+            headers = get_sdk_headers(service_name=self.service.DEFAULT_SERVICE_NAME,
+                                      service_version='V1',
+                                      operation_id='get_child_objects')
+            request = self.service.prepare_request(method='GET', url=url, headers=headers,
+                                                   params={'account': self.account,
+                                                           '_offset': offset,
+                                                           '_limit': self.page_size})
+            result = self.service.send(request).get_result() or {}
+            page = result.get('resources') or []
+            child_ids.extend(child.get('id') for child in page if child.get('id'))
+            offset += len(page)
+            count = result.get('count')
+            if len(page) < self.page_size or (count is not None and offset >= count):
+                return child_ids
+
+    def check(self, id: str) -> VisibilityFinding:
+        """Fetch the visibility of one entry and evaluate the policy."""
+        try:
+            visibility = self.service.get_visibility(id, account=self.account).get_result() or {}
+        except Exception as err: # pylint: disable=broad-except
+            return VisibilityFinding(id, error=err)
+        include = _accounts(visibility, 'include')
+        exclude = _accounts(visibility, 'exclude')
+        missing = sorted([a for a in self.policy.include_accounts if a not in include] +
+                         [a for a in self.policy.exclude_accounts if a not in exclude])
+        misplaced = sorted([a for a in self.policy.include_accounts if a in exclude] +
+                           [a for a in self.policy.exclude_accounts if a in include])
+        target = self.policy.evaluate(visibility)
+        return VisibilityFinding(id, visibility=visibility, missing=missing,
+                                 misplaced=misplaced, include=target['include'],
+                                 exclude=target['exclude'])
+
+    def audit(self, ids: Iterable[str]) -> Iterator[VisibilityFinding]:
+        """Yield a finding for each entry, in completion order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.check, id) for id in ids]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _update(self, finding: VisibilityFinding) -> VisibilityUpdate:
+        try:
+            response = self.service.update_visibility(
+                finding.id,
+                extendable=(finding.visibility or {}).get('extendable'),
+                include={'accounts': finding.include},
+                exclude={'accounts': finding.exclude},
+                account=self.account)
+            return VisibilityUpdate(finding, response=response)
+        except Exception as err: # pylint: disable=broad-except
+            return VisibilityUpdate(finding, error=err)
+
+    def apply(self, findings: Iterable[VisibilityFinding]) -> Iterator[VisibilityUpdate]:
+        """Update the visibility of the non-compliant findings, in completion order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._update, finding) for finding in findings
+                       if finding.error is None and not finding.compliant]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def run(self, ids: Iterable[str]) -> Dict[str, List]:
+        """
+        Audit the entries and fix the non-compliant ones.
+
+        :return: A dict with the `findings` and the `updates` made.
+        """
+        findings = list(self.audit(ids))
+        return {'findings': findings, 'updates': list(self.apply(findings))}
@@ -65,6 +65,7 @@ setup(name=PACKAGE_NAME.replace('_', '-'),
       description=PACKAGE_DESC,
       license='Apache 2.0',
       install_requires=install_requires,
+      extras_require={'pricing': ['numpy>=1.13']},
       tests_require=tests_require,
       cmdclass={'test': PyTest, 'test_unit': PyTestUnit, 'test_integration': PyTestIntegration},
       author='IBM',
@@ -0,0 +1,73 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the vectorised pricing engine with a loop over the pricing objects.
+
+With the package installed, run: python test/benchmark/pricing_benchmark.py [records]
+"""
+
+import sys
+import timeit
+
+import numpy as np
+
+from ibm_platform_services.global_catalog_v1 import PricingGet
+from ibm_platform_services.pricing import PricingEngine, naive_cost
+
+COUNTRIES = [('USA', 'USD'), ('GBR', 'GBP'), ('DEU', 'EUR'), ('JPN', 'JPY')]
+TIER_MODELS = ['Granular Tier', 'Simple Tier', 'Step Tier', 'Linear']
+
+
+def make_pricing(metric_count=8, tier_count=6):
+    metrics = []
+    for index in range(metric_count):
+        tiers = [10 ** (tier + 1) for tier in range(tier_count - 1)] + [999999999]
+        metrics.append({
+            'metric_id': 'metric-{0}'.format(index),
+            'tier_model': TIER_MODELS[index % len(TIER_MODELS)],
+            'charge_unit_quantity': '1',
+            'amounts': [{'country': country, 'currency': currency,
+                         'prices': [{'quantity_tier': tier, 'Price': 1.0 / (rank + 1)}
+                                    for rank, tier in enumerate(tiers)]}
+                        for country, currency in COUNTRIES]
+        })
+    return PricingGet.from_dict({'type': 'paygo', 'metrics': metrics})
+
+
+def main(records=100000):
+    pricing = make_pricing()
+    rng = np.random.RandomState(0)
+    metric_ids = rng.choice([m.metric_id for m in pricing.metrics], size=records)
+    quantities = rng.uniform(0, 10 ** 6, size=records)
+    by_id = {m.metric_id: m for m in pricing.metrics}
+
+    def naive():
+        return [naive_cost(by_id[m], q) for m, q in zip(metric_ids, quantities)]
+
+    def vectorised():
+        return PricingEngine(pricing).costs(metric_ids, quantities)
+
+    assert np.allclose(naive(), vectorised())
+    naive_time = min(timeit.repeat(naive, number=1, repeat=3))
+    vectorised_time = min(timeit.repeat(vectorised, number=1, repeat=3))
+    print('records:    {0}'.format(records))
+    print('naive:      {0:.4f}s'.format(naive_time))
+    print('vectorised: {0:.4f}s ({1:.1f}x)'.format(vectorised_time, naive_time / vectorised_time))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,402 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline benchmarks for request building, model decoding and encoding, paging
+throughput, streaming decoding and request body compression.
+
+Request building runs against a stub transport that returns an empty
+response; paging runs against the local FakePlatformServer. Nothing reaches
+IBM Cloud.
+
+With the package installed, run:
+
+    python test/benchmark/run_benchmarks.py --output results.json
+
+and compare the JSON files of two releases to spot regressions.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+
+from ibm_cloud_sdk_core import DetailedResponse
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+import ibm_platform_services
+from ibm_platform_services import (GlobalCatalogV1, GlobalSearchV2, GlobalTaggingV1,
+                                   IamAccessGroupsV2, ResourceManagerV2)
+from ibm_platform_services.compression import DEFLATE, GZIP, compress
+from ibm_platform_services.crn import CRN, CRNIndex
+from ibm_platform_services.inventory_diff import diff_snapshots
+from ibm_platform_services.streaming import stream_items
+from ibm_platform_services.global_catalog_v1 import EntrySearchResult
+from ibm_platform_services.global_search_v2 import ScanResult
+from ibm_platform_services.global_tagging_v1 import TagList
+from ibm_platform_services.iam_access_groups_v2 import GroupMembersList
+
+# The benchmark helpers live next to this script and the local fake server
+# with the tests, one directory up; neither depends on the working directory.
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [BENCHMARK_DIR, os.path.dirname(BENCHMARK_DIR)]
+from fake_server import FakeDataSet, FakePlatformServer # pylint: disable=wrong-import-position
+
+BENCHMARKS = []
+
+
+def benchmark(group):
+    """Register a benchmark function returning a dict of measurements."""
+    def register(function):
+        BENCHMARKS.append((group, function.__name__, function))
+        return function
+    return register
+
+
+def measure(function, *, number, repeat, items=1):
+    """Time `function` and return per-call and per-item statistics."""
+    times = [t / number for t in timeit.repeat(function, number=number, repeat=repeat)]
+    best = min(times)
+    return {
+        'calls': number * repeat,
+        'best_seconds': best,
+        'median_seconds': statistics.median(times),
+        'items_per_second': items / best if best > 0 else None,
+    }
+
+
+def stub_client(cls):
+    """Return a client whose transport answers every request with an empty 200."""
+    client = cls(authenticator=NoAuthAuthenticator())
+    client.send = lambda request, **kwargs: DetailedResponse(response={}, status_code=200)
+    return client
+
+
+class Context():
+
+    def __init__(self, scale, repeat):
+        self.scale = scale
+        self.repeat = repeat
+        self.data = FakeDataSet(catalog_entries=max(1, int(2000 * scale)), plans_per_entry=0,
+                                resources=max(1, int(10000 * scale)),
+                                tags=max(1, int(10000 * scale)), access_groups=1,
+                                members_per_group=max(1, int(5000 * scale)), resource_groups=1)
+        entries = list(self.data.entries.values())
+        self.payloads = {
+            'EntrySearchResult': {'offset': 0, 'limit': len(entries), 'count': len(entries),
+                                  'resource_count': len(entries), 'resources': entries},
+            'ScanResult': {'search_cursor': 'cursor', 'limit': len(self.data.resources),
+                           'items': self.data.resources},
+            'TagList': {'total_count': len(self.data.tags), 'offset': 0,
+                        'limit': len(self.data.tags),
+                        'items': [{'name': tag} for tag in self.data.tags]},
+            'GroupMembersList': {'limit': 100, 'offset': 0,
+                                 'total_count': len(next(iter(self.data.members.values()))),
+                                 'members': list(next(iter(self.data.members.values())).values())},
+        }
+        self.models = {
+            'EntrySearchResult': EntrySearchResult,
+            'ScanResult': ScanResult,
+            'TagList': TagList,
+            'GroupMembersList': GroupMembersList,
+        }
+
+
+@benchmark('request_preparation')
+def prepare_requests(context):
+    catalog = stub_client(GlobalCatalogV1)
+    search = stub_client(GlobalSearchV2)
+    tagging = stub_client(GlobalTaggingV1)
+    iam = stub_client(IamAccessGroupsV2)
+    manager = stub_client(ResourceManagerV2)
+    operations = {
+        'list_catalog_entries': lambda: catalog.list_catalog_entries(account='global', q='kind:service'),
+        'get_catalog_entry': lambda: catalog.get_catalog_entry('service-0', include='*'),
+        'get_pricing': lambda: catalog.get_pricing('plan-0'),
+        'update_visibility': lambda: catalog.update_visibility(
+            'service-0', include={'accounts': {'a': ''}}),
+        'search': lambda: search.search(query='*', fields=['name', 'crn'], limit=100),
+        'list_tags': lambda: tagging.list_tags(offset=0, limit=100),
+        'attach_tag': lambda: tagging.attach_tag([{'resource_id': 'crn'}], tag_name='t'),
+        'list_access_group_members': lambda: iam.list_access_group_members('g', limit=100),
+        'add_members_to_access_group': lambda: iam.add_members_to_access_group(
+            'g', members=[{'iam_id': 'IBMid-1', 'type': 'user'}]),
+        'list_resource_groups': lambda: manager.list_resource_groups(account_id='a'),
+    }
+    number = max(1, int(2000 * context.scale))
+    return {name: measure(operation, number=number, repeat=context.repeat)
+            for name, operation in operations.items()}
+
+
+@benchmark('from_dict')
+def decode_models(context):
+    results = {}
+    for name, payload in context.payloads.items():
+        model = context.models[name]
+        items = len(payload.get('resources') or payload.get('items') or payload.get('members'))
+        results[name] = dict(measure(lambda: model.from_dict(payload), number=1,
+                                     repeat=context.repeat, items=items), items=items)
+    return results
+
+
+@benchmark('to_dict')
+def encode_models(context):
+    results = {}
+    for name, payload in context.payloads.items():
+        instance = context.models[name].from_dict(payload)
+        items = len(payload.get('resources') or payload.get('items') or payload.get('members'))
+        results[name] = dict(measure(instance.to_dict, number=1, repeat=context.repeat,
+                                     items=items), items=items)
+    return results
+
+
+@benchmark('paging')
+def page_through_listings(context):
+    results = {}
+    with FakePlatformServer(data=context.data) as server:
+        catalog = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+        search = GlobalSearchV2(authenticator=NoAuthAuthenticator())
+        iam = IamAccessGroupsV2(authenticator=NoAuthAuthenticator())
+        server.attach(catalog, search, iam)
+        group_id = next(iter(context.data.groups))
+
+        def catalog_pages():
+            count = 0
+            result = catalog.list_catalog_entries().get_result()
+            count += len(result['resources'])
+            while result.get('next'):
+                offset = result['offset'] + result['limit']
+                request = catalog.prepare_request(method='GET', url='/',
+                                                  params={'_offset': offset})
+                result = catalog.send(request).get_result()
+                count += len(result['resources'])
+            return count
+
+        def search_pages():
+            count = 0
+            cursor = None
+            while True:
+                result = search.search(query='*', limit=1000, search_cursor=cursor).get_result()
+                count += len(result['items'])
+                if len(result['items']) < 1000:
+                    return count
+                cursor = result['search_cursor']
+
+        def member_pages():
+            count = 0
+            offset = 0
+            while True:
+                result = iam.list_access_group_members(group_id, limit=100,
+                                                       offset=offset).get_result()
+                count += len(result['members'])
+                if not result.get('next'):
+                    return count
+                offset += 100
+
+        for name, pages, items in (('list_catalog_entries', catalog_pages, len(context.data.entries)),
+                                   ('search', search_pages, len(context.data.resources)),
+                                   ('list_access_group_members', member_pages,
+                                    len(context.data.members[group_id]))):
+            assert pages() == items
+            results[name] = dict(measure(pages, number=1, repeat=context.repeat, items=items),
+                                 items=items)
+    return results
+
+
+@benchmark('streaming')
+def stream_list_responses(context):
+    results = {}
+    with FakePlatformServer(data=context.data) as server:
+        search = GlobalSearchV2(authenticator=NoAuthAuthenticator())
+        iam = IamAccessGroupsV2(authenticator=NoAuthAuthenticator())
+        server.attach(search, iam)
+        group_id = next(iter(context.data.groups))
+        members = len(context.data.members[group_id])
+        calls = {
+            'search': (search.search, (), {'query': '*', 'limit': 1000, 'fields': ['*']}),
+            'list_access_group_members': (iam.list_access_group_members, (group_id,),
+                                          {'limit': members}),
+        }
+        for name, (operation, args, kwargs) in calls.items():
+            result = {}
+            for mode in ('decoded', 'streamed'):
+                tracemalloc.start()
+                start = time.perf_counter()
+                if mode == 'streamed':
+                    items = stream_items(operation, *args, model=None, **kwargs)
+                    next(items)
+                    first = time.perf_counter() - start
+                    count = 1 + sum(1 for _ in items)
+                else:
+                    items = operation(*args, **kwargs).get_result()
+                    first = time.perf_counter() - start
+                    count = len(items.get('items') or items.get('members'))
+                    del items
+                total = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                result[mode] = {'items': count, 'first_item_seconds': first,
+                                'total_seconds': total, 'peak_bytes': peak}
+            results[name] = result
+    return results
+
+
+@benchmark('request_compression')
+def compress_request_bodies(context):
+    entry = dict(next(iter(context.data.entries.values())))
+    entry['metadata'] = dict(entry.get('metadata') or {}, extra={
+        'plans': [{'name': 'plan-{0}'.format(i), 'description': 'Plan number {0}'.format(i),
+                   'features': ['feature-{0}'.format(j) for j in range(20)]} for i in range(50)]})
+    resources = [{'resource_id': r['crn']} for r in context.data.resources[:max(1, int(5000 * context.scale))]]
+    members = list(next(iter(context.data.members.values())).values())[:1000]
+    payloads = {
+        'attach_tag': {'resources': resources, 'tag_names': ['env:prod', 'team:platform']},
+        'create_catalog_entry': entry,
+        'add_members_to_access_group': {'members': members},
+    }
+    results = {}
+    for name, payload in payloads.items():
+        body = json.dumps(payload).encode('utf-8')
+        result = {'bytes': len(body)}
+        for encoding in (GZIP, DEFLATE):
+            for level in (1, 6, 9):
+                label = '{0}_{1}'.format(encoding, level)
+                result[label + '_bytes'] = len(compress(body, encoding, level))
+                result[label + '_seconds'] = measure(lambda: compress(body, encoding, level),
+                                                     number=1, repeat=context.repeat)['best_seconds']
+        results[name] = result
+    return results
+
+
+@benchmark('inventory_diff')
+def diff_inventories(context):
+    old = context.data.resources
+    new = [dict(r, tags=['env:prod']) if i % 100 == 0 else r
+           for i, r in enumerate(old) if i % 50 != 1]
+    records = len(old) + len(new)
+    results = {}
+    for label, max_records in (('in_memory', records), ('spilled', max(1, records // 20))):
+        for documents in (True, False):
+            tracemalloc.start()
+            changes = sum(1 for _ in diff_snapshots(old, new, documents=documents,
+                                                    max_records=max_records))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            timing = measure(lambda: sum(1 for _ in diff_snapshots(old, new, documents=documents,
+                                                                   max_records=max_records)),
+                             number=1, repeat=context.repeat, items=records)
+            name = label if documents else label + '_digests_only'
+            results[name] = dict(timing, changes=changes, peak_bytes=peak)
+    return results
+
+
+@benchmark('crn')
+def parse_and_index_crns(context):
+    # Spread the resources over services and locations, so that a query
+    # selects a twelfth of them.
+    services = ['kms', 'cloudantnosqldb', 'cloud-object-storage', 'databases-for-redis']
+    locations = ['us-south', 'eu-de', 'jp-tok']
+    texts = [r['crn'].replace(':fake:us-south:', ':{0}:{1}:'.format(
+        services[i % len(services)], locations[i % len(locations)]))
+             for i, r in enumerate(context.data.resources)]
+    number = max(1, context.repeat)
+    results = {
+        'split': measure(lambda: [text.split(':') for text in texts], number=number,
+                         repeat=context.repeat, items=len(texts)),
+        # CRN.parse keeps no cache, so every call parses.
+        'parse': measure(lambda: [CRN.parse(text) for text in texts], number=number,
+                         repeat=context.repeat, items=len(texts)),
+        'build_index': measure(lambda: CRNIndex(texts), number=1, repeat=context.repeat,
+                               items=len(texts)),
+    }
+    index = CRNIndex(texts)
+
+    def split_scan():
+        return [text for text in texts
+                if text.split(':')[4] == 'kms' and text.split(':')[5] == 'eu-de']
+
+    def index_find():
+        return index.find(service_name='kms', location='eu-de')
+
+    results['scan_query'] = measure(split_scan, number=number, repeat=context.repeat)
+    results['index_query'] = measure(index_find, number=number, repeat=context.repeat)
+    return results
+
+
+@benchmark('pricing')
+def pricing_engine(context):
+    try:
+        import numpy # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        return {'skipped': 'numpy is not installed'}
+    from pricing_benchmark import make_pricing # pylint: disable=import-outside-toplevel
+    from ibm_platform_services.pricing import PricingEngine # pylint: disable=import-outside-toplevel
+    pricing = make_pricing()
+    records = max(1, int(100000 * context.scale))
+    rng = numpy.random.RandomState(0)
+    metric_ids = rng.choice([m.metric_id for m in pricing.metrics], size=records)
+    quantities = rng.uniform(0, 10 ** 6, size=records)
+    engine = PricingEngine(pricing)
+    return {'costs': dict(measure(lambda: engine.costs(metric_ids, quantities), number=1,
+                                  repeat=context.repeat, items=records), items=records)}
+
+
+def run(*, scale=1.0, repeat=5, only=None):
+    """Run the benchmarks and return the report as a dict."""
+    context = Context(scale, repeat)
+    report = {
+        'package_version': ibm_platform_services.version.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'scale': scale,
+        'repeat': repeat,
+        'results': {},
+    }
+    for group, name, function in BENCHMARKS:
+        if only and group not in only:
+            continue
+        report['results'][group] = function(context)
+        print('{0}: {1} done'.format(group, name), file=sys.stderr)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply payload sizes and call counts by this factor')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions per benchmark')
+    parser.add_argument('--only', action='append', choices=sorted({g for g, _, _ in BENCHMARKS}),
+                        help='run only this group; may be given more than once')
+    args = parser.parse_args(argv)
+    report = run(scale=args.scale, repeat=args.repeat, only=args.only)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
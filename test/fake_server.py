@@ -0,0 +1,853 @@
+# coding: utf-8
+
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module provides a local stand-in server for the five platform services,
+for load tests and benchmarks that must not reach IBM Cloud.
+
+The server runs in a background thread on localhost and serves generated data
+from memory. Each service lives under its own path prefix; `attach` points
+service clients at it:
+
+    with FakePlatformServer(catalog_entries=1000, latency=0.005) as server:
+        catalog = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+        server.attach(catalog)
+        catalog.list_catalog_entries()
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Callable, Dict, Iterator, List, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse
+import datetime
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+
+from requests.structures import CaseInsensitiveDict
+from ibm_cloud_sdk_core import BaseService
+
+from ibm_platform_services.compression import GZIP, compress, decompress
+
+# The path prefix of each service, keyed by the clients' DEFAULT_SERVICE_NAME.
+SERVICE_PREFIXES = {
+    'global_catalog': '/global_catalog/api/v1',
+    'global_search': '/global_search',
+    'global_tagging': '/global_tagging',
+    'iam_access_groups': '/iam_access_groups/v2',
+    'resource_manager': '/resource_manager/v2',
+}
+
+ACCOUNT_ID = 'fake-account'
+EPOCH = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _timestamp(seconds: float) -> str:
+    return (EPOCH + datetime.timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _page(items: List, params: Dict, offset_key: str, limit_key: str,
+          default_limit: int) -> Tuple[List, int, int]:
+    offset = max(0, int(params.get(offset_key) or 0))
+    limit = max(1, int(params.get(limit_key) or default_limit))
+    return items[offset:offset + limit], offset, limit
+
+
+class FakeResponse():
+    """A response produced by a route handler of the fake server."""
+
+    def __init__(self, status: int = 200, body: object = None, *,
+                 headers: Dict[str, str] = None) -> None:
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+class FakeDataSet():
+    """
+    Deterministic generated data for the fake server.
+
+    All collections are plain dicts and lists of JSON-ready dicts, so tests can
+    read or change them directly while the server is running.
+    """
+
+    def __init__(self, *, catalog_entries: int = 100, plans_per_entry: int = 2,
+                 resources: int = 1000, tags: int = 100, access_groups: int = 20,
+                 members_per_group: int = 50, resource_groups: int = 10,
+                 seed: int = 0) -> None:
+        rng = random.Random(seed)
+        self.entries = {}
+        self.visibility = {}
+        self.pricing = {}
+        self.audit_logs = {}
+        self.artifacts = {}
+        for index in range(catalog_entries):
+            entry_id = 'service-{0}'.format(index)
+            self._add_entry(entry_id, 'service', index, rng)
+            for plan in range(plans_per_entry):
+                plan_id = '{0}-plan-{1}'.format(entry_id, plan)
+                self._add_entry(plan_id, 'plan', index, rng, parent_id=entry_id)
+                self.pricing[plan_id] = {
+                    'type': 'paygo', 'origin': 'pricing_catalog',
+                    'metrics': [{'metric_id': 'part-{0}'.format(plan), 'tier_model': 'Granular Tier',
+                                 'charge_unit_quantity': '1', 'amounts': [
+                                     {'country': 'USA', 'currency': 'USD', 'prices': [
+                                         {'quantity_tier': 1000, 'Price': round(rng.uniform(0.1, 1), 4)},
+                                         {'quantity_tier': 999999999, 'Price': round(rng.uniform(0.01, 0.1), 4)}]}]}]}
+            self.audit_logs[entry_id] = [
+                {'id': '{0}-log-{1}'.format(entry_id, log), 'type': 'update', 'gid': entry_id,
+                 'message': 'updated', 'time': _timestamp(index * 3600 + log * 60)}
+                for log in range(5)]
+            self.artifacts[entry_id] = {'readme.md': ('# ' + entry_id + '\n').encode('utf-8')}
+        self.resources = [{'crn': 'crn:v1:bluemix:public:fake:us-south:a/{0}:{1}::'.format(
+            ACCOUNT_ID, index), 'name': 'resource-{0}'.format(index),
+                           'type': rng.choice(['resource-instance', 'cf-space', 'k8-cluster']),
+                           'tags': ['env:test']} for index in range(resources)]
+        self.tags = ['tag-{0}'.format(index) for index in range(tags)]
+        self.groups = {}
+        self.members = {}
+        self.rules = {}
+        for index in range(access_groups):
+            group_id = 'AccessGroupId-{0}'.format(index)
+            self.groups[group_id] = {'id': group_id, 'name': 'group-{0}'.format(index),
+                                     'description': 'Generated group', 'account_id': ACCOUNT_ID,
+                                     'created_at': _timestamp(index), 'created_by_id': 'IBMid-admin',
+                                     'last_modified_at': _timestamp(index),
+                                     'last_modified_by_id': 'IBMid-admin'}
+            self.members[group_id] = {'IBMid-{0}'.format(member): {
+                'iam_id': 'IBMid-{0}'.format(member), 'type': 'user',
+                'name': 'user {0}'.format(member), 'email': 'user{0}@example.com'.format(member),
+                'created_at': _timestamp(member), 'created_by_id': 'IBMid-admin'}
+                                      for member in range(members_per_group)}
+            self.rules[group_id] = {}
+        self.settings = {'account_id': ACCOUNT_ID, 'public_access_enabled': True}
+        self.resource_groups = {}
+        for index in range(resource_groups):
+            self.add_resource_group('group-{0}'.format(index), default=index == 0)
+        self.quotas = {'quota-{0}'.format(index): {
+            'id': 'quota-{0}'.format(index), 'name': ['Trial', 'Standard', 'Subscription'][index],
+            'type': 'quota', 'number_of_apps': 100, 'number_of_service_instances': 1000,
+            'created_at': _timestamp(0), 'updated_at': _timestamp(0)} for index in range(3)}
+
+    def _add_entry(self, entry_id: str, kind: str, index: int, rng: random.Random, *,
+                   parent_id: str = None) -> None:
+        entry = {'id': entry_id, 'name': entry_id, 'kind': kind, 'disabled': False, 'active': True,
+                 'tags': ['ibm_created', 'fake'],
+                 'overview_ui': {'en': {'display_name': entry_id.replace('-', ' ').title(),
+                                        'description': 'A generated {0}.'.format(kind),
+                                        'long_description': 'A generated {0}.'.format(kind)}},
+                 'images': {'image': 'https://example.com/{0}.svg'.format(entry_id)},
+                 'provider': {'name': 'IBM', 'email': 'provider@example.com'},
+                 'created': _timestamp(index), 'updated': _timestamp(index + rng.randint(0, 86400))}
+        if parent_id:
+            entry['parent_id'] = parent_id
+        self.entries[entry_id] = entry
+        self.visibility[entry_id] = {'restrictions': 'public', 'extendable': False,
+                                     'include': {'accounts': {}}, 'exclude': {'accounts': {}}}
+
+    def add_resource_group(self, name: str, *, default: bool = False) -> Dict:
+        """Add a resource group and return it."""
+        group_id = uuid.uuid5(uuid.NAMESPACE_URL, name).hex
+        group = {'id': group_id, 'name': name, 'account_id': ACCOUNT_ID, 'state': 'ACTIVE',
+                 'default': default, 'quota_id': 'quota-0',
+                 'crn': 'crn:v1:bluemix:public:resource-controller::a/{0}::resource-group:{1}'.format(
+                     ACCOUNT_ID, group_id),
+                 'created_at': _timestamp(0), 'updated_at': _timestamp(0)}
+        self.resource_groups[group_id] = group
+        return group
+
+
+class _Router():
+
+    def __init__(self) -> None:
+        self.routes = []
+
+    def add(self, method: str, pattern: str, handler: Callable, *, writes: bool = None) -> None:
+        if writes is None:
+            writes = method not in ('GET', 'HEAD')
+        self.routes.append((method, re.compile('^' + pattern + '$'), handler, writes))
+
+    def match(self, method: str, path: str):
+        allowed = False
+        for route_method, pattern, handler, writes in self.routes:
+            found = pattern.match(path)
+            if found:
+                allowed = True
+                if route_method == method:
+                    return handler, [unquote(group) for group in found.groups()], writes
+        return None, allowed, False
+
+
+class _ReadWriteLock():
+    # Any number of readers at once, or a single writer.
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        with self._condition:
+            while self._writing:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        with self._condition:
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class FakePlatformServer():
+    """
+    A local HTTP server emulating the endpoints of the five platform services.
+
+    Every request first waits `latency` plus a uniform jitter of up to
+    `latency_jitter` seconds, then fails with `error_status` with probability
+    `error_rate`. Both may be changed while the server runs.
+
+    :attr FakeDataSet data: The data served.
+    :attr Counter requests: The number of requests served per
+          (method, service).
+    :attr Counter bytes_received: The request body bytes received per
+          service, as sent on the wire.
+    :attr Counter bytes_sent: The response body bytes sent per service.
+    """
+
+    def __init__(self, *, data: FakeDataSet = None, latency: float = 0.0,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, compress_responses: bool = False,
+                 host: str = '127.0.0.1', port: int = 0, seed: int = 0, **sizes) -> None:
+        """
+        Initialize a FakePlatformServer object.
+
+        :param FakeDataSet data: (optional) The data to serve. Generated from
+               `sizes` (the FakeDataSet keyword arguments) if not given.
+        :param float latency: (optional) The delay in seconds before each
+               response.
+        :param float latency_jitter: (optional) The largest random delay added
+               to `latency`.
+        :param float error_rate: (optional) The probability (0-1) that a request
+               fails with `error_status`.
+        :param int error_status: (optional) The status of injected errors. A
+               429 carries a `Retry-After: 0` header.
+        :param bool compress_responses: (optional) Whether to gzip JSON
+               responses for clients that accept it.
+        :param str host: (optional) The interface to listen on.
+        :param int port: (optional) The port to listen on, any free one if 0.
+        :param int seed: (optional) The seed of the generated data and of the
+               injected latency and errors.
+        """
+        self.data = data or FakeDataSet(seed=seed, **sizes)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.compress_responses = compress_responses
+        self.requests = Counter()
+        self.bytes_received = Counter()
+        self.bytes_sent = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._data_lock = _ReadWriteLock()
+        self._routes = {name: _Router() for name in SERVICE_PREFIXES}
+        self._add_catalog_routes(self._routes['global_catalog'])
+        self._add_search_routes(self._routes['global_search'])
+        self._add_tagging_routes(self._routes['global_tagging'])
+        self._add_iam_routes(self._routes['iam_access_groups'])
+        self._add_resource_manager_routes(self._routes['resource_manager'])
+        self._httpd = _ThreadingHTTPServer((host, port), _handler_class(self))
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Return the base URL of the server."""
+        host, port = self._httpd.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def service_url(self, service_name: str) -> str:
+        """Return the service URL to use for a service client."""
+        return self.url + SERVICE_PREFIXES[service_name]
+
+    def attach(self, *services: BaseService) -> None:
+        """Point the given service clients at this server."""
+        for service in services:
+            service.set_service_url(self.service_url(service.DEFAULT_SERVICE_NAME))
+
+    def start(self) -> 'FakePlatformServer':
+        """Start serving in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                            name='FakePlatformServer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'FakePlatformServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    @staticmethod
+    def _service_of(path: str) -> str:
+        return next((name for name, prefix in SERVICE_PREFIXES.items()
+                     if path == prefix or path.startswith(prefix + '/')), None)
+
+    def count_sent(self, raw_path: str, size: int) -> None:
+        """Count the response body bytes sent for a request."""
+        service = self._service_of(urlparse(raw_path).path)
+        with self._lock:
+            self.bytes_sent[service] += size
+
+    def handle(self, method: str, raw_path: str, headers: Dict, body: bytes) -> FakeResponse:
+        """Route one request and return the response, applying faults."""
+        parsed = urlparse(raw_path)
+        service = self._service_of(parsed.path)
+        with self._lock:
+            self.requests[(method, service)] += 1
+            self.bytes_received[service] += len(body)
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            fail = self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if service is None:
+            return _error(404, 'Unknown service')
+        if fail:
+            extra = {'Retry-After': '0'} if self.error_status == 429 else {}
+            return _error(self.error_status, 'Injected error', headers=extra)
+        path = parsed.path[len(SERVICE_PREFIXES[service]):] or '/'
+        handler, args, writes = self._routes[service].match(method, path)
+        if handler is None:
+            return _error(405 if args else 404, 'No route for {0} {1}'.format(method, path))
+        params = dict(parse_qsl(parsed.query, keep_blank_values=True))
+        encoding = (headers.get('Content-Encoding') or '').strip().lower()
+        if body and encoding:
+            try:
+                body = decompress(body, encoding)
+            except (ValueError, zlib.error):
+                return _error(415, 'Unsupported Content-Encoding: {0}'.format(encoding))
+        content = body
+        if body and 'json' in (headers.get('Content-Type') or ''):
+            content = json.loads(body.decode('utf-8'))
+        request = {'method': method, 'params': params, 'headers': headers, 'body': content,
+                   'url': self.url + raw_path}
+        # Reads run side by side; a handler that changes the data runs alone.
+        with self._data_lock.writing() if writes else self._data_lock.reading():
+            return handler(request, *args)
+
+    # Global Catalog
+
+    def _add_catalog_routes(self, router: _Router) -> None:
+        data = self.data
+
+        def list_entries(request, parent_id=None, kind=None):
+            params = request['params']
+            entries = [e for e in data.entries.values()
+                       if e.get('parent_id') == parent_id and kind in (None, '*', e['kind'])]
+            sort_by = params.get('sort-by') or 'name'
+            entries.sort(key=lambda e: e.get(sort_by) or '', reverse=params.get('descending') == 'true')
+            page, offset, limit = _page(entries, params, '_offset', '_limit', 50)
+            result = {'offset': offset, 'limit': limit, 'count': len(entries),
+                      'resource_count': len(page), 'resources': page}
+            if offset + limit < len(entries):
+                base = request['url'].split('?')[0]
+                result['next'] = base + '?' + urlencode(dict(params, _offset=offset + limit))
+            return FakeResponse(200, result)
+
+        def get_entry(request, entry_id):
+            if entry_id not in data.entries:
+                return _error(404, 'Entry not found')
+            return FakeResponse(200, data.entries[entry_id], headers={'ETag': '"{0}"'.format(
+                data.entries[entry_id]['updated'])})
+
+        def create_entry(request):
+            entry = dict(request['body'], created=_timestamp(time.time() - EPOCH.timestamp()))
+            entry['updated'] = entry['created']
+            if entry.get('id') in data.entries:
+                return _error(409, 'Entry exists')
+            data.entries[entry['id']] = entry
+            data.visibility[entry['id']] = {'restrictions': 'private', 'include': {'accounts': {}},
+                                            'exclude': {'accounts': {}}}
+            return FakeResponse(201, entry)
+
+        def update_entry(request, entry_id):
+            if entry_id not in data.entries:
+                return _error(404, 'Entry not found')
+            entry = dict(request['body'], id=entry_id, created=data.entries[entry_id].get('created'),
+                         updated=_timestamp(time.time() - EPOCH.timestamp()))
+            data.entries[entry_id] = entry
+            return FakeResponse(200, entry)
+
+        def delete_entry(request, entry_id):
+            if data.entries.pop(entry_id, None) is None:
+                return _error(404, 'Entry not found')
+            return FakeResponse(200)
+
+        def restore_entry(request, entry_id):
+            return FakeResponse(204) if entry_id in data.entries else _error(404, 'Entry not found')
+
+        def get_visibility(request, entry_id):
+            if entry_id not in data.visibility:
+                return _error(404, 'Entry not found')
+            return FakeResponse(200, data.visibility[entry_id])
+
+        def update_visibility(request, entry_id):
+            if entry_id not in data.visibility:
+                return _error(404, 'Entry not found')
+            data.visibility[entry_id].update(request['body'] or {})
+            return FakeResponse(200)
+
+        def get_pricing(request, entry_id):
+            if entry_id not in data.pricing:
+                return _error(404, 'Pricing not found')
+            return FakeResponse(200, data.pricing[entry_id])
+
+        def get_audit_logs(request, entry_id):
+            params = request['params']
+            logs = sorted(data.audit_logs.get(entry_id, []), key=lambda log: log['time'],
+                          reverse=params.get('ascending') != 'true')
+            if params.get('startat'):
+                startat = params['startat']
+                logs = [log for log in logs if log['time'] >= startat] \
+                    if params.get('ascending') == 'true' else [log for log in logs if log['time'] <= startat]
+            page, offset, limit = _page(logs, params, '_offset', '_limit', 50)
+            return FakeResponse(200, {'offset': offset, 'limit': limit, 'count': len(logs),
+                                      'resource_count': len(page), 'resources': page})
+
+        def list_artifacts(request, entry_id):
+            artifacts = [_artifact(name, content) for name, content
+                         in sorted(data.artifacts.get(entry_id, {}).items())]
+            return FakeResponse(200, {'count': len(artifacts), 'resources': artifacts})
+
+        def get_artifact(request, entry_id, name):
+            content = data.artifacts.get(entry_id, {}).get(name)
+            if content is None:
+                return _error(404, 'Artifact not found')
+            etag = _artifact(name, content)['etag']
+            found = re.match(r'bytes=(\d+)-$', request['headers'].get('Range') or '')
+            if_range = request['headers'].get('If-Range')
+            if found and if_range is not None and if_range != etag:
+                # A different version than the one the client holds part of.
+                found = None
+            if found:
+                start = int(found.group(1))
+                if start >= len(content):
+                    return FakeResponse(416, b'', headers={
+                        'Content-Range': 'bytes */{0}'.format(len(content))})
+                return FakeResponse(206, content[start:], headers={
+                    'Content-Range': 'bytes {0}-{1}/{2}'.format(start, len(content) - 1, len(content)),
+                    'ETag': etag})
+            return FakeResponse(200, content, headers={'ETag': etag})
+
+        def upload_artifact(request, entry_id, name):
+            body = request['body']
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode('utf-8')
+            data.artifacts.setdefault(entry_id, {})[name] = body
+            return FakeResponse(200)
+
+        def delete_artifact(request, entry_id, name):
+            if data.artifacts.get(entry_id, {}).pop(name, None) is None:
+                return _error(404, 'Artifact not found')
+            return FakeResponse(200)
+
+        router.add('GET', '/', list_entries)
+        router.add('POST', '/', create_entry)
+        router.add('GET', '/([^/]+)/visibility', get_visibility)
+        router.add('PUT', '/([^/]+)/visibility', update_visibility)
+        router.add('GET', '/([^/]+)/pricing', get_pricing)
+        router.add('GET', '/([^/]+)/logs', get_audit_logs)
+        router.add('PUT', '/([^/]+)/restore', restore_entry, writes=False)
+        router.add('GET', '/([^/]+)/artifacts', list_artifacts)
+        router.add('GET', '/([^/]+)/artifacts/([^/]+)', get_artifact)
+        router.add('PUT', '/([^/]+)/artifacts/([^/]+)', upload_artifact)
+        router.add('DELETE', '/([^/]+)/artifacts/([^/]+)', delete_artifact)
+        router.add('GET', '/([^/]+)/([^/]+)', list_entries)
+        router.add('GET', '/([^/]+)', get_entry)
+        router.add('PUT', '/([^/]+)', update_entry)
+        router.add('DELETE', '/([^/]+)', delete_entry)
+
+    # Global Search
+
+    def _add_search_routes(self, router: _Router) -> None:
+        data = self.data
+
+        def search(request):
+            body = request['body'] or {}
+            query = body.get('query') or '*'
+            resources = data.resources
+            if query not in ('*', ''):
+                terms = [term.split(':', 1)[-1].strip('"') for term in query.split()]
+                resources = [r for r in resources if all(term in json.dumps(r) for term in terms)]
+            start = int(body.get('search_cursor') or 0)
+            limit = min(1000, max(1, int(request['params'].get('limit') or 10)))
+            fields = body.get('fields')
+            items = resources[start:start + limit]
+            if fields and '*' not in fields:
+                items = [{k: v for k, v in item.items() if k in fields or k == 'crn'} for item in items]
+            return FakeResponse(200, {'search_cursor': str(start + len(items)), 'limit': limit,
+                                      'items': items})
+
+        def supported_types(request):
+            types = sorted({r['type'] for r in data.resources})
+            return FakeResponse(200, {'supported_types': types})
+
+        router.add('POST', '/v3/resources/search', search, writes=False)
+        router.add('GET', '/v2/resources/supported_types', supported_types)
+
+    # Global Tagging
+
+    def _add_tagging_routes(self, router: _Router) -> None:
+        data = self.data
+
+        def list_tags(request):
+            page, offset, limit = _page(sorted(data.tags), request['params'], 'offset', 'limit', 100)
+            return FakeResponse(200, {'total_count': len(data.tags), 'offset': offset,
+                                      'limit': limit, 'items': [{'name': tag} for tag in page]})
+
+        def tag_names(body):
+            return body.get('tag_names') or ([body['tag_name']] if body.get('tag_name') else [])
+
+        def attach(request):
+            body = request['body'] or {}
+            for tag in tag_names(body):
+                if tag not in data.tags:
+                    data.tags.append(tag)
+            return FakeResponse(200, {'results': [{'resource_id': r.get('resource_id'),
+                                                   'is_error': False}
+                                                  for r in body.get('resources') or []]})
+
+        def detach(request):
+            body = request['body'] or {}
+            return FakeResponse(200, {'results': [{'resource_id': r.get('resource_id'),
+                                                   'is_error': False}
+                                                  for r in body.get('resources') or []]})
+
+        def delete_tag(request, tag):
+            if tag not in data.tags:
+                return _error(404, 'Tag not found')
+            data.tags.remove(tag)
+            return FakeResponse(200, {'results': [{'tag_name': tag, 'is_error': False}]})
+
+        def delete_all(request):
+            deleted = list(data.tags)
+            del data.tags[:]
+            return FakeResponse(200, {'total_count': len(deleted), 'errors': False,
+                                      'items': [{'tag_name': tag, 'is_error': False} for tag in deleted]})
+
+        router.add('GET', '/v3/tags', list_tags)
+        router.add('DELETE', '/v3/tags', delete_all)
+        router.add('POST', '/v3/tags/attach', attach)
+        router.add('POST', '/v3/tags/detach', detach, writes=False)
+        router.add('DELETE', '/v3/tags/([^/]+)', delete_tag)
+
+    # IAM Access Groups
+
+    def _add_iam_routes(self, router: _Router) -> None:
+        data = self.data
+
+        def paged(request, items, key):
+            page, offset, limit = _page(items, request['params'], 'offset', 'limit', 50)
+            base = request['url'].split('?')[0]
+            result = {'limit': limit, 'offset': offset, 'total_count': len(items), key: page,
+                      'first': {'href': base + '?' + urlencode(dict(request['params'], offset=0))}}
+            if offset + limit < len(items):
+                result['next'] = {'href': base + '?' + urlencode(
+                    dict(request['params'], offset=offset + limit))}
+            return FakeResponse(200, result)
+
+        def group_or_404(group_id):
+            return data.groups.get(group_id)
+
+        def list_groups(request):
+            return paged(request, [data.groups[g] for g in sorted(data.groups)], 'groups')
+
+        def create_group(request):
+            body = request['body'] or {}
+            group_id = 'AccessGroupId-' + uuid.uuid4().hex
+            group = {'id': group_id, 'name': body.get('name'), 'description': body.get('description'),
+                     'account_id': request['params'].get('account_id', ACCOUNT_ID)}
+            data.groups[group_id] = group
+            data.members[group_id] = {}
+            data.rules[group_id] = {}
+            return FakeResponse(201, group)
+
+        def get_group(request, group_id):
+            group = group_or_404(group_id)
+            if group is None:
+                return _error(404, 'Group not found')
+            return FakeResponse(200, group, headers={'ETag': '"{0}"'.format(
+                group.get('last_modified_at') or '1')})
+
+        def update_group(request, group_id):
+            group = group_or_404(group_id)
+            if group is None:
+                return _error(404, 'Group not found')
+            group.update({k: v for k, v in (request['body'] or {}).items() if k in ('name', 'description')})
+            group['last_modified_at'] = _timestamp(time.time() - EPOCH.timestamp())
+            return FakeResponse(200, group)
+
+        def delete_group(request, group_id):
+            if data.groups.pop(group_id, None) is None:
+                return _error(404, 'Group not found')
+            data.members.pop(group_id, None)
+            data.rules.pop(group_id, None)
+            return FakeResponse(204)
+
+        def get_settings(request):
+            return FakeResponse(200, data.settings)
+
+        def update_settings(request):
+            data.settings.update(request['body'] or {})
+            return FakeResponse(200, data.settings)
+
+        def is_member(request, group_id, iam_id):
+            return FakeResponse(204 if iam_id in data.members.get(group_id, {}) else 404)
+
+        def list_members(request, group_id):
+            if group_id not in data.members:
+                return _error(404, 'Group not found')
+            members = data.members[group_id]
+            return paged(request, [members[m] for m in sorted(members)], 'members')
+
+        def add_members(request, group_id):
+            if group_id not in data.members:
+                return _error(404, 'Group not found')
+            added = []
+            for member in (request['body'] or {}).get('members') or []:
+                data.members[group_id][member['iam_id']] = dict(member)
+                added.append(dict(member, status_code=200))
+            return FakeResponse(207, {'members': added})
+
+        def remove_member(request, group_id, iam_id):
+            if data.members.get(group_id, {}).pop(iam_id, None) is None:
+                return _error(404, 'Member not found')
+            return FakeResponse(204)
+
+        def remove_members(request, group_id):
+            removed = []
+            for iam_id in (request['body'] or {}).get('members') or []:
+                found = data.members.get(group_id, {}).pop(iam_id, None) is not None
+                removed.append({'iam_id': iam_id, 'status_code': 204 if found else 404})
+            return FakeResponse(207, {'access_group_id': group_id, 'members': removed})
+
+        def remove_from_all(request, iam_id):
+            groups = [{'access_group_id': group_id, 'status_code': 204}
+                      for group_id, members in data.members.items() if members.pop(iam_id, None)]
+            if not groups:
+                return _error(404, 'Member not found')
+            return FakeResponse(207, {'iam_id': iam_id, 'groups': groups})
+
+        def add_to_many(request, iam_id):
+            body = request['body'] or {}
+            groups = []
+            for group_id in body.get('groups') or []:
+                if group_id in data.members:
+                    data.members[group_id][iam_id] = {'iam_id': iam_id, 'type': body.get('type', 'user')}
+                    groups.append({'access_group_id': group_id, 'status_code': 200})
+                else:
+                    groups.append({'access_group_id': group_id, 'status_code': 404})
+            return FakeResponse(207, {'iam_id': iam_id, 'groups': groups})
+
+        def add_rule(request, group_id):
+            if group_id not in data.rules:
+                return _error(404, 'Group not found')
+            rule_id = 'ClaimRule-' + uuid.uuid4().hex
+            rule = dict(request['body'] or {}, id=rule_id, access_group_id=group_id,
+                        account_id=ACCOUNT_ID)
+            data.rules[group_id][rule_id] = rule
+            return FakeResponse(201, rule)
+
+        def list_rules(request, group_id):
+            if group_id not in data.rules:
+                return _error(404, 'Group not found')
+            return FakeResponse(200, {'rules': list(data.rules[group_id].values())})
+
+        def get_rule(request, group_id, rule_id):
+            rule = data.rules.get(group_id, {}).get(rule_id)
+            if rule is None:
+                return _error(404, 'Rule not found')
+            return FakeResponse(200, rule, headers={'ETag': '"1"'})
+
+        def replace_rule(request, group_id, rule_id):
+            if rule_id not in data.rules.get(group_id, {}):
+                return _error(404, 'Rule not found')
+            rule = dict(request['body'] or {}, id=rule_id, access_group_id=group_id,
+                        account_id=ACCOUNT_ID)
+            data.rules[group_id][rule_id] = rule
+            return FakeResponse(200, rule)
+
+        def remove_rule(request, group_id, rule_id):
+            if data.rules.get(group_id, {}).pop(rule_id, None) is None:
+                return _error(404, 'Rule not found')
+            return FakeResponse(204)
+
+        router.add('GET', '/groups', list_groups)
+        router.add('POST', '/groups', create_group)
+        router.add('GET', '/groups/settings', get_settings)
+        router.add('PATCH', '/groups/settings', update_settings)
+        router.add('DELETE', '/groups/_allgroups/members/([^/]+)', remove_from_all)
+        router.add('PUT', '/groups/_allgroups/members/([^/]+)', add_to_many)
+        router.add('GET', '/groups/([^/]+)', get_group)
+        router.add('PATCH', '/groups/([^/]+)', update_group)
+        router.add('DELETE', '/groups/([^/]+)', delete_group)
+        router.add('HEAD', '/groups/([^/]+)/members/([^/]+)', is_member)
+        router.add('DELETE', '/groups/([^/]+)/members/([^/]+)', remove_member)
+        router.add('GET', '/groups/([^/]+)/members', list_members)
+        router.add('PUT', '/groups/([^/]+)/members', add_members)
+        router.add('POST', '/groups/([^/]+)/members/delete', remove_members)
+        router.add('POST', '/groups/([^/]+)/rules', add_rule)
+        router.add('GET', '/groups/([^/]+)/rules', list_rules)
+        router.add('GET', '/groups/([^/]+)/rules/([^/]+)', get_rule)
+        router.add('PUT', '/groups/([^/]+)/rules/([^/]+)', replace_rule)
+        router.add('DELETE', '/groups/([^/]+)/rules/([^/]+)', remove_rule)
+
+    # Resource Manager
+
+    def _add_resource_manager_routes(self, router: _Router) -> None:
+        data = self.data
+
+        def list_groups(request):
+            return FakeResponse(200, {'resources': [data.resource_groups[g]
+                                                    for g in sorted(data.resource_groups)]})
+
+        def create_group(request):
+            body = request['body'] or {}
+            group = data.add_resource_group(body.get('name') or uuid.uuid4().hex)
+            return FakeResponse(201, {'id': group['id'], 'crn': group['crn']})
+
+        def get_group(request, group_id):
+            if group_id not in data.resource_groups:
+                return _error(404, 'Resource group not found')
+            return FakeResponse(200, data.resource_groups[group_id])
+
+        def update_group(request, group_id):
+            if group_id not in data.resource_groups:
+                return _error(404, 'Resource group not found')
+            data.resource_groups[group_id].update(request['body'] or {})
+            return FakeResponse(200, data.resource_groups[group_id])
+
+        def delete_group(request, group_id):
+            if data.resource_groups.pop(group_id, None) is None:
+                return _error(404, 'Resource group not found')
+            return FakeResponse(204)
+
+        def list_quotas(request):
+            return FakeResponse(200, {'resources': [data.quotas[q] for q in sorted(data.quotas)]})
+
+        def get_quota(request, quota_id):
+            if quota_id not in data.quotas:
+                return _error(404, 'Quota not found')
+            return FakeResponse(200, data.quotas[quota_id])
+
+        router.add('GET', '/resource_groups', list_groups)
+        router.add('POST', '/resource_groups', create_group)
+        router.add('GET', '/resource_groups/([^/]+)', get_group)
+        router.add('PATCH', '/resource_groups/([^/]+)', update_group)
+        router.add('DELETE', '/resource_groups/([^/]+)', delete_group)
+        router.add('GET', '/quota_definitions', list_quotas)
+        router.add('GET', '/quota_definitions/([^/]+)', get_quota)
+
+
+def _artifact(name: str, content: bytes) -> Dict:
+    return {'name': name, 'size': len(content), 'etag': '"{0}"'.format(hashlib.md5(content).hexdigest()),
+            'updated': _timestamp(0)}
+
+
+def _error(status: int, message: str, *, headers: Dict[str, str] = None) -> FakeResponse:
+    return FakeResponse(status, {'errors': [{'code': 'fake_error', 'message': message}],
+                                 'status_code': status, 'trace': uuid.uuid4().hex},
+                        headers=headers)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Load tests open many connections at once.
+    request_queue_size = 128
+
+
+def _handler_class(server: FakePlatformServer):
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _serve(self) -> None:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            response = server.handle(self.command, self.path,
+                                     CaseInsensitiveDict(self.headers.items()), body)
+            payload = response.body
+            content_type = 'application/octet-stream'
+            if payload is None:
+                payload = b''
+            elif not isinstance(payload, bytes):
+                payload = json.dumps(payload).encode('utf-8')
+                content_type = 'application/json'
+            encoding = None
+            if payload and content_type == 'application/json' and server.compress_responses \
+                    and GZIP in (self.headers.get('Accept-Encoding') or ''):
+                payload = compress(payload, GZIP)
+                encoding = GZIP
+            server.count_sent(self.path, len(payload))
+            self.send_response(response.status)
+            for name, value in response.headers.items():
+                self.send_header(name, value)
+            if payload:
+                self.send_header('Content-Type', content_type)
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(payload)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = _serve
+
+        def log_message(self, format, *args) -> None: # pylint: disable=redefined-builtin
+            pass
+
+    return _Handler
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the artifact_sync module
+"""
+
+import hashlib
+import json
+import os
+import pytest
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.artifact_sync import ArtifactSync, SyncAction
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+
+
+service = GlobalCatalogV1(
+    authenticator=NoAuthAuthenticator()
+    )
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+service.set_service_url(base_url)
+
+
+def md5(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def mock_listing(resources):
+    responses.add(responses.GET, base_url + '/obj/artifacts',
+                  body=json.dumps({'count': len(resources), 'resources': resources}),
+                  content_type='application/json', status=200)
+
+
+class TestArtifactSync():
+
+    @responses.activate
+    def test_plan_upload(self, tmp_path):
+        (tmp_path / 'same.txt').write_bytes(b'same')
+        (tmp_path / 'changed.txt').write_bytes(b'new!')
+        (tmp_path / 'bigger.txt').write_bytes(b'bigger')
+        (tmp_path / 'new.txt').write_bytes(b'new')
+        mock_listing([
+            {'name': 'same.txt', 'size': 4, 'etag': md5(b'same')},
+            {'name': 'changed.txt', 'size': 4, 'etag': md5(b'old!')},
+            {'name': 'bigger.txt', 'size': 3, 'etag': md5(b'big')},
+            {'name': 'gone.txt', 'size': 1, 'etag': md5(b'x')},
+        ])
+
+        actions = ArtifactSync(service, 'obj', tmp_path, delete=True).plan('upload')
+
+        assert [(a.kind, a.name, a.reason) for a in actions] == [
+            ('upload', 'bigger.txt', 'size'),
+            ('upload', 'changed.txt', 'etag'),
+            ('upload', 'new.txt', 'missing'),
+            ('delete_remote', 'gone.txt', 'extra'),
+        ]
+
+    @responses.activate
+    def test_plan_download_by_timestamp(self, tmp_path):
+        (tmp_path / 'old.txt').write_bytes(b'abc')
+        os.utime(str(tmp_path / 'old.txt'), (1000000000, 1000000000))
+        (tmp_path / 'extra.txt').write_bytes(b'extra')
+        mock_listing([
+            {'name': 'old.txt', 'size': 3, 'etag': 'opaque', 'updated': '2020-01-01T00:00:00Z'},
+        ])
+
+        actions = ArtifactSync(service, 'obj', tmp_path).plan('download')
+
+        assert [(a.kind, a.name, a.reason) for a in actions] == [('download', 'old.txt', 'updated')]
+
+    @responses.activate
+    def test_run_upload(self, tmp_path):
+        (tmp_path / 'a.txt').write_bytes(b'aaa')
+        (tmp_path / 'b.txt').write_bytes(b'bbb')
+        mock_listing([{'name': 'b.txt', 'size': 3, 'etag': md5(b'bbb')},
+                      {'name': 'c.txt', 'size': 3, 'etag': md5(b'ccc')}])
+        responses.add(responses.PUT, base_url + '/obj/artifacts/a.txt', status=200)
+        responses.add(responses.DELETE, base_url + '/obj/artifacts/c.txt', status=200)
+
+        results = list(ArtifactSync(service, 'obj', tmp_path, delete=True).run('upload'))
+
+        assert all(r.ok for r in results)
+        assert sorted(r.action.kind for r in results) == ['delete_remote', 'upload']
+        put = [c for c in responses.calls if c.request.method == 'PUT'][0]
+        assert put.request.body == b'aaa'
+
+    @responses.activate
+    def test_run_download(self, tmp_path):
+        target = tmp_path / 'mirror'
+        mock_listing([{'name': 'a.txt', 'size': 3, 'etag': md5(b'aaa'),
+                       'updated': '2020-01-01T00:00:00Z'}])
+        responses.add(responses.GET, base_url + '/obj/artifacts/a.txt', body=b'aaa', status=200)
+
+        results = list(ArtifactSync(service, 'obj', target).run('download'))
+
+        assert [r.ok for r in results] == [True]
+        assert (target / 'a.txt').read_bytes() == b'aaa'
+        assert not (target / 'a.txt.part').exists()
+        assert os.path.getmtime(str(target / 'a.txt')) == pytest.approx(1577836800)
+
+    @responses.activate
+    def test_resumes_partial_download_of_same_version(self, tmp_path):
+        etag = md5(b'abcdef')
+        mock_listing([{'name': 'a.txt', 'size': 6, 'etag': etag}])
+        responses.add(responses.GET, base_url + '/obj/artifacts/a.txt', body=b'def', status=206,
+                      headers={'Content-Range': 'bytes 3-5/6'})
+        (tmp_path / 'a.txt.part').write_bytes(b'abc')
+        (tmp_path / 'a.txt.part.json').write_text(json.dumps({'etag': etag, 'size': 6}))
+
+        results = list(ArtifactSync(service, 'obj', tmp_path).run('download'))
+
+        assert results[0].ok and results[0].stats.resumed
+        get = responses.calls[1].request
+        assert get.headers['Range'] == 'bytes=3-' and get.headers['If-Range'] == etag
+        assert (tmp_path / 'a.txt').read_bytes() == b'abcdef'
+        assert sorted(os.listdir(str(tmp_path))) == ['a.txt']
+
+    @responses.activate
+    def test_restarts_partial_download_of_other_version(self, tmp_path):
+        mock_listing([{'name': 'a.txt', 'size': 6, 'etag': 'opaque-2',
+                       'updated': '2020-01-01T00:00:00Z'}])
+        responses.add(responses.GET, base_url + '/obj/artifacts/a.txt', body=b'ABCDEF', status=200)
+        (tmp_path / 'a.txt.part').write_bytes(b'abc')
+        (tmp_path / 'a.txt.part.json').write_text(json.dumps({'etag': 'opaque-1', 'size': 6}))
+
+        results = list(ArtifactSync(service, 'obj', tmp_path).run('download'))
+
+        assert results[0].ok and not results[0].stats.resumed
+        assert 'Range' not in responses.calls[1].request.headers
+        assert (tmp_path / 'a.txt').read_bytes() == b'ABCDEF'
+        # The next sync compares by timestamp and finds the file up to date.
+        assert ArtifactSync(service, 'obj', tmp_path).plan('download') == []
+
+    @responses.activate
+    def test_rejects_names_outside_directory(self, tmp_path):
+        target = tmp_path / 'mirror'
+        mock_listing([{'name': '../escaped.txt', 'size': 3},
+                      {'name': '/tmp/absolute.txt', 'size': 3},
+                      {'name': 'a.txt', 'size': 3}])
+        responses.add(responses.GET, base_url + '/obj/artifacts/a.txt', body=b'aaa', status=200)
+
+        results = list(ArtifactSync(service, 'obj', target).run('download'))
+
+        failed = sorted(r.action.name for r in results if not r.ok)
+        assert failed == ['../escaped.txt', '/tmp/absolute.txt']
+        assert all(isinstance(r.error, ValueError) for r in results if not r.ok)
+        assert len(responses.calls) == 2
+        assert sorted(os.listdir(str(tmp_path))) == ['mirror']
+        assert os.listdir(str(target)) == ['a.txt']
+
+    @responses.activate
+    def test_run_records_failures(self, tmp_path):
+        (tmp_path / 'a.txt').write_bytes(b'aaa')
+        mock_listing([])
+        responses.add(responses.PUT, base_url + '/obj/artifacts/a.txt', status=403)
+
+        results = list(ArtifactSync(service, 'obj', tmp_path).run())
+
+        assert len(results) == 1
+        assert not results[0].ok
+        assert results[0].action == SyncAction('upload', 'a.txt', 'missing')
+
+    def test_invalid_arguments(self, tmp_path):
+        with pytest.raises(ValueError):
+            ArtifactSync(service, None, tmp_path)
+        with pytest.raises(ValueError):
+            ArtifactSync(service, 'obj', tmp_path, max_workers=0)
+        with pytest.raises(ValueError):
+            ArtifactSync(service, 'obj', tmp_path).plan('sideways')
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the artifacts module
+"""
+
+import hashlib
+import io
+import json
+import mmap
+import pytest
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.artifacts import HashingReader, download_artifact, normalize_etag, upload_artifact
+from fake_server import FakePlatformServer
+from ibm_platform_services.global_catalog_v1 import Artifact, GlobalCatalogV1
+from ibm_platform_services.retry import RetryPolicy
+
+
+service = GlobalCatalogV1(
+    authenticator=NoAuthAuthenticator()
+    )
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+service.set_service_url(base_url)
+
+artifact_url = base_url + '/obj/artifacts/artifact.bin'
+payload = bytes(range(256)) * 40
+payload_etag = '"{0}"'.format(hashlib.md5(payload).hexdigest())
+
+
+def add_listing():
+    responses.add(responses.GET, base_url + '/obj/artifacts', status=200, json={
+        'count': 1, 'resources': [{'name': 'artifact.bin', 'size': len(payload),
+                                   'etag': payload_etag}]})
+
+
+class TestDownloadArtifact():
+
+    @responses.activate
+    def test_download_to_path(self, tmp_path):
+        responses.add(responses.GET, artifact_url, body=payload, status=200,
+                      content_type='application/octet-stream')
+        path = tmp_path / 'artifact.bin'
+
+        stats = download_artifact(service, 'obj', 'artifact.bin', path, chunk_size=1000,
+                                  account='global')
+
+        assert path.read_bytes() == payload
+        assert stats.bytes_transferred == len(payload)
+        assert not stats.resumed
+        assert stats.throughput >= 0
+        assert 'Range' not in responses.calls[0].request.headers
+        assert 'account=global' in responses.calls[0].request.url
+
+    @responses.activate
+    def test_resume_partial_file(self, tmp_path):
+        add_listing()
+        responses.add(responses.GET, artifact_url, body=payload[4000:], status=206,
+                      headers={'Content-Range': 'bytes 4000-{0}/{1}'.format(
+                          len(payload) - 1, len(payload))})
+        path = tmp_path / 'artifact.bin'
+        path.write_bytes(payload[:4000])
+
+        stats = download_artifact(service, 'obj', 'artifact.bin', str(path))
+
+        assert responses.calls[1].request.headers['Range'] == 'bytes=4000-'
+        assert responses.calls[1].request.headers['If-Range'] == payload_etag
+        assert path.read_bytes() == payload
+        assert stats.resumed
+        assert stats.bytes_transferred == len(payload) - 4000
+        assert stats.total_size == len(payload)
+
+    @responses.activate
+    def test_range_ignored_rewrites_file(self, tmp_path):
+        add_listing()
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+        path = tmp_path / 'artifact.bin'
+        path.write_bytes(b'stale')
+
+        stats = download_artifact(service, 'obj', 'artifact.bin', path)
+
+        assert path.read_bytes() == payload
+        assert stats.offset == 0
+
+    @responses.activate
+    def test_already_complete(self, tmp_path):
+        add_listing()
+        responses.add(responses.GET, artifact_url, status=416,
+                      headers={'Content-Range': 'bytes */{0}'.format(len(payload))})
+        path = tmp_path / 'artifact.bin'
+        path.write_bytes(payload)
+
+        stats = download_artifact(service, 'obj', 'artifact.bin', path)
+
+        assert stats.bytes_transferred == 0
+        assert path.read_bytes() == payload
+
+    @responses.activate
+    def test_no_validator_starts_over(self, tmp_path):
+        responses.add(responses.GET, base_url + '/obj/artifacts', status=200, json={
+            'count': 1, 'resources': [{'name': 'artifact.bin', 'size': len(payload)}]})
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+        path = tmp_path / 'artifact.bin'
+        path.write_bytes(b'old bytes')
+
+        stats = download_artifact(service, 'obj', 'artifact.bin', path)
+
+        assert 'Range' not in responses.calls[1].request.headers
+        assert path.read_bytes() == payload
+        assert not stats.resumed
+
+    def test_explicit_offset_overwrites_from_offset(self, tmp_path):
+        content = bytes(range(100))
+        with FakePlatformServer(catalog_entries=1, plans_per_entry=0) as server:
+            catalog = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+            server.attach(catalog)
+            server.data.artifacts['service-0']['blob.bin'] = content
+            path = tmp_path / 'blob.bin'
+            path.write_bytes(content[:40] + b'x' * 20)
+
+            stats = download_artifact(catalog, 'service-0', 'blob.bin', path, offset=40)
+
+            assert stats.resumed and stats.bytes_transferred == 60
+            assert path.read_bytes() == content
+            with pytest.raises(ValueError):
+                download_artifact(catalog, 'service-0', 'blob.bin', path, offset=200)
+
+    def test_stale_partial_file_is_replaced(self, tmp_path):
+        with FakePlatformServer(catalog_entries=1, plans_per_entry=0) as server:
+            catalog = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+            server.attach(catalog)
+            old, new = b'a' * 100, b'b' * 150
+            server.data.artifacts['service-0']['blob.bin'] = new
+            path = tmp_path / 'blob.bin'
+            path.write_bytes(old[:60])
+
+            stats = download_artifact(catalog, 'service-0', 'blob.bin', path,
+                                      if_range='"{0}"'.format(hashlib.md5(old).hexdigest()))
+
+            assert not stats.resumed
+            assert path.read_bytes() == new
+
+            # Without a validator, the current ETag is looked up and the
+            # partial file is continued.
+            path.write_bytes(new[:60])
+            stats = download_artifact(catalog, 'service-0', 'blob.bin', path)
+            assert stats.resumed and path.read_bytes() == new
+
+    @responses.activate
+    def test_download_to_file_object_and_mmap(self):
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+
+        stream = io.BytesIO()
+        download_artifact(service, 'obj', 'artifact.bin', stream, chunk_size=333)
+        assert stream.getvalue() == payload
+
+        target = mmap.mmap(-1, len(payload))
+        download_artifact(service, 'obj', 'artifact.bin', target, chunk_size=333)
+        assert target[:] == payload
+        target.close()
+
+    @responses.activate
+    def test_file_object_is_written_from_its_position(self):
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+
+        class Pipe(io.RawIOBase):
+            def __init__(self):
+                super().__init__()
+                self.received = b''
+            def writable(self):
+                return True
+            def write(self, data):
+                self.received += bytes(data)
+                return len(data)
+        pipe = Pipe()
+        download_artifact(service, 'obj', 'artifact.bin', pipe)
+        assert pipe.received == payload
+
+        stream = io.BytesIO()
+        stream.write(b'header')
+        download_artifact(service, 'obj', 'artifact.bin', stream)
+        assert stream.getvalue() == b'header' + payload
+
+    @responses.activate
+    def test_download_goes_through_send_layers(self):
+        responses.add(responses.GET, artifact_url, status=503)
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+        client = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+        client.set_service_url(base_url)
+        policy = RetryPolicy(sleep=lambda delay: None)
+        policy.attach(client)
+
+        stream = io.BytesIO()
+        download_artifact(client, 'obj', 'artifact.bin', stream)
+
+        assert stream.getvalue() == payload
+        assert policy.stats.retries_by_operation == {'get_artifact': 1}
+
+    @responses.activate
+    def test_download_to_buffer(self):
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+        responses.add(responses.GET, artifact_url, body=payload, status=200)
+
+        buffer = bytearray(len(payload))
+        stats = download_artifact(service, 'obj', 'artifact.bin', buffer)
+        assert bytes(buffer) == payload
+        assert stats.bytes_transferred == len(payload)
+
+        with pytest.raises(ValueError):
+            download_artifact(service, 'obj', 'artifact.bin', bytearray(10))
+
+    def test_required_params(self):
+        with pytest.raises(ValueError):
+            download_artifact(service, None, 'artifact.bin', io.BytesIO())
+        with pytest.raises(ValueError):
+            download_artifact(service, 'obj', None, io.BytesIO())
+        with pytest.raises(ValueError):
+            download_artifact(service, 'obj', 'artifact.bin', None)
+
+
+class TestUploadArtifact():
+
+    @responses.activate
+    def test_skips_unchanged_artifact(self, tmp_path):
+        path = tmp_path / 'artifact.bin'
+        path.write_bytes(payload)
+        digest = hashlib.md5(payload).hexdigest()
+        responses.add(responses.GET, base_url + '/obj/artifacts',
+                      body=json.dumps({'count': 1, 'resources': [
+                          {'name': 'artifact.bin', 'size': len(payload), 'etag': '"{0}"'.format(digest)}]}),
+                      content_type='application/json', status=200)
+
+        result = upload_artifact(service, 'obj', 'artifact.bin', path)
+
+        assert not result.uploaded
+        assert result.digest == digest
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_uploads_changed_artifact(self):
+        responses.add(responses.PUT, artifact_url, status=200)
+        existing = Artifact(name='artifact.bin', size=len(payload), etag='0' * 32)
+        source = io.BytesIO(payload)
+
+        result = upload_artifact(service, 'obj', 'artifact.bin', source, existing=existing,
+                                 content_type='application/octet-stream')
+
+        assert result.uploaded
+        assert result.digest == hashlib.md5(payload).hexdigest()
+        assert result.stats.bytes_transferred == len(payload)
+        assert responses.calls[0].request.headers['Content-Type'] == 'application/octet-stream'
+        assert responses.calls[0].request.headers['Content-Length'] == str(len(payload))
+
+    @responses.activate
+    def test_size_mismatch_skips_hashing(self):
+        responses.add(responses.PUT, artifact_url, status=200)
+        existing = Artifact(name='artifact.bin', size=1, etag=hashlib.md5(payload).hexdigest())
+
+        result = upload_artifact(service, 'obj', 'artifact.bin', io.BytesIO(payload),
+                                 existing=existing)
+
+        assert result.uploaded
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_new_artifact_without_lookup(self):
+        responses.add(responses.PUT, artifact_url, status=200)
+
+        result = upload_artifact(service, 'obj', 'artifact.bin', io.BytesIO(b'abc'),
+                                 check_existing=False)
+
+        assert result.uploaded
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_retry_rehashes_from_start(self):
+        responses.add(responses.PUT, artifact_url, status=503)
+        responses.add(responses.PUT, artifact_url, status=200)
+        client = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+        client.set_service_url(base_url)
+        RetryPolicy(sleep=lambda _: None).attach(client)
+
+        result = upload_artifact(client, 'obj', 'artifact.bin', io.BytesIO(payload),
+                                 check_existing=False)
+
+        assert len(responses.calls) == 2
+        assert responses.calls[1].request.body == payload
+        assert result.digest == hashlib.md5(payload).hexdigest()
+
+
+class TestHelpers():
+
+    def test_normalize_etag(self):
+        assert normalize_etag('W/"ABC"') == 'abc'
+        assert normalize_etag('"abc"') == 'abc'
+        assert normalize_etag(None) is None
+
+    def test_hashing_reader_restarts_on_rewind(self):
+        reader = HashingReader(io.BytesIO(b'hello world'))
+        reader.read(5)
+        reader.seek(0)
+        assert reader.read() == b'hello world'
+        assert reader.hexdigest() == hashlib.md5(b'hello world').hexdigest()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the audit_logs module
+"""
+
+import datetime
+import io
+import json
+import re
+import urllib.parse
+import pytest
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.audit_logs import AuditLogExporter, format_startat
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+
+
+service = GlobalCatalogV1(
+    authenticator=NoAuthAuthenticator()
+    )
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+service.set_service_url(base_url)
+
+logs_url = re.compile(re.escape(base_url) + r'/(\w+)/logs')
+epoch = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_logs(count, step=datetime.timedelta(hours=1)):
+    return [{'id': 'log-{0}'.format(i), 'type': 'update',
+             'time': format_startat(epoch + step * i)} for i in range(count)]
+
+
+def add_logs_callback(logs_by_object):
+    def callback(request):
+        object_id = logs_url.match(request.url).group(1)
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(request.url).query)
+        assert query['ascending'] == ['true']
+        startat = query['startat'][0]
+        offset = int(query['_offset'][0])
+        limit = int(query['_limit'][0])
+        matching = [log for log in logs_by_object[object_id] if log['time'] >= startat]
+        page = matching[offset:offset + limit]
+        return (200, {}, json.dumps({'offset': offset, 'limit': limit,
+                                     'count': len(matching), 'resources': page}))
+    responses.add_callback(responses.GET, logs_url, callback=callback,
+                           content_type='application/json')
+
+
+class TestAuditLogExporter():
+
+    @responses.activate
+    def test_windows_exported_in_time_order(self):
+        logs = make_logs(50)
+        add_logs_callback({'obj': logs})
+        exporter = AuditLogExporter(service, window=datetime.timedelta(hours=7),
+                                    page_size=3, max_workers=4)
+        out = io.StringIO()
+
+        count = exporter.export(['obj'], out, epoch, epoch + datetime.timedelta(hours=50))
+
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert count == 50
+        assert [line['id'] for line in lines] == [log['id'] for log in logs]
+        assert len(responses.calls) > 8
+
+    @responses.activate
+    def test_duplicates_dropped(self):
+        logs = make_logs(4)
+        logs.insert(2, dict(logs[1]))
+        add_logs_callback({'obj': logs})
+        exporter = AuditLogExporter(service, window=datetime.timedelta(hours=1))
+
+        messages = list(exporter.iter_messages('obj', epoch, epoch + datetime.timedelta(hours=4)))
+
+        assert [m.id for m in messages] == ['log-0', 'log-1', 'log-2', 'log-3']
+
+    @responses.activate
+    def test_range_end_is_exclusive(self):
+        add_logs_callback({'obj': make_logs(10)})
+        exporter = AuditLogExporter(service, window=datetime.timedelta(hours=2))
+
+        messages = list(exporter.iter_messages('obj', epoch + datetime.timedelta(hours=3),
+                                               epoch + datetime.timedelta(hours=6)))
+
+        assert [m.id for m in messages] == ['log-3', 'log-4', 'log-5']
+
+    @responses.activate
+    def test_incremental_export(self, tmp_path):
+        logs = make_logs(5)
+        add_logs_callback({'a': logs, 'b': make_logs(2)})
+        exporter = AuditLogExporter(service, state_path=str(tmp_path / 'state.json'))
+        end = epoch + datetime.timedelta(days=1)
+
+        first = io.StringIO()
+        assert exporter.export_incremental(['a', 'b'], first, epoch, end) == 7
+
+        logs.extend(make_logs(8)[5:])
+        second = io.StringIO()
+        assert exporter.export_incremental(['a', 'b'], second, epoch, end) == 3
+        assert [json.loads(line)['id'] for line in second.getvalue().splitlines()] == \
+            ['log-5', 'log-6', 'log-7']
+
+        state = exporter.load_state()
+        assert state['a']['time'].startswith('2020-01-01T07:00:00')
+        assert state['b']['time'].startswith('2020-01-01T01:00:00')
+
+    def test_invalid_params(self):
+        with pytest.raises(ValueError):
+            AuditLogExporter(service, page_size=201)
+        with pytest.raises(ValueError):
+            AuditLogExporter(service, window=datetime.timedelta(0))
+        with pytest.raises(ValueError):
+            AuditLogExporter(service).export_incremental(['obj'], io.StringIO(), epoch)
+        with pytest.raises(ValueError):
+            list(AuditLogExporter(service).iter_messages(None, epoch))
+
+    def test_windows_cover_range(self):
+        exporter = AuditLogExporter(service, window=datetime.timedelta(days=2))
+        windows = exporter.windows(datetime.datetime(2020, 1, 1, 0, 0, 0, 500),
+                                   datetime.datetime(2020, 1, 6))
+        assert [(w[0].day, w[1].day) for w in windows] == [(1, 3), (3, 5), (5, 6)]
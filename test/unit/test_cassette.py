@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the cassette module
+"""
+
+import gzip
+import io
+import json
+import pytest
+import requests
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.artifacts import download_artifact
+from ibm_platform_services.cassette import Cassette, CassetteMiss, summarize
+from fake_server import FakePlatformServer
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+from ibm_platform_services.global_tagging_v1 import GlobalTaggingV1
+
+
+def workload(catalog, tagging, entry_id):
+    results = [catalog.list_catalog_entries(q='kind:service').get_result(),
+               catalog.get_catalog_entry(entry_id).get_result(),
+               tagging.list_tags(limit=10).get_result()]
+    artifact = io.BytesIO()
+    download_artifact(catalog, entry_id, 'readme.md', artifact)
+    results.append(artifact.getvalue())
+    try:
+        catalog.get_catalog_entry('missing')
+    except ApiException as err:
+        results.append(err.code)
+    return results
+
+
+def new_clients(server=None):
+    catalog = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+    tagging = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+    if server is not None:
+        server.attach(catalog, tagging)
+    return catalog, tagging
+
+
+class TestCassette():
+
+    def test_record_then_replay(self, tmp_path):
+        path = str(tmp_path / 'workload.jsonl.gz')
+        with FakePlatformServer(catalog_entries=5, tags=20) as server:
+            catalog, tagging = new_clients(server)
+            entry_id = sorted(server.data.entries)[0]
+            with Cassette(path, mode=Cassette.RECORD) as cassette:
+                cassette.attach(catalog, tagging)
+                recorded = workload(catalog, tagging, entry_id)
+            service_urls = (catalog.service_url, tagging.service_url)
+        assert cassette.interactions == 5
+        assert recorded[-1] == 404
+        assert [r['status'] for r in summarize(path)] == [200, 200, 200, 200, 404]
+
+        # The server is gone; the cassette answers instead.
+        sleeps = []
+        catalog, tagging = new_clients()
+        catalog.set_service_url(service_urls[0])
+        tagging.set_service_url(service_urls[1])
+        cassette = Cassette(path, sleep=sleeps.append)
+        cassette.attach(catalog, tagging)
+        assert workload(catalog, tagging, entry_id) == recorded
+        assert len(sleeps) == 5 and all(delay >= 0 for delay in sleeps)
+
+    def test_original_timing_replays_pacing(self, tmp_path):
+        path = str(tmp_path / 'paced.jsonl.gz')
+        now = [0.0]
+        with FakePlatformServer(catalog_entries=3) as server:
+            catalog, _ = new_clients(server)
+            entry_ids = sorted(server.data.entries)[:3]
+            with Cassette(path, mode=Cassette.RECORD, clock=lambda: now[0]) as cassette:
+                cassette.attach(catalog)
+                for entry_id, at in zip(entry_ids, [10.0, 12.0, 15.0]):
+                    now[0] = at
+                    catalog.get_catalog_entry(entry_id)
+            url = catalog.service_url
+        assert [r['offset'] for r in summarize(path)] == [0, 2, 5]
+
+        sleeps = []
+        def sleep(delay):
+            sleeps.append(delay)
+            now[0] += delay
+        catalog, _ = new_clients()
+        catalog.set_service_url(url)
+        Cassette(path, sleep=sleep, clock=lambda: now[0]).attach(catalog)
+        for entry_id in entry_ids:
+            catalog.get_catalog_entry(entry_id)
+            # Time spent between requests counts towards the recorded gap.
+            now[0] += 1
+        assert sleeps == [1, 2]
+
+    def test_repeated_requests_replay_in_order(self, tmp_path):
+        path = str(tmp_path / 'retries.jsonl.gz')
+        with FakePlatformServer(catalog_entries=1) as server:
+            catalog, _ = new_clients(server)
+            entry_id = sorted(server.data.entries)[0]
+            with Cassette(path, mode=Cassette.RECORD) as cassette:
+                cassette.attach(catalog)
+                catalog.update_visibility(entry_id, include={'accounts': {'a': ''}})
+                catalog.update_visibility(entry_id, include={'accounts': {'a': ''}})
+                first = catalog.get_visibility(entry_id).get_result()
+                server.data.visibility[entry_id] = {'restrictions': 'private'}
+                second = catalog.get_visibility(entry_id).get_result()
+            url = catalog.service_url
+        catalog, _ = new_clients()
+        catalog.set_service_url(url)
+        Cassette(path, timing=Cassette.FAST).attach(catalog)
+        assert catalog.get_visibility(entry_id).get_result() == first
+        assert catalog.get_visibility(entry_id).get_result() == second
+        # Once the recorded responses run out the last one is served again.
+        assert catalog.get_visibility(entry_id).get_result() == second
+        with pytest.raises(CassetteMiss):
+            catalog.get_visibility('other')
+
+    def test_compressed_responses_are_recorded_decoded(self, tmp_path):
+        path = str(tmp_path / 'compressed.jsonl.gz')
+        with FakePlatformServer(catalog_entries=20, compress_responses=True) as server:
+            catalog, _ = new_clients(server)
+            with Cassette(path, mode=Cassette.RECORD) as cassette:
+                cassette.attach(catalog)
+                listed = catalog.list_catalog_entries()
+            url = catalog.service_url
+        assert listed.get_headers()['Content-Encoding'] == 'gzip'
+
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            record = [json.loads(line) for line in file][-1]
+        headers = {name.lower(): value for name, value in record['response_headers']}
+        assert 'content-encoding' not in headers
+        assert headers['content-length'] == str(len(record['body'].encode('utf-8')))
+
+        catalog, _ = new_clients()
+        catalog.set_service_url(url)
+        Cassette(path, timing=Cassette.FAST).attach(catalog)
+        replayed = catalog.list_catalog_entries()
+        assert replayed.get_result() == listed.get_result()
+        assert 'Content-Encoding' not in replayed.get_headers()
+
+    def test_connection_errors_are_replayed(self, tmp_path):
+        path = str(tmp_path / 'errors.jsonl.gz')
+        catalog, _ = new_clients()
+        catalog.set_service_url('http://127.0.0.1:9')
+        with Cassette(path, mode=Cassette.RECORD) as cassette:
+            cassette.attach(catalog)
+            with pytest.raises(requests.exceptions.ConnectionError):
+                catalog.get_catalog_entry('entry')
+        Cassette(path, timing=Cassette.FAST).attach(catalog)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            catalog.get_catalog_entry('entry')
+
+    def test_invalid_arguments(self, tmp_path):
+        with pytest.raises(ValueError):
+            Cassette(str(tmp_path / 'c.gz'), mode='other')
+        with pytest.raises(ValueError):
+            Cassette(str(tmp_path / 'c.gz'), mode=Cassette.RECORD, timing='slow')
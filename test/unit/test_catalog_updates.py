@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the catalog_updates module
+"""
+
+import json
+import re
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.catalog_updates import CatalogEntryUpdater, entry_hash
+from ibm_platform_services.global_catalog_v1 import CatalogEntry, GlobalCatalogV1
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+entry_url = re.compile(re.escape(base_url) + r'/[\w-]+')
+
+
+def make_entry(name, **fields):
+    entry = {'name': name, 'kind': 'service', 'disabled': False, 'tags': ['b', 'a'],
+             'overview_ui': {'en': {'display_name': name}},
+             'images': {'image': 'https://example.com/i.png'},
+             'provider': {'name': 'IBM', 'email': 'x@ibm.com'}}
+    entry.update(fields)
+    return entry
+
+
+def make_updater(**kwargs):
+    client = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+    client.set_service_url(base_url)
+    return CatalogEntryUpdater(client, **kwargs)
+
+
+class TestEntryHash():
+
+    def test_hash_ignores_read_only_fields_and_tag_order(self):
+        entry = make_entry('svc')
+        read_back = dict(make_entry('svc', tags=['a', 'b']), id='svc', url='https://x',
+                         updated='2020-01-01T00:00:00Z')
+
+        assert entry_hash(entry) == entry_hash(read_back)
+        assert entry_hash(CatalogEntry.from_dict(entry)) == entry_hash(entry)
+        assert entry_hash(make_entry('svc', disabled=True)) != entry_hash(entry)
+
+
+class TestCatalogEntryUpdater():
+
+    @responses.activate
+    def test_skips_unchanged_and_updates_changed(self):
+        responses.add(responses.PUT, entry_url, body='{}', content_type='application/json',
+                      status=200)
+        updater = make_updater()
+        updater.remember(make_entry('same'), 'same')
+        updater.remember(make_entry('changed'), 'changed')
+
+        skipped = updater.update('same', make_entry('same'))
+        updated = updater.update('changed', make_entry('changed', tags=['new']))
+
+        assert skipped.ok and not skipped.updated
+        assert updated.ok and updated.updated
+        assert len(responses.calls) == 1
+        body = json.loads(responses.calls[0].request.body)
+        assert body['tags'] == ['new']
+        assert updater.update('changed', make_entry('changed', tags=['new'])).updated is False
+
+    @responses.activate
+    def test_move_always_updates(self):
+        responses.add(responses.PUT, entry_url, body='{}', content_type='application/json',
+                      status=200)
+        updater = make_updater()
+        updater.remember(make_entry('same'), 'same')
+
+        moved = updater.update('same', make_entry('same'), move='new-parent')
+
+        assert moved.ok and moved.updated
+        assert len(responses.calls) == 1
+        assert 'move=new-parent' in responses.calls[0].request.url
+
+    @responses.activate
+    def test_fetches_entries_without_cached_state(self):
+        responses.add(responses.GET, base_url + '/known',
+                      body=json.dumps(dict(make_entry('known'), id='known')),
+                      content_type='application/json', status=200)
+        responses.add(responses.GET, base_url + '/missing', status=404)
+        responses.add(responses.PUT, base_url + '/missing', body='{}',
+                      content_type='application/json', status=200)
+        updater = make_updater()
+
+        assert not updater.update('known', make_entry('known')).updated
+        assert updater.update('missing', make_entry('missing')).updated
+        assert 'complete=true' in responses.calls[0].request.url
+
+    @responses.activate
+    def test_update_many_runs_concurrently(self):
+        responses.add_callback(responses.PUT, entry_url,
+                               callback=lambda r: (500 if r.url.endswith('bad') else 200, {}, '{}'),
+                               content_type='application/json')
+        updater = make_updater(fetch_missing=False, max_workers=4)
+        for index in range(0, 20, 2):
+            updater.remember(make_entry('entry-{0}'.format(index)), 'entry-{0}'.format(index))
+        desired = [('entry-{0}'.format(i), make_entry('entry-{0}'.format(i))) for i in range(20)]
+        desired.append(('entry-bad', make_entry('bad')))
+
+        results = list(updater.update_many(desired))
+
+        assert len(results) == 21
+        assert sum(1 for r in results if r.updated) == 10
+        assert [r.id for r in results if not r.ok] == ['entry-bad']
+        assert 'entry-bad' not in updater.hashes
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the change_feed module
+"""
+
+import json
+import urllib.parse
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.change_feed import CatalogChangeFeed, ChangeEvent
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+
+
+class FakeCatalog():
+
+    def __init__(self, page_size=2):
+        self.entries = {}
+        self.page_size = page_size
+        self.clock = 0
+
+    def put(self, entry_id, **fields):
+        self.clock += 1
+        entry = {'id': entry_id, 'updated': '2020-01-01T00:{0:02d}:00Z'.format(self.clock)}
+        entry.update(fields)
+        self.entries[entry_id] = entry
+
+    def callback(self, request):
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(request.url).query))
+        offset = int(query.get('_offset', 0))
+        entries = list(self.entries.values())
+        if query.get('sort-by') == 'updated':
+            entries.sort(key=lambda e: e['updated'], reverse=query.get('descending') == 'true')
+        page = entries[offset:offset + self.page_size]
+        result = {'offset': offset, 'count': len(entries), 'resources': page}
+        if offset + self.page_size < len(entries):
+            next_query = dict(query, _offset=offset + self.page_size)
+            result['next'] = base_url + '/?' + urllib.parse.urlencode(next_query)
+        return (200, {}, json.dumps(result))
+
+
+def setup_feed(catalog, **kwargs):
+    responses.add_callback(responses.GET, base_url + '/', callback=catalog.callback,
+                           content_type='application/json')
+    client = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+    client.set_service_url(base_url)
+    return CatalogChangeFeed(client, **kwargs)
+
+
+class TestCatalogChangeFeed():
+
+    @responses.activate
+    def test_first_poll_lists_everything(self):
+        catalog = FakeCatalog()
+        for name in ('a', 'b', 'c'):
+            catalog.put(name)
+        feed = setup_feed(catalog)
+
+        events = list(feed.poll())
+
+        assert [(e.kind, e.id) for e in events] == [('added', 'a'), ('added', 'b'), ('added', 'c')]
+        assert feed.watermark == catalog.entries['c']['updated']
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_poll_fetches_only_recent_pages(self, tmp_path):
+        catalog = FakeCatalog()
+        for index in range(10):
+            catalog.put('entry-{0}'.format(index))
+        state_path = str(tmp_path / 'feed.json')
+        service = setup_feed(catalog, state_path=state_path).service
+        list(CatalogChangeFeed(service, state_path=state_path).poll())
+        calls = len(responses.calls)
+
+        catalog.put('entry-3', name='renamed')
+        catalog.put('new')
+        catalog.put('entry-5', active=False)
+        feed = CatalogChangeFeed(service, state_path=state_path)
+        events = list(feed.poll())
+
+        assert events == [ChangeEvent('changed', 'entry-3', catalog.entries['entry-3']['updated'],
+                                      entry=catalog.entries['entry-3']),
+                          ChangeEvent('added', 'new', catalog.entries['new']['updated'],
+                                      entry=catalog.entries['new']),
+                          ChangeEvent('deleted', 'entry-5', catalog.entries['entry-5']['updated'],
+                                      entry=catalog.entries['entry-5'])]
+        # Three changes on pages of two, then the page holding the watermark.
+        assert len(responses.calls) - calls == 3
+        assert 'entry-5' not in feed.known
+
+        assert list(feed.poll()) == []
+
+    @responses.activate
+    def test_interrupted_poll_is_repeated(self, tmp_path):
+        catalog = FakeCatalog()
+        catalog.put('a')
+        state_path = str(tmp_path / 'feed.json')
+        feed = setup_feed(catalog, state_path=state_path)
+
+        next(feed.poll())
+
+        assert [e.id for e in CatalogChangeFeed(feed.service, state_path=state_path).poll()] == ['a']
+
+    @responses.activate
+    def test_reconcile_finds_removed_entries(self):
+        catalog = FakeCatalog()
+        for name in ('a', 'b', 'c'):
+            catalog.put(name)
+        feed = setup_feed(catalog)
+        list(feed.poll())
+        del catalog.entries['b']
+
+        events = list(feed.reconcile())
+
+        assert [(e.kind, e.id) for e in events] == [('deleted', 'b')]
+        assert sorted(feed.known) == ['a', 'c']
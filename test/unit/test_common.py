@@ -35,3 +35,19 @@ class TestCommon(unittest.TestCase):
         self.assertIsNotNone(headers.get('User-Agent'))
         print("User-Agent: {0}".format(headers.get('User-Agent')))
         self.assertTrue(headers.get('User-Agent').startswith('platform-services-python-sdk'))
+
+    def test_get_sdk_operation(self):
+        """
+        Test the get_sdk_operation method
+        """
+        headers = common.get_sdk_headers('global_catalog', 'V1', 'get_pricing')
+        self.assertNotIn(common.HEADER_NAME_SDK_ANALYTICS, headers)
+        self.assertIsNone(common.take_sdk_operation('resource_manager'))
+        common.get_sdk_headers('global_catalog', 'V1', 'get_pricing')
+        operation = common.take_sdk_operation('global_catalog')
+        self.assertEqual(operation, ('global_catalog', 'V1', 'get_pricing'))
+        self.assertIsNone(common.take_sdk_operation('global_catalog'))
+        common.set_sdk_operation(headers, operation)
+        self.assertEqual(common.get_sdk_operation(headers), ('global_catalog', 'V1', 'get_pricing'))
+        self.assertEqual(common.get_sdk_operation({}), (None, None, None))
+        self.assertEqual(common.get_sdk_operation(None), (None, None, None))
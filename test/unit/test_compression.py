@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the compression module
+"""
+
+import json
+import pytest
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.compression import RequestCompression, compress, decompress
+from fake_server import FakePlatformServer
+from ibm_platform_services.global_tagging_v1 import GlobalTaggingV1
+from ibm_platform_services.iam_access_groups_v2 import IamAccessGroupsV2
+from ibm_platform_services.transport import wrap_send
+
+
+base_url = 'https://tags.global-search-tagging.cloud.ibm.com'
+
+
+def new_service(layer):
+    service = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+    service.set_service_url(base_url)
+    layer.attach(service)
+    return service
+
+
+def crns(count):
+    return [{'resource_id': 'crn:v1:bluemix:public:cloud-object-storage:global:a/acct:{0}::'.format(i)}
+            for i in range(count)]
+
+
+class TestCompress():
+
+    @pytest.mark.parametrize('encoding', ['gzip', 'deflate'])
+    def test_round_trip(self, encoding):
+        data = b'{"resources": []}' * 100
+        assert decompress(compress(data, encoding), encoding) == data
+        assert len(compress(data, encoding)) < len(data)
+
+    def test_unknown_encoding(self):
+        with pytest.raises(ValueError):
+            compress(b'', 'br')
+        with pytest.raises(ValueError):
+            RequestCompression(encoding='br')
+        with pytest.raises(ValueError):
+            RequestCompression(level=0)
+
+
+class TestRequestCompression():
+
+    @responses.activate
+    def test_large_bodies_are_compressed(self):
+        responses.add(responses.POST, base_url + '/v3/tags/attach', json={'results': []}, status=200)
+        layer = RequestCompression(threshold=1024)
+        service = new_service(layer)
+        service.attach_tag(crns(500), tag_name='env:prod')
+        service.attach_tag(crns(1), tag_name='env:prod')
+        large, small = responses.calls
+        assert large.request.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(decompress(large.request.body))['tag_name'] == 'env:prod'
+        assert 'Content-Encoding' not in small.request.headers
+        assert small.request.headers['Accept-Encoding'] == 'gzip, deflate'
+        stats = layer.stats.to_dict()
+        assert stats['requests'] == 2 and stats['compressed'] == 1
+        assert stats['bytes_after'] * 10 < stats['bytes_before']
+
+    @responses.activate
+    def test_operations_filter(self):
+        responses.add(responses.POST, base_url + '/v3/tags/detach', json={'results': []}, status=200)
+        service = new_service(RequestCompression(threshold=0, operations=['attach_tag']))
+        service.detach_tag(crns(500), tag_name='env:prod')
+        assert 'Content-Encoding' not in responses.calls[0].request.headers
+
+    @responses.activate
+    def test_inner_layers_keep_case_insensitive_headers(self):
+        responses.add(responses.POST, base_url + '/v3/tags/attach', json={'results': []}, status=200)
+        service = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+        service.set_service_url(base_url)
+        seen = []
+        def inner(send, request, **kwargs):
+            seen.append((request['headers']['Content-Type'], request['headers']['content-encoding']))
+            return send(request, **kwargs)
+        wrap_send(service, inner)
+        RequestCompression(threshold=0).attach(service)
+
+        service.attach_tag(crns(10), tag_name='env:prod')
+
+        assert seen == [('application/json', 'gzip')]
+
+    def test_against_the_fake_server(self):
+        with FakePlatformServer(tags=1, access_groups=1, members_per_group=1,
+                                compress_responses=True) as server:
+            tagging = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+            iam = IamAccessGroupsV2(authenticator=NoAuthAuthenticator())
+            server.attach(tagging, iam)
+            RequestCompression().attach(tagging, iam)
+            body = crns(2000)
+            tagging.attach_tag(body, tag_name='env:prod')
+            assert 'env:prod' in server.data.tags
+            sent = len(json.dumps({'resources': body, 'tag_name': 'env:prod'}))
+            assert server.bytes_received['global_tagging'] * 10 < sent
+            group_id = next(iter(server.data.groups))
+            members = [{'iam_id': 'IBMid-{0}'.format(i), 'type': 'user'} for i in range(300)]
+            iam.add_members_to_access_group(group_id, members=members)
+            result = iam.list_access_group_members(group_id, limit=100).get_result()
+            assert len(result['members']) == 100
+            assert server.bytes_sent['iam_access_groups'] < len(json.dumps(result))
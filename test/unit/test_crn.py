@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the crn module
+"""
+
+import pytest
+from ibm_platform_services.crn import CRN, CRNIndex, crn_of
+from ibm_platform_services.global_search_v2 import ResultItem
+from ibm_platform_services.global_tagging_v1 import Resource
+
+kms = 'crn:v1:bluemix:public:kms:us-south:a/acct1:instance-1:key:4b1d:v2'
+
+
+def make_crn(service, location, instance, account='acct1'):
+    return 'crn:v1:bluemix:public:{0}:{1}:a/{2}:{3}::'.format(service, location, account, instance)
+
+
+class TestCRN():
+
+    def test_parse(self):
+        crn = CRN.parse(kms)
+        assert crn.service_name == 'kms' and crn.location == 'us-south'
+        assert crn.scope == 'a/acct1' and crn.account_id == 'acct1' and crn.scope_type == 'a'
+        assert crn.service_instance == 'instance-1' and crn.resource_type == 'key'
+        assert crn.resource == '4b1d:v2'
+        assert str(crn) == kms
+        assert CRN.parse(crn) is crn
+        assert CRN.parse(make_crn('kms', 'eu-de', 'i')).account_id == 'acct1'
+        assert CRN.parse('crn:v1:bluemix:public:iam:::::').account_id is None
+
+    def test_segments_are_interned(self):
+        first = CRN.parse(make_crn('cloudantnosqldb', 'us-south', 'one'))
+        second = CRN.parse(make_crn('cloudantnosqldb', 'us-south', 'two'))
+        assert first.service_name is second.service_name
+        assert first.scope is second.scope
+
+    @pytest.mark.parametrize('text', ['', 'crn:v1:bluemix', 'urn:v1:bluemix:public:kms:us-south:a/x:i::',
+                                      None])
+    def test_invalid(self, text):
+        with pytest.raises(ValueError):
+            CRN.parse(text)
+
+    def test_crn_of_models(self):
+        assert crn_of(ResultItem(crn=kms)) == CRN.parse(kms)
+        assert crn_of(Resource(resource_id=kms), 'resource_id') == CRN.parse(kms)
+        assert crn_of({'crn': kms}) == CRN.parse(kms)
+
+
+class TestCRNIndex():
+
+    def make_index(self):
+        index = CRNIndex()
+        for service in ('kms', 'kms-x', 'cloudantnosqldb'):
+            for location in ('us-south', 'eu-de'):
+                for instance in range(3):
+                    index.add(make_crn(service, location, instance))
+        return index
+
+    def test_find_and_count(self):
+        index = self.make_index()
+        assert len(index) == 18
+        found = index.find(service_name='kms', location='us-south')
+        assert [crn.service_instance for crn in found] == ['0', '1', '2']
+        assert index.count(service_name='kms') == 6
+        assert index.count(service_name='kms', location='jp-tok') == 0
+        assert index.count_by('location', service_name='cloudantnosqldb') == {'us-south': 3, 'eu-de': 3}
+        assert index.count_by('service_name') == {'kms': 6, 'kms-x': 6, 'cloudantnosqldb': 6}
+        assert len(index.find()) == 18
+        with pytest.raises(ValueError):
+            index.find(region='us-south')
+
+    def test_unindexed_segments_are_scanned(self):
+        index = self.make_index()
+        assert [str(crn) for crn in index.find(service_instance='1', location='eu-de',
+                                               service_name='kms')] == [make_crn('kms', 'eu-de', 1)]
+        assert index.count(ctype='public') == 18
+        only_instances = CRNIndex(index, segments=['service_instance'])
+        assert only_instances.count(service_instance='2') == 6
+        with pytest.raises(ValueError):
+            CRNIndex(segments=['region'])
+
+    def test_removals_are_compacted(self):
+        crns = [make_crn('kms', 'us-south', i) for i in range(3000)]
+        index = CRNIndex(crns)
+        for crn in crns[:2000]:
+            index.remove(crn)
+        index.add(crns[0])
+        assert index.count(service_name='kms') == 1001
+        assert index.find(location='us-south')[0] == CRN.parse(crns[0])
+        assert len(index.prefix('crn:v1:bluemix:public:kms:')) == 1001
+
+    def test_prefix(self):
+        index = self.make_index()
+        assert len(index.prefix('crn:v1:bluemix:public:kms:')) == 6
+        assert len(index.prefix('crn:v1:bluemix:public:kms')) == 12
+        assert index.prefix('crn:v1:bluemix:public:kms:eu-de:a/acct1:2:') == [
+            CRN.parse(make_crn('kms', 'eu-de', 2))]
+        index.remove(make_crn('kms', 'eu-de', 2))
+        assert index.prefix('crn:v1:bluemix:public:kms:eu-de:a/acct1:2:') == []
+
+    def test_values_and_removal(self):
+        items = [{'crn': make_crn('kms', 'us-south', i), 'name': 'key-{0}'.format(i)} for i in range(4)]
+        index = CRNIndex(items)
+        assert index.get(items[1]['crn'])['name'] == 'key-1'
+        assert index.items(service_instance='2') == [(CRN.parse(items[2]['crn']), items[2])]
+        index.remove(items[1]['crn'])
+        assert items[1]['crn'] not in index and 'not a crn' not in index
+        assert index.count(service_name='kms') == 3
+        with pytest.raises(KeyError):
+            index.remove(items[1]['crn'])
+        index.add(items[1]['crn'], 'again')
+        assert index.get(items[1]['crn']) == 'again' and len(index) == 4
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the fake_server module
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import pytest
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services import (GlobalCatalogV1, GlobalSearchV2, GlobalTaggingV1,
+                                   IamAccessGroupsV2, ResourceManagerV2)
+from fake_server import FakePlatformServer
+from ibm_platform_services.global_catalog_v1 import EntrySearchResult, PricingGet
+from ibm_platform_services.global_search_v2 import ScanResult
+from ibm_platform_services.global_tagging_v1 import TagList
+from ibm_platform_services.iam_access_groups_v2 import GroupMembersList, GroupsList
+from ibm_platform_services.resource_manager_v2 import ResourceGroupList
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FakePlatformServer(catalog_entries=30, resources=250, tags=40, access_groups=5,
+                            members_per_group=12, resource_groups=3) as fake:
+        yield fake
+
+
+def client(server, cls):
+    service = cls(authenticator=NoAuthAuthenticator())
+    server.attach(service)
+    return service
+
+
+class TestFakePlatformServer():
+
+    def test_global_catalog(self, server):
+        catalog = client(server, GlobalCatalogV1)
+
+        listed = EntrySearchResult.from_dict(catalog.list_catalog_entries().get_result())
+        plans = catalog.get_child_objects('service-1', 'plan').get_result()
+        pricing = PricingGet.from_dict(catalog.get_pricing(plans['resources'][0]['id']).get_result())
+
+        assert listed.count == 30
+        assert len(listed.resources) == 30
+        assert len(plans['resources']) == 2
+        assert pricing.metrics[0].amounts[0].prices
+        assert catalog.get_catalog_entry('service-1').get_result()['kind'] == 'service'
+        with pytest.raises(ApiException) as err:
+            catalog.get_catalog_entry('missing')
+        assert err.value.code == 404
+
+    def test_global_search_cursor_paging(self, server):
+        search = client(server, GlobalSearchV2)
+        crns = []
+        cursor = None
+        while True:
+            result = ScanResult.from_dict(search.search(query='*', fields=['name'], limit=100,
+                                                        search_cursor=cursor).get_result())
+            crns.extend(item.crn for item in result.items)
+            if len(result.items) < 100:
+                break
+            cursor = result.search_cursor
+
+        assert len(crns) == 250
+        assert len(set(crns)) == 250
+
+    def test_global_tagging(self, server):
+        tagging = client(server, GlobalTaggingV1)
+
+        tags = TagList.from_dict(tagging.list_tags(offset=10, limit=5).get_result())
+        attached = tagging.attach_tag([{'resource_id': 'crn:1'}], tag_name='new-tag').get_result()
+
+        assert [tag.name for tag in tags.items] == sorted('tag-{0}'.format(i) for i in range(40))[10:15]
+        assert attached['results'][0]['is_error'] is False
+        assert TagList.from_dict(tagging.list_tags(limit=1000).get_result()).total_count == 41
+
+    def test_iam_access_groups(self, server):
+        iam = client(server, IamAccessGroupsV2)
+
+        groups = GroupsList.from_dict(iam.list_access_groups('fake-account', limit=2).get_result())
+        members = GroupMembersList.from_dict(
+            iam.list_access_group_members(groups.groups[0].id, limit=5, offset=10).get_result())
+        head = iam.is_member_of_access_group(groups.groups[0].id, 'IBMid-0')
+
+        assert groups.total_count == 5
+        assert groups.next.href
+        assert len(members.members) == 2
+        assert head.get_status_code() == 204
+
+    def test_resource_manager(self, server):
+        manager = client(server, ResourceManagerV2)
+
+        created = manager.create_resource_group(name='load-test').get_result()
+        groups = ResourceGroupList.from_dict(manager.list_resource_groups().get_result())
+
+        assert created['id'] in [group.id for group in groups.resources]
+        assert manager.get_resource_group(created['id']).get_result()['name'] == 'load-test'
+
+    def test_injected_latency_and_errors(self):
+        with FakePlatformServer(catalog_entries=1, latency=0.05, error_rate=1.0,
+                                error_status=429) as fake:
+            catalog = client(fake, GlobalCatalogV1)
+            start = time.perf_counter()
+            with pytest.raises(ApiException) as err:
+                catalog.get_catalog_entry('service-0')
+            assert time.perf_counter() - start >= 0.05
+            assert err.value.code == 429
+            assert err.value.http_response.headers['Retry-After'] == '0'
+
+            fake.error_rate = 0
+            fake.latency = 0
+            assert catalog.get_catalog_entry('service-0').get_status_code() == 200
+            assert fake.requests[('GET', 'global_catalog')] == 2
+
+    def test_reads_are_served_concurrently(self):
+        with FakePlatformServer(catalog_entries=2, plans_per_entry=0) as fake:
+            # Both lookups must be inside their handlers at once to get past
+            # the barrier.
+            barrier = threading.Barrier(2, timeout=5)
+
+            class Entries(dict):
+                def __contains__(self, key):
+                    barrier.wait()
+                    return super().__contains__(key)
+
+            fake.data.entries = Entries(fake.data.entries)
+            catalog = client(fake, GlobalCatalogV1)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                statuses = list(executor.map(lambda entry_id: catalog.get_catalog_entry(
+                    entry_id).get_status_code(), ['service-0', 'service-1']))
+
+            assert statuses == [200, 200]
+            assert not barrier.broken
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the fanout module
+"""
+
+import threading
+import pytest
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.fanout import FanOut, FanOutReport, FanOutResult
+from ibm_platform_services.resource_manager_v2 import ResourceManagerV2
+
+
+service = ResourceManagerV2(
+    authenticator=NoAuthAuthenticator()
+    )
+
+base_url = 'https://resource-controller.cloud.ibm.com/v2'
+service.set_service_url(base_url)
+
+
+class TestFanOut():
+
+    @responses.activate
+    def test_run_tags_results_by_account(self):
+        url = base_url + '/resource_groups'
+        responses.add(responses.GET,
+                      url,
+                      body='{"resources": []}',
+                      content_type='application/json',
+                      status=200)
+
+        runner = FanOut(max_workers=4, max_per_host=2)
+        accounts = ['acct-{0}'.format(i) for i in range(10)]
+        results = runner.run_all(service.list_resource_groups, accounts, date='2020-01')
+
+        assert sorted(results.keys()) == sorted(accounts)
+        assert all(r.ok for r in results.values())
+        assert len(responses.calls) == 10
+        for call in responses.calls:
+            assert 'account_id=acct-' in call.request.url
+            assert 'date=2020-01' in call.request.url
+        assert runner.report.total == 10
+        assert runner.report.succeeded == 10
+
+    @responses.activate
+    def test_run_records_failures(self):
+        url = base_url + '/resource_groups'
+        responses.add(responses.GET,
+                      url,
+                      body='{"message": "boom"}',
+                      content_type='application/json',
+                      status=500)
+
+        runner = FanOut()
+        results = list(runner.run(service.list_resource_groups, ['a', 'b']))
+
+        assert len(results) == 2
+        assert not any(r.ok for r in results)
+        assert isinstance(results[0].error, ApiException)
+        assert results[0].get_result() is None
+        assert sorted(runner.report.failures.keys()) == ['a', 'b']
+        assert runner.report.to_dict()['failed'] == 2
+
+    def test_run_bounds_per_host_concurrency(self):
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+        gate = threading.Event()
+
+        def call(account_id):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            gate.wait(0.05)
+            with lock:
+                state['active'] -= 1
+            return account_id
+
+        runner = FanOut(max_workers=8, max_per_host=3)
+        results = runner.run_all(call, range(12), account_param=None)
+
+        assert len(results) == 12
+        assert state['peak'] <= 3
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            FanOut(max_workers=0)
+        with pytest.raises(ValueError):
+            FanOut(max_per_host=0)
+
+
+class TestFanOutReport():
+
+    def test_percentiles(self):
+        report = FanOutReport()
+        for i in range(1, 101):
+            report.record(FanOutResult(str(i), latency=float(i)))
+        assert report.percentile(0) == 1.0
+        assert report.percentile(50) == 51.0
+        assert report.percentile(100) == 100.0
+        assert FanOutReport().percentile(95) == 0.0
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the hedging module
+"""
+
+import itertools
+import threading
+import time
+import pytest
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+from ibm_platform_services.hedging import HedgingPolicy
+from ibm_platform_services.transport import wrap_send
+
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+
+
+def new_service(policy, delays):
+    """Return a client whose n-th request is delayed by delays[n] seconds."""
+    service = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+    service.set_service_url(base_url)
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def slow(send, request, **kwargs):
+        with lock:
+            n = next(counter)
+        time.sleep(delays[n] if n < len(delays) else 0)
+        return send(request, **kwargs)
+
+    wrap_send(service, slow)
+    policy.attach(service)
+    return service
+
+
+class TestHedgingPolicy():
+
+    @responses.activate
+    def test_hedge_wins_when_primary_is_slow(self):
+        responses.add(responses.GET, base_url + '/id/pricing', body='{"currency": "USD"}',
+                      content_type='application/json', status=200)
+        policy = HedgingPolicy(delay=0.02, max_extra_load=1)
+        service = new_service(policy, [0.5, 0])
+
+        start = time.perf_counter()
+        response = service.get_pricing('id')
+        elapsed = time.perf_counter() - start
+
+        assert response.get_result() == {'currency': 'USD'}
+        assert elapsed < 0.4
+        assert policy.stats.to_dict() == {'calls': 1, 'hedged': 1, 'hedge_wins': 1, 'denied': 0,
+                                          'saturated': 0}
+        policy.close()
+
+    @responses.activate
+    def test_no_hedge_or_queueing_when_workers_are_busy(self):
+        responses.add(responses.GET, base_url + '/id/pricing', body='{"currency": "USD"}',
+                      content_type='application/json', status=200)
+        policy = HedgingPolicy(delay=0.01, max_extra_load=1, max_workers=1)
+        service = new_service(policy, [0.3, 0.3])
+        results = []
+        first = threading.Thread(target=lambda: results.append(service.get_pricing('id')))
+        first.start()
+        time.sleep(0.05)
+        start = time.perf_counter()
+        results.append(service.get_pricing('id'))
+        assert time.perf_counter() - start < 0.5
+        first.join()
+
+        assert [r.get_status_code() for r in results] == [200, 200]
+        stats = policy.stats.to_dict()
+        assert stats['hedged'] == 0 and stats['saturated'] == 2
+        assert max(policy._latencies['get_pricing']) < 0.45 # pylint: disable=protected-access
+        policy.close()
+
+    @responses.activate
+    def test_no_hedge_when_primary_is_fast(self):
+        responses.add(responses.GET, base_url + '/id', body='{"id": "id"}',
+                      content_type='application/json', status=200)
+        policy = HedgingPolicy(delay=0.5, max_extra_load=1)
+        service = new_service(policy, [])
+
+        service.get_catalog_entry('id')
+
+        assert len(responses.calls) == 1
+        assert policy.stats.hedged == 0
+        policy.close()
+
+    @responses.activate
+    def test_load_cap(self):
+        responses.add(responses.GET, base_url + '/id/pricing', body='{}',
+                      content_type='application/json', status=200)
+        policy = HedgingPolicy(delay=0.01, max_extra_load=0.5)
+        service = new_service(policy, [0.05, 0.05, 0.05, 0.05, 0.05])
+
+        for _ in range(2):
+            service.get_pricing('id')
+
+        assert policy.stats.hedged == 1
+        assert policy.stats.denied == 1
+        policy.close()
+
+    @responses.activate
+    def test_error_when_both_fail(self):
+        responses.add(responses.GET, base_url + '/id/pricing', status=500)
+        policy = HedgingPolicy(delay=0.01, max_extra_load=1)
+        service = new_service(policy, [0.05, 0.05])
+
+        with pytest.raises(ApiException):
+            service.get_pricing('id')
+        policy.close()
+
+    @responses.activate
+    def test_unhedged_operations_pass_through(self):
+        responses.add(responses.POST, base_url + '/', body='{}',
+                      content_type='application/json', status=201)
+        policy = HedgingPolicy(delay=0, max_extra_load=1)
+        service = new_service(policy, [0.05])
+
+        service.create_catalog_entry('name', 'service', {}, {}, False, [], {}, 'id')
+
+        assert policy.stats.calls == 0
+        policy.close()
+
+    def test_observed_percentile_delay(self):
+        policy = HedgingPolicy(delay=1.0, min_samples=10)
+        assert policy.hedge_delay('get_pricing') == 1.0
+        for i in range(100):
+            policy._record('get_pricing', i / 100.0)
+        assert policy.hedge_delay('get_pricing') == pytest.approx(0.94)
+        policy.close()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the inventory_diff module
+"""
+
+import os
+import random
+import pytest
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services import inventory_diff
+from fake_server import FakePlatformServer
+from ibm_platform_services.global_search_v2 import GlobalSearchV2, ResultItem
+from ibm_platform_services.inventory_diff import (ResourceChange, diff_snapshots, read_snapshot,
+                                                  search_inventory, sorted_records, write_snapshot)
+
+
+def resource(index, **doc):
+    return {'crn': 'crn:v1:bluemix:public:fake:us-south:a/acct:{0:05}::'.format(index),
+            'name': 'resource-{0}'.format(index), 'doc': dict({'state': 'active'}, **doc)}
+
+
+def inventories():
+    old = [resource(i) for i in range(200)]
+    new = [resource(i) for i in range(50, 260)]
+    new[0] = resource(50, state='removed')
+    new[1] = resource(51, updated_at='2020-10-01')
+    random.Random(0).shuffle(old)
+    random.Random(1).shuffle(new)
+    return old, new
+
+
+def summary(changes):
+    return sorted((change.kind, int(change.crn[-7:-2])) for change in changes)
+
+
+class TestSortedRecords():
+
+    @pytest.mark.parametrize('max_records', [1, 7, 1000])
+    def test_sorted_and_unique(self, tmpdir, max_records, monkeypatch):
+        monkeypatch.setattr(inventory_diff, 'MAX_FANIN', 3)
+        items = [resource(i % 40, copy=i) for i in range(100)]
+        random.Random(2).shuffle(items)
+        records = list(sorted_records(items, max_records=max_records, tmpdir=str(tmpdir)))
+        assert [record[0] for record in records] == sorted({item['crn'] for item in items})
+        # The first of the resources with the same CRN is kept.
+        first = {}
+        for item in items:
+            first.setdefault(item['crn'], item)
+        assert all(next(sorted_records([first[r[0]]])) == r for r in records)
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_missing_key(self):
+        with pytest.raises(ValueError):
+            list(sorted_records([{'name': 'x'}]))
+
+
+class TestDiffSnapshots():
+
+    @pytest.mark.parametrize('max_records', [10, 100000])
+    def test_changes(self, tmpdir, max_records):
+        old, new = inventories()
+        changes = list(diff_snapshots(old, new, max_records=max_records, tmpdir=str(tmpdir)))
+        assert summary(changes) == sorted(
+            [('removed', i) for i in range(50)] + [('added', i) for i in range(200, 260)]
+            + [('modified', 50), ('modified', 51)])
+        modified = [change for change in changes if change.kind == 'modified']
+        assert modified[0].old['doc'] == {'state': 'active'}
+        assert modified[0].new['doc'] == {'state': 'removed'}
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_ignore_and_documents(self):
+        old, new = inventories()
+        changes = list(diff_snapshots(old, new, ignore=['doc.updated_at'], documents=False))
+        assert [c for c in changes if c.kind == 'modified'] == [
+            ResourceChange('modified', resource(50)['crn'])]
+
+    def test_files_and_models(self, tmpdir):
+        old, new = inventories()
+        path = str(tmpdir.join('old.jsonl.gz'))
+        assert write_snapshot([ResultItem.from_dict(item) for item in old], path) == 200
+        assert sorted(item['crn'] for item in read_snapshot(path)) == sorted(i['crn'] for i in old)
+        assert summary(diff_snapshots(path, new)) == summary(diff_snapshots(old, new))
+
+    def test_search_inventory(self):
+        with FakePlatformServer(resources=2500) as server:
+            search = GlobalSearchV2(authenticator=NoAuthAuthenticator())
+            server.attach(search)
+            old = list(search_inventory(search))
+            assert len(old) == 2500
+            del server.data.resources[10]
+            server.data.resources[20]['tags'] = ['env:prod']
+            changes = list(diff_snapshots(old, search_inventory(search), documents=False))
+            assert [change.kind for change in changes] == ['removed', 'modified']
+            assert server.requests[('POST', 'global_search')] == 6
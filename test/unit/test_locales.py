@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the locales module
+"""
+
+import json
+import pytest
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.global_catalog_v1 import EntrySearchResult, GlobalCatalogV1
+from ibm_platform_services.locales import LocalePruner
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+languages = ['en', 'de', 'fr', 'fr-ca', 'pt-br', 'ja']
+
+
+def make_entry(name):
+    return {
+        'name': name, 'kind': 'service', 'id': name, 'disabled': False,
+        'tags': [], 'provider': {'name': 'IBM', 'email': 'x@ibm.com'},
+        'images': {'image': 'https://example.com/' + name + '.png'},
+        'overview_ui': {lang: {'display_name': name + ' ' + lang} for lang in languages},
+        'metadata': {'ui': {'strings': {lang: {'bullets': [], 'instruction': lang}
+                                        for lang in languages},
+                            'hidden': False}},
+    }
+
+
+def make_client():
+    client = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+    client.set_service_url(base_url)
+    return client
+
+
+class TestLocalePruner():
+
+    def test_keeps_requested_locales(self):
+        pruner = LocalePruner(['fr', 'pt_BR'])
+        assert pruner.keeps('fr')
+        assert pruner.keeps('fr-CA')
+        assert pruner.keeps('pt-br')
+        assert pruner.keeps('pt')
+        assert not pruner.keeps('pt-pt')
+        assert not pruner.keeps('en')
+        with pytest.raises(ValueError):
+            LocalePruner([])
+
+    def test_loads_prunes_language_maps_only(self):
+        pruner = LocalePruner(['de'])
+        document = json.dumps({'resources': [make_entry('a')],
+                               'strings': {'en': 'not a language map'}})
+
+        result = pruner.loads(document.encode('utf-8'))
+
+        entry = result['resources'][0]
+        assert list(entry['overview_ui']) == ['de']
+        assert list(entry['metadata']['ui']['strings']) == ['de']
+        assert entry['metadata']['ui']['hidden'] is False
+        assert result['strings'] == {'en': 'not a language map'}
+
+    @responses.activate
+    def test_attach_prunes_catalog_operations(self):
+        body = json.dumps({'resources': [make_entry('a'), make_entry('b')]})
+        responses.add(responses.GET, base_url + '/', body=body,
+                      content_type='application/json', status=200)
+        responses.add(responses.GET, base_url + '/a/plan', body=body,
+                      content_type='application/json', status=200)
+        responses.add(responses.GET, base_url + '/a/pricing', body=json.dumps(make_entry('a')),
+                      content_type='application/json', status=200)
+        client = make_client()
+        LocalePruner(['en', 'ja']).attach(client)
+
+        listed = client.list_catalog_entries(languages='*').get_result()
+        children = client.get_child_objects('a', 'plan').get_result()
+        pricing = client.get_pricing('a').get_result()
+
+        for result in (listed, children):
+            entries = EntrySearchResult.from_dict(result).resources
+            assert sorted(vars(entries[1].overview_ui)) == ['en', 'ja']
+            assert sorted(vars(entries[1].metadata.ui.strings)) == ['en', 'ja']
+        assert len(pricing['overview_ui']) == len(languages)
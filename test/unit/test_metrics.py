@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the metrics module
+"""
+
+import pytest
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+from ibm_platform_services.metrics import MetricsRegistry
+from ibm_platform_services.retry import RetryPolicy
+
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+
+
+class FakeClock():
+
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def new_service(*layers):
+    service = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+    service.set_service_url(base_url)
+    for layer in layers:
+        layer.attach(service)
+    return service
+
+
+def find(snapshot, status):
+    return [item for item in snapshot['requests'] if item['status'] == status][0]
+
+
+class TestMetricsRegistry():
+
+    @responses.activate
+    def test_records_latency_bytes_and_status(self):
+        body = '{"id": "entry"}'
+        responses.add(responses.GET, base_url + '/entry', body=body, status=200,
+                      content_type='application/json')
+        responses.add(responses.GET, base_url + '/missing', body='{"message": "nope"}',
+                      status=404, content_type='application/json')
+        seen = []
+        registry = MetricsRegistry(buckets=[0.1, 1.0], clock=FakeClock(0.25),
+                                   listeners=[seen.append])
+        service = new_service(registry)
+        service.get_catalog_entry('entry')
+        service.get_catalog_entry('entry')
+        with pytest.raises(ApiException):
+            service.get_catalog_entry('missing')
+        snapshot = registry.snapshot()
+        ok = find(snapshot, '200')
+        assert ok['service'] == 'global_catalog'
+        assert ok['operation_id'] == 'get_catalog_entry'
+        assert ok['count'] == 2
+        assert ok['sum_seconds'] == pytest.approx(0.5)
+        assert ok['buckets'] == [[0.1, 0], [1.0, 2], [float('inf'), 2]]
+        assert ok['bytes_in'] == 2 * len(body)
+        assert find(snapshot, '404')['count'] == 1
+        assert snapshot['in_flight'] == [{'service': 'global_catalog',
+                                          'operation_id': 'get_catalog_entry', 'count': 0}]
+        assert [(m.status, m.seconds) for m in seen] == [('200', 0.25), ('200', 0.25), ('404', 0.25)]
+
+    @responses.activate
+    def test_counts_request_bytes_and_retries(self):
+        responses.add(responses.PUT, base_url + '/entry/visibility', status=503)
+        responses.add(responses.PUT, base_url + '/entry/visibility', status=200)
+        registry = MetricsRegistry()
+        policy = RetryPolicy(sleep=lambda delay: None, metrics=registry)
+        # The registry is attached first, so it runs inside the retry layer.
+        service = new_service(registry, policy)
+        service.update_visibility('entry', extendable=True)
+        snapshot = registry.snapshot()
+        assert find(snapshot, '503')['count'] == 1
+        assert find(snapshot, '200')['bytes_out'] == len('{"extendable": true}')
+        assert snapshot['retries'] == [{'service': 'global_catalog',
+                                        'operation_id': 'update_visibility', 'count': 1}]
+
+    @responses.activate
+    def test_disabled_records_nothing(self):
+        responses.add(responses.GET, base_url + '/entry', json={}, status=200)
+        registry = MetricsRegistry(enabled=False)
+        service = new_service(registry)
+        service.get_catalog_entry('entry')
+        assert registry.snapshot() == {'requests': [], 'retries': [], 'in_flight': []}
+
+    def test_prometheus_text(self):
+        registry = MetricsRegistry(buckets=[0.5], namespace='sdk')
+        registry.observe('global_tagging', 'list_tags', 200, 0.2, bytes_in=10)
+        registry.retry('global_tagging', 'list_tags')
+        text = registry.to_prometheus()
+        labels = 'service="global_tagging",operation="list_tags",status="200"'
+        assert '# TYPE sdk_request_duration_seconds histogram' in text
+        assert 'sdk_request_duration_seconds_bucket{%s,le="0.5"} 1' % labels in text
+        assert 'sdk_request_duration_seconds_bucket{%s,le="+Inf"} 1' % labels in text
+        assert 'sdk_request_duration_seconds_sum{%s} 0.2' % labels in text
+        assert 'sdk_response_bytes_total{%s} 10' % labels in text
+        assert 'sdk_retries_total{service="global_tagging",operation="list_tags"} 1' in text
+        registry.reset()
+        assert 'list_tags' not in registry.to_prometheus()
+
+    def test_requires_buckets(self):
+        with pytest.raises(ValueError):
+            MetricsRegistry(buckets=[])
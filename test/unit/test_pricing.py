@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the pricing module
+"""
+
+import json
+import pytest
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from fake_server import FakePlatformServer
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1, Metrics, PricingGet
+from ibm_platform_services.pricing import PricingCache, PricingEngine, naive_cost, normalize_tier_model
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+requires_numpy = pytest.mark.skipif(np is None, reason='requires numpy')
+
+
+def make_metric(metric_id, tier_model, amounts, unit_quantity='1'):
+    return {'metric_id': metric_id, 'tier_model': tier_model,
+            'charge_unit_quantity': unit_quantity,
+            'amounts': [{'country': country, 'currency': currency,
+                         'prices': [{'quantity_tier': tier, 'Price': price}
+                                    for tier, price in prices]}
+                        for country, currency, prices in amounts]}
+
+
+pricing_dict = {'type': 'paygo', 'metrics': [
+    make_metric('gb', 'Granular Tier', [
+        ('USA', 'USD', [(100, 1.0), (1000, 0.5), (999999999, 0.25)]),
+        ('GBR', 'GBP', [(500, 0.8), (999999999, 0.4)])]),
+    make_metric('calls', 'Simple Tier', [
+        ('USA', 'USD', [(10, 0.2), (999999999, 0.1)])], unit_quantity='1000'),
+    make_metric('instance', 'Step Tier', [
+        ('USA', 'USD', [(5, 50), (20, 120), (999999999, 300)])]),
+    make_metric('hours', 'Linear', [('USA', 'USD', [(1, 0.03)])]),
+]}
+
+
+@requires_numpy
+class TestPricingEngine():
+
+    def test_graduated_cost(self):
+        engine = PricingEngine.from_dict(pricing_dict)
+
+        costs = engine.cost('gb', [0, 50, 100, 400, 2000])
+
+        assert costs.tolist() == pytest.approx([0, 50, 100, 250, 800])
+
+    def test_volume_step_and_linear_costs(self):
+        engine = PricingEngine.from_dict(pricing_dict)
+
+        assert engine.cost('calls', [5000, 20000]).tolist() == pytest.approx([1.0, 2.0])
+        assert engine.cost('instance', [1, 5, 6, 100]).tolist() == [50, 50, 120, 300]
+        assert engine.cost('hours', [100]).tolist() == pytest.approx([3.0])
+
+    def test_country_rows_share_bounds(self):
+        engine = PricingEngine.from_dict(pricing_dict)
+
+        costs = engine.cost('gb', [100, 700], country='GBR', currency='GBP')
+
+        assert costs.tolist() == pytest.approx([80, 480])
+        with pytest.raises(KeyError):
+            engine.cost('gb', [1], country='FRA', currency='EUR')
+
+    def test_matches_naive_loop(self):
+        pricing = PricingGet.from_dict(pricing_dict)
+        engine = PricingEngine(pricing)
+        rng = np.random.RandomState(7)
+        quantities = rng.uniform(0, 50000, size=500)
+
+        for metrics in pricing.metrics:
+            expected = [naive_cost(metrics, q) for q in quantities]
+            assert engine.cost(metrics.metric_id, quantities).tolist() == pytest.approx(expected)
+
+    def test_mixed_records(self):
+        engine = PricingEngine.from_dict(pricing_dict)
+
+        costs = engine.costs(['gb', 'hours', 'gb'], [400, 100, 50])
+
+        assert costs.tolist() == pytest.approx([250, 3, 50])
+        assert engine.total(['gb', 'hours'], [400, 100]) == pytest.approx(253)
+        with pytest.raises(KeyError):
+            engine.costs(['unknown'], [1])
+        with pytest.raises(ValueError):
+            engine.costs(['gb'], [1, 2])
+
+    def test_normalize_tier_model(self):
+        assert normalize_tier_model('Granular Tier') == 'graduated'
+        assert normalize_tier_model('BLOCK_TIER') == 'step'
+        assert normalize_tier_model(None) == 'volume'
+
+    def test_naive_cost_requires_amount(self):
+        with pytest.raises(KeyError):
+            naive_cost(Metrics(metric_id='empty', amounts=[]), 1)
+
+
+class FakeClock():
+
+    def __init__(self, now=1577836800.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestPricingCache():
+
+    base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+
+    def make_cache(self, **kwargs):
+        client = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+        client.set_service_url(self.base_url)
+        return PricingCache(client, **kwargs)
+
+    def add_pricing(self, plan_id, metrics=None, status=200):
+        responses.add(responses.GET, '{0}/{1}/pricing'.format(self.base_url, plan_id),
+                      body=json.dumps({'type': 'paygo', 'metrics': metrics or []}),
+                      content_type='application/json', status=status)
+
+    @responses.activate
+    def test_fetches_many_and_caches(self):
+        for plan_id in ('plan-a', 'plan-b', 'plan-c'):
+            self.add_pricing(plan_id)
+        clock = FakeClock()
+        cache = self.make_cache(ttl=60, clock=clock)
+
+        result = cache.get_pricing_many(['plan-a', 'plan-b', 'plan-c', 'plan-a'])
+        assert sorted(result) == ['plan-a', 'plan-b', 'plan-c']
+        assert isinstance(result['plan-a'], PricingGet)
+        assert len(responses.calls) == 3
+
+        cache.get_pricing_many(['plan-a', 'plan-b'])
+        cache.get_pricing('plan-c')
+        assert len(responses.calls) == 3
+
+        cache.get_pricing('plan-a', account='other')
+        assert len(responses.calls) == 4
+
+        clock.now += 61
+        cache.get_pricing('plan-a')
+        assert len(responses.calls) == 5
+
+    @responses.activate
+    def test_effective_dates_shorten_ttl(self):
+        clock = FakeClock()
+        self.add_pricing('plan-a', [{'metric_id': 'gb', 'effective_until': '2020-01-01T00:10:00Z'},
+                                    {'metric_id': 'gb2', 'effective_from': '2019-01-01T00:00:00Z'}])
+        cache = self.make_cache(ttl=3600, clock=clock)
+
+        cache.get_pricing('plan-a')
+        clock.now += 599
+        cache.get_pricing('plan-a')
+        assert len(responses.calls) == 1
+        clock.now += 1
+        cache.get_pricing('plan-a')
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_errors_are_not_cached(self):
+        self.add_pricing('plan-a', status=500)
+        self.add_pricing('plan-b')
+        cache = self.make_cache()
+
+        with pytest.raises(ApiException):
+            cache.get_pricing_many(['plan-a', 'plan-b'])
+        self.add_pricing('plan-a')
+        assert sorted(cache.get_pricing_many(['plan-a', 'plan-b'])) == ['plan-a', 'plan-b']
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_service_pricing_discovers_plans(self):
+        responses.add(responses.GET, self.base_url + '/svc/plan',
+                      body=json.dumps({'resources': [{'id': 'plan-a'}, {'id': 'plan-b'}]}),
+                      content_type='application/json', status=200)
+        self.add_pricing('plan-a')
+        self.add_pricing('plan-b')
+        cache = self.make_cache()
+
+        assert sorted(cache.get_service_pricing('svc')) == ['plan-a', 'plan-b']
+        assert '_offset=0' in responses.calls[0].request.url
+        cache.invalidate('plan-a')
+        cache.get_pricing('plan-b')
+        cache.get_pricing('plan-a')
+        assert len(responses.calls) == 4
+
+    def test_service_pricing_reads_every_page(self):
+        with FakePlatformServer(catalog_entries=1, plans_per_entry=5) as server:
+            client = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+            server.attach(client)
+            cache = PricingCache(client, page_size=2)
+
+            pricing = cache.get_service_pricing('service-0')
+
+            assert len(pricing) == 5
+            assert server.requests[('GET', 'global_catalog')] == 3 + 5
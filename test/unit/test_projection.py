@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the projection module
+"""
+
+import pytest
+from ibm_platform_services.global_catalog_v1 import CatalogEntry, Price, Strings
+from ibm_platform_services.global_search_v2 import ResultItem
+from ibm_platform_services.projection import (ProjectionPlanner, fields_param, include_param,
+                                              json_key, project)
+
+
+# Models compiled without a source file, as in a zipapp or a .pyc-only install.
+_MODELS = '''
+class Quote():
+    def __init__(self, *, price=None, tiers=None):
+        self.price = price
+        self.tiers = tiers
+    @classmethod
+    def from_dict(cls, _dict):
+        return cls(price=_dict.get('Price'), tiers=_dict.get('tiers'))
+    def to_dict(self):
+        _dict = {}
+        if self.price is not None:
+            _dict['Price'] = self.price
+        if self.tiers is not None:
+            _dict['tiers'] = [x.to_dict() for x in self.tiers]
+        return _dict
+
+class Lossy(Quote):
+    def to_dict(self):
+        return {'Price': self.price}
+'''
+_namespace = {}
+exec(compile(_MODELS, '<generated>', 'exec'), _namespace) # pylint: disable=exec-used
+Quote, Lossy = _namespace['Quote'], _namespace['Lossy']
+
+
+class TestProject():
+
+    def test_paths_are_checked_against_the_models(self):
+        entry = project(CatalogEntry)
+        assert str(entry.metadata.pricing) == 'metadata.pricing'
+        assert str(entry.metadata.ui.strings) == 'metadata.ui.strings'
+        assert entry.metadata.ui == project(CatalogEntry).metadata.ui
+        with pytest.raises(AttributeError):
+            entry.metadata.pricng # pylint: disable=pointless-statement
+        with pytest.raises(AttributeError):
+            entry.name.first # pylint: disable=pointless-statement
+        with pytest.raises(ValueError):
+            project(dict)
+
+    def test_paths_use_json_property_names(self):
+        entry = project(CatalogEntry)
+        assert include_param(entry.metadata.pricing.metrics.amounts.prices.price) == \
+            'metadata.pricing.metrics.amounts.prices.Price'
+        strings = project(Strings)
+        assert fields_param(strings.media.url, strings.not_creatable_robot_msg) == [
+            'media.URL', 'not_creatable__robot_msg']
+
+    def test_json_property_names_do_not_need_source(self):
+        assert json_key(Quote, 'price') == 'Price'
+        assert str(project(Quote).price) == 'Price'
+        with pytest.raises(ValueError):
+            project(Lossy).price # pylint: disable=pointless-statement
+
+    def test_open_models_accept_any_property(self):
+        item = project(ResultItem)
+        assert str(item.doc.service_name) == 'doc.service_name'
+        assert fields_param(item.tags, item.crn, 'name') == ['crn', 'name', 'tags']
+
+    def test_include_param(self):
+        entry = project(CatalogEntry)
+        assert include_param(entry.metadata.ui, entry.metadata.pricing) == 'metadata.pricing:metadata.ui'
+        assert include_param(entry.metadata.ui.strings, entry.metadata) == 'metadata'
+        assert include_param(entry.metadata.ui.strings, max_depth=2) == 'metadata.ui'
+        assert include_param() is None
+
+
+class TestProjectionPlanner():
+
+    entry = {
+        'id': 'e1', 'name': 'cloudant', 'kind': 'service', 'tags': ['db'],
+        'metadata': {
+            'pricing': {'type': 'paid', 'origin': 'pricing_catalog'},
+            'ui': {'strings': {'en': {'bullets': [{'title': 'Fast'}]}}, 'hidden': False},
+            'service': {'iam_compatible': True},
+        },
+    }
+
+    def test_records_dict_reads(self):
+        planner = ProjectionPlanner()
+        view = planner.wrap(self.entry)
+        assert view['metadata']['pricing']['type'] == 'paid'
+        assert [b['title'] for b in view['metadata']['ui']['strings']['en']['bullets']] == ['Fast']
+        assert view.get('overview_ui') is None
+        assert planner.include() == 'metadata.pricing:metadata.ui:overview_ui'
+        assert planner.fields(max_depth=1) == ['metadata', 'overview_ui']
+
+    def test_records_json_property_names(self):
+        planner = ProjectionPlanner()
+        view = planner.wrap(Price.from_dict({'quantity_tier': 1, 'Price': 0.5}))
+        assert view.price == 0.5
+        assert planner.fields() == ['Price']
+
+    def test_records_model_reads(self):
+        planner = ProjectionPlanner()
+        view = planner.wrap(ResultItem.from_dict({'crn': 'crn:v1:a', 'name': 'db', 'tags': ['env:prod'],
+                                                  'doc': {'state': 'active', 'region': 'us-south'}}))
+        assert view.name == 'db'
+        if view.doc['state']:
+            pass
+        assert 'env:prod' in view.tags
+        assert planner.fields() == ['doc.state', 'name', 'tags']
+        planner.reset()
+        view.to_dict()
+        assert planner.fields() == ['*'] and planner.include() == '*'
+        planner.reset()
+        view.doc.items()
+        assert planner.fields() == ['doc']
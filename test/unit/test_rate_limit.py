@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the rate_limit module
+"""
+
+import datetime
+import pytest
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.global_tagging_v1 import GlobalTaggingV1
+from ibm_platform_services.rate_limit import RateLimiter, TokenBucket, parse_retry_after
+
+
+base_url = 'https://tags.global-search-tagging.cloud.ibm.com/'
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket():
+
+    def test_acquire_waits_for_tokens(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, burst=2, clock=clock, sleep=clock.sleep)
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() == pytest.approx(0.5)
+        assert clock.now == pytest.approx(100.5)
+
+    def test_block_for(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, clock=clock, sleep=clock.sleep)
+        bucket.block_for(3)
+        bucket.acquire()
+        assert clock.now >= 103.0
+
+    def test_throttled_and_recovery(self):
+        bucket = TokenBucket(10, clock=FakeClock())
+        bucket.throttled()
+        assert bucket.current_rate == 5.0
+        for _ in range(200):
+            bucket.succeeded()
+        assert bucket.current_rate == 10.0
+        bucket.limit_to(0.5)
+        assert bucket.current_rate == 0.5
+        bucket.limit_to(50)
+        assert bucket.current_rate == 10.0
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+
+class TestParseRetryAfter():
+
+    def test_seconds_and_dates(self):
+        now = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        assert parse_retry_after('7') == 7.0
+        assert parse_retry_after('Wed, 01 Jan 2020 00:00:30 GMT', now=now) == 30.0
+        assert parse_retry_after('garbage') is None
+        assert parse_retry_after(None) is None
+
+
+class TestRateLimiter():
+
+    def test_limit_precedence(self):
+        limiter = RateLimiter(default_rate=100)
+        limiter.set_limit('global_tagging', 10)
+        limiter.set_limit('global_tagging', 1, operation_id='attach_tag')
+
+        assert limiter.bucket_for('global_tagging', 'attach_tag').rate == 1
+        assert limiter.bucket_for('global_tagging', 'list_tags').rate == 10
+        assert limiter.bucket_for('global_search', 'search').rate == 100
+        assert limiter.bucket_for('global_search', 'search') is not limiter.bucket_for('global_catalog', 'get_pricing')
+        assert RateLimiter().bucket_for('global_search', 'search') is None
+
+    @responses.activate
+    def test_throttles_operation(self):
+        responses.add(responses.GET, base_url + '/v3/tags',
+                      body='{"items": []}', content_type='application/json', status=200)
+        clock = FakeClock()
+        service = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+        service.set_service_url(base_url)
+        limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+        limiter.set_limit(GlobalTaggingV1.DEFAULT_SERVICE_NAME, 1, operation_id='list_tags')
+        limiter.attach(service)
+
+        for _ in range(3):
+            service.list_tags()
+
+        assert len(responses.calls) == 3
+        assert clock.now == pytest.approx(102.0)
+
+    @responses.activate
+    def test_adapts_to_retry_after(self):
+        responses.add(responses.GET, base_url + '/v3/tags',
+                      body='{"message": "slow down"}', content_type='application/json',
+                      status=429, headers={'Retry-After': '5'})
+        responses.add(responses.GET, base_url + '/v3/tags',
+                      body='{"items": []}', content_type='application/json', status=200)
+        clock = FakeClock()
+        service = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+        service.set_service_url(base_url)
+        limiter = RateLimiter(default_rate=10, clock=clock, sleep=clock.sleep)
+        limiter.attach(service)
+
+        with pytest.raises(ApiException):
+            service.list_tags()
+        bucket = limiter.bucket_for('global_tagging', 'list_tags')
+        assert bucket.current_rate == 5.0
+
+        service.list_tags()
+        assert clock.now >= 105.0
+
+    @responses.activate
+    def test_adapts_to_remaining_quota(self):
+        responses.add(responses.GET, base_url + '/v3/tags',
+                      body='{"items": []}', content_type='application/json', status=200,
+                      headers={'X-RateLimit-Remaining': '4', 'X-RateLimit-Reset': '2'})
+        service = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+        service.set_service_url(base_url)
+        clock = FakeClock()
+        limiter = RateLimiter(default_rate=50, clock=clock, sleep=clock.sleep)
+        limiter.attach(service)
+
+        service.list_tags()
+
+        assert limiter.bucket_for('global_tagging', 'list_tags').current_rate == 2.0
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the retry module
+"""
+
+import io
+import pytest
+import requests
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+from ibm_platform_services.retry import RetryBudget, RetryPolicy, is_idempotent
+
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+
+
+def new_service(policy):
+    service = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+    service.set_service_url(base_url)
+    policy.attach(service)
+    return service
+
+
+def new_policy(**kwargs):
+    sleeps = []
+    policy = RetryPolicy(sleep=sleeps.append, rand=lambda low, high: high, **kwargs)
+    return policy, sleeps
+
+
+class TestIsIdempotent():
+
+    def test_classification(self):
+        assert is_idempotent('GET', 'get_catalog_entry')
+        assert is_idempotent('DELETE', 'delete_artifact')
+        assert is_idempotent('PUT', 'update_visibility')
+        assert is_idempotent('PUT', 'upload_artifact')
+        assert is_idempotent('POST', 'search')
+        assert not is_idempotent('POST', 'create_catalog_entry')
+        assert not is_idempotent('POST', 'add_access_group_rule')
+        assert not is_idempotent('PATCH', 'update_access_group')
+
+
+class TestRetryBudget():
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, min_retries=1)
+        assert budget.withdraw()
+        assert not budget.withdraw()
+        budget.deposit()
+        budget.deposit()
+        assert budget.remaining == 1
+        assert budget.withdraw()
+
+
+class TestRetryPolicy():
+
+    @responses.activate
+    def test_retries_idempotent_read(self):
+        url = base_url + '/id/pricing'
+        responses.add(responses.GET, url, status=502)
+        responses.add(responses.GET, url, status=503)
+        responses.add(responses.GET, url, body='{"currency": "USD"}',
+                      content_type='application/json', status=200)
+        policy, sleeps = new_policy(base_delay=1, max_delay=3)
+        service = new_service(policy)
+
+        response = service.get_pricing('id')
+
+        assert response.get_result() == {'currency': 'USD'}
+        assert len(responses.calls) == 3
+        assert sleeps == [1, 2]
+        stats = policy.stats.to_dict()
+        assert stats['retries'] == 2
+        assert stats['recovered'] == 1
+        assert stats['retries_by_operation'] == {'get_pricing': 2}
+
+    @responses.activate
+    def test_gives_up_after_max_attempts(self):
+        responses.add(responses.GET, base_url + '/id/pricing', status=500)
+        policy, sleeps = new_policy(max_attempts=3, base_delay=1, max_delay=1.5)
+        service = new_service(policy)
+
+        with pytest.raises(ApiException):
+            service.get_pricing('id')
+
+        assert len(responses.calls) == 3
+        assert sleeps == [1, 1.5]
+        assert policy.stats.exhausted == 1
+
+    @responses.activate
+    def test_does_not_retry_non_idempotent(self):
+        responses.add(responses.POST, base_url + '/', status=502)
+        policy, _ = new_policy()
+        service = new_service(policy)
+
+        with pytest.raises(ApiException):
+            service.create_catalog_entry('name', 'service', {}, {}, False, [], {}, 'id')
+
+        assert len(responses.calls) == 1
+        assert policy.stats.not_retryable == 1
+
+    @responses.activate
+    def test_retries_non_idempotent_on_429(self):
+        responses.add(responses.POST, base_url + '/', status=429, headers={'Retry-After': '2'})
+        responses.add(responses.POST, base_url + '/', body='{}',
+                      content_type='application/json', status=201)
+        policy, sleeps = new_policy(base_delay=0.1)
+        service = new_service(policy)
+
+        service.create_catalog_entry('name', 'service', {}, {}, False, [], {}, 'id')
+
+        assert len(responses.calls) == 2
+        assert sleeps == [2.0]
+
+    @responses.activate
+    def test_does_not_retry_client_errors(self):
+        responses.add(responses.GET, base_url + '/id', status=404)
+        policy, _ = new_policy()
+        service = new_service(policy)
+
+        with pytest.raises(ApiException):
+            service.get_catalog_entry('id')
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_retries_connection_errors(self):
+        url = base_url + '/id'
+        responses.add(responses.GET, url, body=requests.exceptions.ConnectionError('reset'))
+        responses.add(responses.GET, url, body='{"id": "id"}',
+                      content_type='application/json', status=200)
+        policy, _ = new_policy()
+        service = new_service(policy)
+
+        assert service.get_catalog_entry('id').get_result() == {'id': 'id'}
+
+    @responses.activate
+    def test_budget_limits_retries(self):
+        responses.add(responses.GET, base_url + '/id', status=503)
+        policy, _ = new_policy(budget=RetryBudget(ratio=0, min_retries=1))
+        service = new_service(policy)
+
+        with pytest.raises(ApiException):
+            service.get_catalog_entry('id')
+
+        assert len(responses.calls) == 2
+        assert policy.stats.budget_exhausted == 1
+
+    @responses.activate
+    def test_rewinds_uploaded_artifact(self):
+        url = base_url + '/id/artifacts/artifact.txt'
+        responses.add(responses.PUT, url, status=503)
+        responses.add(responses.PUT, url, status=200)
+        policy, _ = new_policy()
+        service = new_service(policy)
+
+        service.upload_artifact('id', 'artifact.txt', artifact=io.BytesIO(b'payload'))
+
+        assert len(responses.calls) == 2
+        assert responses.calls[1].request.body == b'payload'
+
+    @responses.activate
+    def test_does_not_resend_unrewindable_body(self):
+        url = base_url + '/id/artifacts/artifact.txt'
+        responses.add(responses.PUT, url, status=429)
+        policy, _ = new_policy()
+        service = new_service(policy)
+
+        class Pipe(io.RawIOBase):
+            def readable(self):
+                return True
+            def readinto(self, buffer):
+                return 0
+        for artifact in (Pipe(), iter([b'pay', b'load'])):
+            with pytest.raises(ApiException) as err:
+                service.upload_artifact('id', 'artifact.txt', artifact=artifact)
+            assert err.value.code == 429
+
+        assert len(responses.calls) == 2
+        assert policy.stats.not_retryable == 2
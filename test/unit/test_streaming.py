@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the streaming module
+"""
+
+import json
+import time
+import pytest
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from fake_server import FakePlatformServer
+from ibm_platform_services.global_search_v2 import GlobalSearchV2, ResultItem
+from ibm_platform_services.global_tagging_v1 import GlobalTaggingV1, Tag
+from ibm_platform_services.hedging import HedgingPolicy
+from ibm_platform_services.iam_access_groups_v2 import IamAccessGroupsV2
+from ibm_platform_services.locales import LocalePruner
+from ibm_platform_services.retry import RetryPolicy
+from ibm_platform_services.streaming import iter_json_list, stream_items
+from ibm_platform_services.transport import wrap_send
+
+
+def pieces(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonList():
+
+    document = {
+        'count': 3,
+        'items': [{'name': 'café ☃', 'n': 12345}, 67890, [1.5e3, None, True], 'x'],
+        'next': {'href': 'https://example.com?start=3'},
+    }
+
+    @pytest.mark.parametrize('size', [1, 2, 3, 7, 1000])
+    def test_any_chunk_size(self, size):
+        envelope = {}
+        text = json.dumps(self.document, indent=1)
+        items = list(iter_json_list(pieces(text, size), 'items', envelope=envelope))
+        assert items == self.document['items']
+        assert envelope == {'count': 3, 'next': self.document['next']}
+
+    def test_missing_or_empty_list(self):
+        assert list(iter_json_list([b'{}'], 'items')) == []
+        assert list(iter_json_list([b'{"items": []}'], 'items')) == []
+        envelope = {}
+        assert list(iter_json_list([b'{"count": 0}'], 'items', envelope=envelope)) == []
+        assert envelope == {'count': 0}
+
+    def test_object_hook(self):
+        items = iter_json_list([b'{"items": [{"a": 1}, {"b": 2}]}'], 'items',
+                               object_hook=lambda obj: sorted(obj))
+        assert list(items) == [['a'], ['b']]
+
+    @pytest.mark.parametrize('text', ['[]', '{"items": [1, 2', '{"items": [1 2]}', '{"items": [1],'])
+    def test_malformed(self, text):
+        with pytest.raises(ValueError):
+            list(iter_json_list(pieces(text, 2), 'items'))
+
+
+class TestStreamItems():
+
+    @responses.activate
+    def test_streams_models_through_send_layers(self):
+        body = {'total_count': 3, 'offset': 0, 'limit': 3,
+                'items': [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]}
+        responses.add(responses.GET, 'https://tags.example.com/v3/tags', status=503)
+        responses.add(responses.GET, 'https://tags.example.com/v3/tags', json=body, status=200)
+        tagging = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+        tagging.set_service_url('https://tags.example.com')
+        RetryPolicy(sleep=lambda delay: None).attach(tagging)
+        with stream_items(tagging.list_tags, limit=3) as tags:
+            assert tags.response.get_status_code() == 200
+            streamed = list(tags)
+        assert tags.envelope == {'total_count': 3, 'offset': 0, 'limit': 3}
+        assert all(isinstance(tag, Tag) for tag in streamed)
+        assert [tag.name for tag in streamed] == ['a', 'b', 'c']
+        # Calls made without stream_items are decoded as before.
+        responses.replace(responses.GET, 'https://tags.example.com/v3/tags', json=body, status=200)
+        assert tagging.list_tags().get_result() == body
+
+    @responses.activate
+    def test_streamed_requests_are_not_hedged(self):
+        body = {'items': [{'crn': 'crn:v1:a'}, {'crn': 'crn:v1:b'}]}
+        responses.add(responses.POST, 'https://search.example.com/v3/resources/search',
+                      json=body, status=200)
+        search = GlobalSearchV2(authenticator=NoAuthAuthenticator())
+        search.set_service_url('https://search.example.com')
+
+        def slow(send, request, **kwargs):
+            time.sleep(0.05)
+            return send(request, **kwargs)
+
+        wrap_send(search, slow)
+        policy = HedgingPolicy(delay=0, max_extra_load=1)
+        policy.attach(search)
+        with stream_items(search.search, query='*') as items:
+            assert [item.crn for item in items] == ['crn:v1:a', 'crn:v1:b']
+        policy.close()
+        # One request, answered on the calling thread, with nothing left open.
+        assert len(responses.calls) == 1
+        assert policy.stats.to_dict()['hedged'] == 0
+
+    def test_against_the_fake_server(self):
+        with FakePlatformServer(resources=300, access_groups=1, members_per_group=120) as server:
+            search = GlobalSearchV2(authenticator=NoAuthAuthenticator())
+            iam = IamAccessGroupsV2(authenticator=NoAuthAuthenticator())
+            server.attach(search, iam)
+            items = stream_items(search.search, query='*', limit=300, chunk_size=512)
+            first = next(items)
+            assert isinstance(first, ResultItem)
+            assert len(list(items)) == 299
+            group_id = next(iter(server.data.groups))
+            members = stream_items(iam.list_access_group_members, group_id, limit=100, model=None)
+            assert len(list(members)) == 100
+            assert members.envelope['total_count'] == 120
+
+    @responses.activate
+    def test_object_hook_prunes_locales(self):
+        entry = {'id': 'e', 'overview_ui': {'en': {'display_name': 'E'}, 'fr': {'display_name': 'F'}}}
+        responses.add(responses.POST, 'https://search.example.com/v3/resources/search',
+                      json={'items': [entry]}, status=200)
+        search = GlobalSearchV2(authenticator=NoAuthAuthenticator())
+        search.set_service_url('https://search.example.com')
+        pruner = LocalePruner(['en'])
+        items = list(stream_items(search.search, query='*', model=None,
+                                  object_hook=pruner.object_hook))
+        assert items[0]['overview_ui'] == {'en': {'display_name': 'E'}}
+
+    def test_requires_a_known_operation_or_key(self):
+        tagging = GlobalTaggingV1(authenticator=NoAuthAuthenticator())
+        with pytest.raises(ValueError):
+            stream_items(tagging.attach_tag, [])
+        with pytest.raises(ValueError):
+            stream_items(len, [])
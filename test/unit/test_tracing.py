@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the tracing module
+"""
+
+import inspect
+import re
+import threading
+import pytest
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from fake_server import FakePlatformServer
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+from ibm_platform_services.global_search_v2 import GlobalSearchV2
+from ibm_platform_services.global_tagging_v1 import GlobalTaggingV1
+from ibm_platform_services.iam_access_groups_v2 import IamAccessGroupsV2
+from ibm_platform_services.resource_manager_v2 import ResourceManagerV2
+from ibm_platform_services.retry import RetryPolicy
+from ibm_platform_services.tracing import (URL_TEMPLATES, Tracer, current_span, url_template,
+                                           use_span)
+from ibm_platform_services.transport import ConnectionPool, wrap_send
+
+
+def new_tracer():
+    ended = []
+    ids = iter('tx{0}'.format(i) for i in range(100))
+    tracer = Tracer(on_end=[ended.append], id_factory=lambda: next(ids))
+    return tracer, ended
+
+
+class TestUrlTemplate():
+
+    def test_templates_name_path_variables(self):
+        assert url_template(IamAccessGroupsV2, 'remove_member_from_access_group') == \
+            '/groups/{access_group_id}/members/{iam_id}'
+        assert url_template(GlobalCatalogV1, 'get_artifact') == '/{object_id}/artifacts/{artifact_id}'
+        assert url_template(GlobalSearchV2, 'search') == '/v3/resources/search'
+        assert url_template(GlobalSearchV2, 'unknown') is None
+
+    def test_templates_match_the_service_methods(self):
+        # Read from the generated source, where the table came from.
+        pattern = re.compile(r"operation_id='(\w+)'.*?url = '([^']*)'"
+                             r"(?:\.format\(\s*\*self\.encode_path_vars\(([^)]*)\)\))?", re.DOTALL)
+        found = {}
+        for service_class in (GlobalCatalogV1, GlobalSearchV2, GlobalTaggingV1,
+                              IamAccessGroupsV2, ResourceManagerV2):
+            for operation_id, template, names in pattern.findall(inspect.getsource(service_class)):
+                for index, name in enumerate(n.strip() for n in names.split(',') if n.strip()):
+                    template = template.replace('{%d}' % index, '{%s}' % name)
+                found[(service_class.DEFAULT_SERVICE_NAME, operation_id)] = template
+        assert found == URL_TEMPLATES
+
+
+class TestTracer():
+
+    @responses.activate
+    def test_call_spans_share_the_workflow_transaction_id(self):
+        responses.add(responses.GET, 'https://iam.cloud.ibm.com/v2/groups/g1',
+                      json={'id': 'g1'}, status=200)
+        responses.add(responses.POST, 'https://search.example.com/v3/resources/search',
+                      json={'items': []}, status=200)
+        tracer, ended = new_tracer()
+        iam = IamAccessGroupsV2(authenticator=NoAuthAuthenticator())
+        search = GlobalSearchV2(authenticator=NoAuthAuthenticator())
+        search.set_service_url('https://search.example.com')
+        tracer.attach(iam, search)
+        with tracer.span('crawl', step=1) as workflow:
+            assert current_span() is workflow
+            iam.get_access_group('g1')
+            search.search(query='*')
+        assert current_span() is None
+        assert [span.name for span in ended] == ['get_access_group', 'search', 'crawl']
+        call = ended[0]
+        assert call.parent is workflow
+        assert call.transaction_id == workflow.transaction_id == 'tx0'
+        assert call.attributes['service'] == 'iam_access_groups'
+        assert call.attributes['http.url_template'] == '/groups/{access_group_id}'
+        assert call.attributes['http.status_code'] == 200
+        assert set(call.phases) == {'wait', 'server', 'download', 'decode'}
+        assert workflow.attributes == {'step': 1}
+        assert [c.request.headers['Transaction-Id'] for c in responses.calls] == ['tx0', 'tx0']
+
+    @responses.activate
+    def test_explicit_transaction_id_is_kept(self):
+        responses.add(responses.GET, 'https://iam.cloud.ibm.com/v2/groups/g1', status=404,
+                      json={'message': 'not found'})
+        tracer, ended = new_tracer()
+        iam = IamAccessGroupsV2(authenticator=NoAuthAuthenticator())
+        tracer.attach(iam)
+        with pytest.raises(ApiException):
+            iam.get_access_group('g1', transaction_id='mine')
+        assert ended[0].transaction_id == 'mine'
+        assert ended[0].attributes['http.status_code'] == 404
+        assert isinstance(ended[0].error, ApiException)
+        assert responses.calls[0].request.headers['Transaction-Id'] == 'mine'
+
+    @responses.activate
+    def test_use_span_in_worker_threads(self):
+        responses.add(responses.GET, 'https://globalcatalog.cloud.ibm.com/api/v1/entry',
+                      json={}, status=200)
+        tracer, ended = new_tracer()
+        catalog = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+        tracer.attach(catalog)
+        with tracer.span('pricing') as workflow:
+            def work():
+                with use_span(workflow):
+                    catalog.get_catalog_entry('entry')
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        assert ended[0].parent is workflow
+        assert ended[0].transaction_id == workflow.transaction_id
+
+    @responses.activate
+    def test_backoff_is_timed_apart_from_the_attempt(self):
+        url = 'https://globalcatalog.cloud.ibm.com/api/v1/entry'
+        responses.add(responses.GET, url, status=503)
+        responses.add(responses.GET, url, json={}, status=200)
+        now = [0.0]
+        ended = []
+        def sleep(delay):
+            now[0] += delay
+        catalog = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+        RetryPolicy(base_delay=2, sleep=sleep, rand=lambda low, high: high).attach(catalog)
+        Tracer(on_end=[ended.append], clock=lambda: now[0]).attach(catalog)
+        seen = []
+        def outer(send, request, **kwargs):
+            seen.append(request['headers'])
+            return send(request, **kwargs)
+        wrap_send(catalog, outer)
+
+        catalog.get_catalog_entry('entry')
+
+        span = ended[0]
+        assert span.phases['wait'] == 2
+        assert span.phases['download'] == 0
+        # The tracer sends a copy of the headers.
+        assert 'Transaction-Id' not in seen[0]
+        assert responses.calls[1].request.headers['Transaction-Id'] == span.transaction_id
+
+    def test_connection_phases_through_a_pool(self):
+        tracer, ended = new_tracer()
+        with FakePlatformServer(catalog_entries=3) as server, ConnectionPool() as pool:
+            catalog = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+            server.attach(catalog)
+            pool.attach(catalog)
+            tracer.attach(catalog)
+            catalog.list_catalog_entries()
+            catalog.list_catalog_entries()
+        first, second = ended
+        assert 'connect' in first.phases
+        # The second call reuses the pooled connection.
+        assert 'connect' not in second.phases
+        assert second.phases['server'] <= second.duration
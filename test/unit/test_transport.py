@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the transport module
+"""
+
+import pytest
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.fanout import FanOut
+from ibm_platform_services.global_search_v2 import GlobalSearchV2
+from ibm_platform_services.iam_access_groups_v2 import IamAccessGroupsV2
+from ibm_platform_services.resource_manager_v2 import ResourceManagerV2
+from ibm_platform_services.common import get_sdk_operation
+from ibm_platform_services.transport import ConnectionPool, install, wrap_send
+
+
+rm_url = 'https://resource-controller.cloud.ibm.com/v2'
+search_url = 'https://api.global-search-tagging.cloud.ibm.com/'
+iam_url = 'https://iam.cloud.ibm.com'
+
+
+def new_clients():
+    resource_manager = ResourceManagerV2(authenticator=NoAuthAuthenticator())
+    resource_manager.set_service_url(rm_url)
+    search = GlobalSearchV2(authenticator=NoAuthAuthenticator())
+    search.set_service_url(search_url)
+    access_groups = IamAccessGroupsV2(authenticator=NoAuthAuthenticator())
+    access_groups.set_service_url(iam_url)
+    return resource_manager, search, access_groups
+
+
+class TestConnectionPool():
+
+    def test_adapter_configuration(self):
+        pool = ConnectionPool(pool_connections=4, pool_maxsize=16, keep_alive=False)
+        adapter = pool.session.get_adapter('https://example.com')
+        assert adapter._pool_connections == 4
+        assert adapter._pool_maxsize == 16
+        assert pool.session.headers['Connection'] == 'close'
+        pool.close()
+
+    def test_invalid_sizes(self):
+        with pytest.raises(ValueError):
+            ConnectionPool(pool_maxsize=0)
+        with pytest.raises(ValueError):
+            ConnectionPool(pool_connections=0)
+        with pytest.raises(ValueError):
+            ConnectionPool(max_connections=0)
+
+    @responses.activate
+    def test_attach_routes_clients_through_one_session(self):
+        responses.add(responses.GET, rm_url + '/resource_groups',
+                      body='{"resources": []}', content_type='application/json', status=200)
+        responses.add(responses.GET, search_url + '/v2/resources/supported_types',
+                      body='{"supported_types": ["a"]}', content_type='application/json', status=200)
+        responses.add(responses.HEAD, iam_url + '/groups/g1/members/m1', status=204)
+        resource_manager, search, access_groups = new_clients()
+
+        with ConnectionPool(max_connections=2) as pool:
+            pool.attach(resource_manager, search, access_groups)
+            calls = []
+            original = pool.session.request
+            pool.session.request = lambda *a, **kw: calls.append(kw['url']) or original(*a, **kw)
+
+            assert resource_manager.list_resource_groups().get_result() == {'resources': []}
+            assert search.get_supported_types().get_result() == {'supported_types': ['a']}
+            assert access_groups.is_member_of_access_group('g1', 'm1').get_result() is None
+
+        assert resource_manager.http_pool is pool
+        assert len(calls) == 3
+
+    @responses.activate
+    def test_errors_raise_api_exception(self):
+        responses.add(responses.GET, rm_url + '/resource_groups/bad',
+                      body='{"message": "not found"}', content_type='application/json', status=404)
+        resource_manager, _, _ = new_clients()
+        ConnectionPool().attach(resource_manager)
+
+        with pytest.raises(ApiException) as err:
+            resource_manager.get_resource_group('bad')
+        assert err.value.code == 404
+
+    @responses.activate
+    def test_install_without_pool(self):
+        responses.add(responses.GET, rm_url + '/resource_groups',
+                      body='{"resources": []}', content_type='application/json', status=200)
+        resource_manager, _, _ = new_clients()
+        install(resource_manager)
+        send = resource_manager.send
+        install(resource_manager)
+
+        assert resource_manager.send is send
+        assert resource_manager.list_resource_groups().get_result() == {'resources': []}
+
+    @responses.activate
+    def test_operation_is_not_sent(self):
+        responses.add(responses.GET, rm_url + '/resource_groups',
+                      body='{"resources": []}', content_type='application/json', status=200)
+        layered, _, _ = new_clients()
+        plain, _, _ = new_clients()
+        seen = []
+        wrap_send(layered, lambda send, request, **kwargs:
+                  seen.append(get_sdk_operation(request['headers'])) or send(request, **kwargs))
+
+        layered.list_resource_groups()
+        # A request prepared by hand does not take the last operation.
+        layered.send(layered.prepare_request(method='GET', url='/resource_groups'))
+        plain.list_resource_groups()
+
+        assert seen == [('resource_manager', 'V2', 'list_resource_groups'), (None, None, None)]
+        assert len(responses.calls) == 3
+        for call in responses.calls:
+            assert 'X-IBMCloud-SDK-Analytics' not in call.request.headers
+
+    @responses.activate
+    def test_fan_out_over_pool(self):
+        responses.add(responses.GET, rm_url + '/resource_groups',
+                      body='{"resources": []}', content_type='application/json', status=200)
+        resource_manager, _, _ = new_clients()
+        pool = ConnectionPool()
+
+        results = FanOut(pool=pool).run_all(resource_manager.list_resource_groups, ['a', 'b'])
+
+        assert all(r.ok for r in results.values())
+        assert resource_manager.http_pool is pool
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test methods in the visibility_audit module
+"""
+
+from urllib.parse import parse_qsl, urlsplit
+import json
+import re
+import pytest
+import responses
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+from ibm_platform_services.global_catalog_v1 import GlobalCatalogV1
+from ibm_platform_services.visibility_audit import VisibilityAuditor, VisibilityPolicy
+
+base_url = 'https://globalcatalog.cloud.ibm.com/api/v1'
+visibility_url = re.compile(re.escape(base_url) + r'/([\w-]+)/visibility')
+
+visibilities = {
+    'ok': {'extendable': True, 'include': {'accounts': {'acct-a': 'global'}},
+           'exclude': {'accounts': {'acct-x': 'global'}}},
+    'missing': {'include': {'accounts': {}}},
+    'misplaced': {'include': {'accounts': {'acct-x': 'global', 'other': 'global'}},
+                  'exclude': {'accounts': {'acct-a': 'global'}}},
+}
+
+
+def make_auditor(**kwargs):
+    client = GlobalCatalogV1(authenticator=NoAuthAuthenticator())
+    client.set_service_url(base_url)
+    policy = VisibilityPolicy(include_accounts=['acct-a'], exclude_accounts=['acct-x'])
+    return VisibilityAuditor(client, policy, **kwargs)
+
+
+def visibility_callback(request):
+    entry_id = visibility_url.match(request.url).group(1)
+    if entry_id not in visibilities:
+        return (404, {}, json.dumps({'message': 'not found'}))
+    return (200, {}, json.dumps(visibilities[entry_id]))
+
+
+class TestVisibilityAuditor():
+
+    def test_policy_rejects_overlap(self):
+        with pytest.raises(ValueError):
+            VisibilityPolicy(include_accounts=['a'], exclude_accounts=['a'])
+
+    @responses.activate
+    def test_audit_and_apply_only_needed_updates(self):
+        responses.add_callback(responses.GET, visibility_url, callback=visibility_callback,
+                               content_type='application/json')
+        responses.add(responses.PUT, visibility_url, status=200)
+        auditor = make_auditor(max_workers=3)
+
+        result = auditor.run(['ok', 'missing', 'misplaced', 'gone'])
+
+        findings = {f.id: f for f in result['findings']}
+        assert findings['ok'].compliant
+        assert findings['missing'].missing == ['acct-a', 'acct-x']
+        assert findings['misplaced'].misplaced == ['acct-a', 'acct-x']
+        assert findings['gone'].error is not None
+        assert sorted(u.finding.id for u in result['updates']) == ['misplaced', 'missing']
+        assert all(u.ok for u in result['updates'])
+
+        puts = {c.request.url.split('/')[-2]: json.loads(c.request.body)
+                for c in responses.calls if c.request.method == 'PUT'}
+        assert puts['misplaced']['include'] == {'accounts': {'acct-a': '', 'other': 'global'}}
+        assert puts['misplaced']['exclude'] == {'accounts': {'acct-x': ''}}
+        assert puts['missing']['include'] == {'accounts': {'acct-a': ''}}
+
+    @responses.activate
+    def test_subtree_ids(self):
+        children = {'root': ['plan-1', 'plan-2'], 'plan-1': ['dep-1'], 'plan-2': ['dep-1']}
+
+        def callback(request):
+            parent = request.url.split('?')[0].split('/')[-2]
+            params = dict(parse_qsl(urlsplit(request.url).query))
+            offset, limit = int(params['_offset']), int(params['_limit'])
+            page = children.get(parent, [])[offset:offset + limit]
+            return (200, {}, json.dumps({'count': len(children.get(parent, [])),
+                                         'resources': [{'id': child} for child in page]}))
+        responses.add_callback(responses.GET, re.compile(re.escape(base_url) + r'/[\w-]+/%2A'),
+                               callback=callback, content_type='application/json')
+
+        assert make_auditor().subtree_ids('root') == ['root', 'plan-1', 'plan-2', 'dep-1']
+        # One child per page.
+        calls = len(responses.calls)
+        assert make_auditor(page_size=1).subtree_ids('root') == ['root', 'plan-1', 'plan-2', 'dep-1']
+        assert len(responses.calls) - calls == 2 + 1 + 1 + 1